@@ -12,8 +12,13 @@ import json
 import threading
 import re
 import subprocess
-import wave
-from ConvertAudio import AudioConverter
+import multiprocessing
+from ConvertAudio import AudioConverterPool, DurationEstimator
+from OutputNaming import allocate_backup_path, release_path
+from WavConcat import validate_wav_headers, export_wav_incremental
+from WavNormalize import normalize_wav_segments
+from MediaMetadata import MediaMetadataCache
+from AudioEncode import AUDIO_FORMATS, encode_audio_files
 
 class AudioConverterGUI:
     """
@@ -184,14 +189,14 @@ class AudioConverterGUI:
             <!-- 转音频服务器地址 -->
             <div class="form-row">
                 <label for="audio-server-url">转音频服务器地址：</label>
-                <input type="text" id="audio-server-url" placeholder="http://192.168.31.194:9872/">
+                <input type="text" id="audio-server-url" placeholder="http://192.168.31.194:9872/（多个地址用逗号分隔）">
                 <button onclick="set_audio_server_url()">设定转音频服务器地址</button>
             </div>
             
             <!-- 字幕服务器地址 -->
             <div class="form-row">
                 <label for="subtitle-server-url">字幕服务器地址：</label>
-                <input type="text" id="subtitle-server-url" placeholder="http://116.62.7.179:10002/">
+                <input type="text" id="subtitle-server-url" placeholder="http://116.62.7.179:10002/（多个地址用逗号分隔）">
                 <button onclick="set_subtitle_server_url()">设定字幕服务器地址</button>
             </div>
             
@@ -239,8 +244,17 @@ class AudioConverterGUI:
             <div class="form-row">
                 <label for="convert-btn">视频操作：</label>
                 <button id="convert-btn" onclick="batch_convert()" style="background-color: #2196F3;">音频转换</button>
+                <span style="margin-left: 5px; white-space: nowrap;"><input type="checkbox" id="use-cache" checked>使用缓存</span>
+                <span style="margin-left: 5px; white-space: nowrap;"><input type="checkbox" id="split-long-text">长文本分句并行</span>
                 <button id="export-btn" onclick="export_audio()" style="background-color: #FF9800; margin-left: 10px;">导出</button>
+                <select id="export-format" style="margin-left: 5px;">
+                    <option value="wav" selected>WAV</option>
+                    <option value="flac">FLAC（无损）</option>
+                    <option value="opus">Opus（交付）</option>
+                </select>
                 <button id="batch-subtitle-btn" onclick="batch_convert_subtitles()" style="background-color: #9C27B0; margin-left: 10px;">字幕转换</button>
+                <span style="margin-left: 5px; white-space: nowrap;"><input type="checkbox" id="join-subtitle-audio">合并转录</span>
+                <span style="margin-left: 5px; white-space: nowrap;"><input type="checkbox" id="compress-subtitle-audio">上传前压缩</span>
                 <button id="optimize-subtitle-btn" onclick="optimize_subtitles()" style="background-color: #FF5722; margin-left: 10px;">字幕优化</button>
                 <button id="batch-generate-video-btn" onclick="batch_generate_video()" style="background-color: #4CAF50; margin-left: 10px;">视频生成</button>
                 <button id="export-video-btn" onclick="export_video()" style="background-color: #FF5722; margin-left: 10px;">视频导出</button>
@@ -545,7 +559,9 @@ class AudioConverterGUI:
             btn.textContent = '转换中...';
             
             // 开始批量转换字幕
-            window.pywebview.api.batch_convert_subtitles().then(function(result) {
+            const joinAudio = document.getElementById('join-subtitle-audio').checked;
+            const compressAudio = document.getElementById('compress-subtitle-audio').checked;
+            window.pywebview.api.batch_convert_subtitles(joinAudio, compressAudio).then(function(result) {
                 // 启用按钮
                 btn.disabled = false;
                 btn.textContent = '批量转换字幕';
@@ -663,8 +679,12 @@ class AudioConverterGUI:
             convertBtn.disabled = true;
             convertBtn.textContent = '转换中...';
             
+            // 是否使用语音缓存（取消勾选时强制重新生成）
+            const useCache = document.getElementById('use-cache').checked;
+            const splitLongText = document.getElementById('split-long-text').checked;
+            
             // 开始转换
-            window.pywebview.api.batch_convert(tasks).then(function(result) {
+            window.pywebview.api.batch_convert(tasks, useCache, splitLongText).then(function(result) {
                 // 启用转换按钮
                 convertBtn.disabled = false;
                 convertBtn.textContent = '批量转换';
@@ -672,6 +692,8 @@ class AudioConverterGUI:
                 if (result.success) {
                     add_log('🎉 批量转换完成！');
                     add_log(`📊 成功: ${result.success_count}, 失败: ${result.error_count}`);
+                    add_log(`⏭️ 跳过模型切换: ${result.skipped_weight_switches} 次`);
+                    add_log(`💾 缓存命中: ${result.cache_hits} 条`);
                     
                     // 不再自动更新任务状态，由用户手动点击通过按钮修改
                 } else {
@@ -717,11 +739,16 @@ class AudioConverterGUI:
         
         // 导出音频
         function export_audio() {
-            window.pywebview.api.export_audio().then(function(result) {
+            const exportFormat = document.getElementById('export-format').value;
+            window.pywebview.api.export_audio(exportFormat).then(function(result) {
                 if (result.success) {
                     add_log('🎉 音频导出成功！');
                     add_log(`📁 导出文件: ${result.audio_file}`);
                     add_log(`📄 导出信息: ${result.info_file}`);
+                    add_log(`⚡ 导出方式: ${result.export_mode}，拼接速度: ${(result.bytes_per_second / 1024 / 1024).toFixed(1)} MB/秒`);
+                    if (result.encoded_file) {
+                        add_log(`🗜️ 压缩音频: ${result.encoded_file}（${(result.encoded_bytes / 1024 / 1024).toFixed(1)} MB）`);
+                    }
                     
                     // 重新导入JSON文件以更新信息
                     if (result.info_file) {
@@ -1593,14 +1620,26 @@ class AudioConverterGUI:
             if not server_url:
                 return {"success": False, "error": "服务器地址不能为空"}
             
-            if not re.match(r'^http://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+/$', server_url):
-                return {"success": False, "error": "无效的服务器地址格式"}
+            # 支持多个服务器地址，用逗号分隔
+            for url in self._parse_server_urls(server_url):
+                if not re.match(r'^http://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+/$', url):
+                    return {"success": False, "error": "无效的服务器地址格式"}
             
             self.audio_server_url = server_url
             return {"success": True}
         except Exception as e:
             return {"success": False, "error": f"设置服务器地址失败: {str(e)}"}
     
+    def _parse_server_urls(self, server_url):
+        """
+        解析服务器地址，支持用逗号分隔的多个地址
+        :param server_url: 服务器地址字符串或地址列表
+        :return: 服务器地址列表
+        """
+        if isinstance(server_url, (list, tuple)):
+            return [url.strip() for url in server_url if url and url.strip()]
+        return [url.strip() for url in re.split(r'[,，;；\s]+', server_url) if url.strip()]
+    
     def set_subtitle_server_url(self, *args):
         """
         设置字幕服务器地址
@@ -1620,8 +1659,10 @@ class AudioConverterGUI:
             if not server_url:
                 return {"success": False, "error": "服务器地址不能为空"}
             
-            if not re.match(r'^http://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+/$', server_url):
-                return {"success": False, "error": "无效的服务器地址格式"}
+            # 支持多个字幕服务器地址，用逗号分隔，批量转换时并行使用
+            for url in self._parse_server_urls(server_url):
+                if not re.match(r'^http://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+/$', url):
+                    return {"success": False, "error": "无效的服务器地址格式"}
             
             self.subtitle_server_url = server_url
             return {"success": True}
@@ -1749,48 +1790,31 @@ class AudioConverterGUI:
         except Exception as e:
             return {"success": False, "error": f"设置实例id失败: {str(e)}"}
     
-    def get_video_duration(self, video_path):
+    def get_media_cache(self, json_file_path=None):
+        """
+        获取当前项目的媒体元数据缓存（保存在项目JSON旁）
+        :param json_file_path: 可选的项目JSON路径，默认使用当前导入的JSON
+        :return: MediaMetadataCache
+        """
+        return MediaMetadataCache.for_project(json_file_path or self.json_file_path)
+    
+    def get_video_duration(self, video_path, media_cache=None):
         """
-        获取视频文件的实际时长（单位：秒）
+        获取视频文件的实际时长（单位：秒），优先使用媒体元数据缓存
         :param video_path: 视频文件路径
+        :param media_cache: 可选的MediaMetadataCache，默认使用当前项目的缓存
         :return: 视频时长（秒），失败返回0
         """
         try:
-            # 延迟导入OpenCV，避免未安装时的错误
-            import cv2
-            
             # 检查视频文件是否存在
             if not os.path.exists(video_path):
                 print(f"调试: 视频文件不存在: {video_path}")
                 return 0
             
-            # 使用OpenCV打开视频
-            cap = cv2.VideoCapture(video_path)
-            
-            # 检查视频是否成功打开
-            if not cap.isOpened():
-                print(f"调试: 无法打开视频文件: {video_path}")
-                return 0
-            
-            # 获取视频总帧数
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            # 获取视频帧率
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            
-            # 计算视频时长（秒）
-            if fps > 0:
-                duration = total_frames / fps
-            else:
-                duration = 0
-            
-            # 关闭视频
-            cap.release()
-            
+            media_cache = media_cache or self.get_media_cache()
+            duration = media_cache.get_duration(video_path)
             print(f"调试: 视频文件 {video_path} 时长: {duration} 秒")
             return duration
-        except ImportError:
-            print("调试: 缺少OpenCV库，无法获取视频时长")
-            return 0
         except Exception as e:
             print(f"调试: 获取视频时长异常: {str(e)}")
             return 0
@@ -1816,6 +1840,7 @@ class AudioConverterGUI:
                     return {"success": False, "error": "JSON文件无效：text字段必须是字符串"}
             
             # 生成任务列表
+            media_cache = self.get_media_cache(file_path)
             new_tasks = []
             for i, item in enumerate(json_data):
                 # 从JSON文件中读取音频路径
@@ -1845,7 +1870,7 @@ class AudioConverterGUI:
                 if video_info and video_info.get("filepath"):
                     video_path = video_info.get("filepath")
                     # 获取视频时长
-                    video_duration = self.get_video_duration(video_path)
+                    video_duration = self.get_video_duration(video_path, media_cache)
                     # 将视频时长添加到Video字段中
                     video_info["duration"] = round(video_duration, 2)
                 
@@ -1873,6 +1898,9 @@ class AudioConverterGUI:
                 }
                 new_tasks.append(task)
             
+            # 保存新探测的媒体信息，下次导入时不再重新打开文件
+            media_cache.save()
+            
             # 生成TXT文件
             txt_file_path = os.path.splitext(file_path)[0] + '.txt'
             with open(txt_file_path, 'w', encoding='utf-8') as f:
@@ -1939,8 +1967,13 @@ class AudioConverterGUI:
     def batch_convert_subtitles(self, *args):
         """
         批量转换字幕
+        参数：是否合并转录（把待转录分镜的音频拼接为一个文件只转录一次，默认False），
+              是否上传前压缩（重采样为16kHz单声道FLAC后再上传，默认False）
         """
         try:
+            join_audio = bool(args[0]) if len(args) > 0 else False
+            preprocess_format = "flac" if len(args) > 1 and args[1] else None
+            
             if not self.subtitle_server_url:
                 return {"success": False, "error": "未设置字幕服务器地址"}
             
@@ -1959,17 +1992,19 @@ class AudioConverterGUI:
             json_dir = os.path.dirname(self.json_file_path)
             json_basename = os.path.basename(self.json_file_path)
             json_name, json_ext = os.path.splitext(json_basename)
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            backup_file_name = f"{json_name}_{timestamp}{json_ext}"
-            backup_file_path = os.path.join(self.output_folder, backup_file_name)
             
             # 读取原json文件内容
             with open(self.json_file_path, 'r', encoding='utf-8') as f:
                 original_content = f.read()
             
-            # 写入备份文件
-            with open(backup_file_path, 'w', encoding='utf-8') as f:
-                f.write(original_content)
+            # 读取成功后再分配备份文件路径，写入备份文件
+            backup_file_path = allocate_backup_path(self.json_file_path, self.output_folder)
+            try:
+                with open(backup_file_path, 'w', encoding='utf-8') as f:
+                    f.write(original_content)
+            except OSError:
+                release_path(backup_file_path)
+                raise
             print(f"已备份原JSON文件到: {backup_file_path}")
             
             # 2. 读取json文件数据
@@ -2032,7 +2067,9 @@ class AudioConverterGUI:
                 server_url=self.subtitle_server_url,
                 json_file=new_json_file_path,
                 output_folder=self.output_folder,
-                max_wait=600
+                max_wait=600,
+                join_audio=join_audio,
+                preprocess_format=preprocess_format
             )
             
             if result:
@@ -2079,17 +2116,19 @@ class AudioConverterGUI:
             json_dir = os.path.dirname(self.json_file_path)
             json_basename = os.path.basename(self.json_file_path)
             json_name, json_ext = os.path.splitext(json_basename)
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            backup_file_name = f"{json_name}_{timestamp}{json_ext}"
-            backup_file_path = os.path.join(self.output_folder, backup_file_name)
             
             # 读取原json文件内容
             with open(self.json_file_path, 'r', encoding='utf-8') as f:
                 original_content = f.read()
             
-            # 写入备份文件
-            with open(backup_file_path, 'w', encoding='utf-8') as f:
-                f.write(original_content)
+            # 读取成功后再分配备份文件路径，写入备份文件
+            backup_file_path = allocate_backup_path(self.json_file_path, self.output_folder)
+            try:
+                with open(backup_file_path, 'w', encoding='utf-8') as f:
+                    f.write(original_content)
+            except OSError:
+                release_path(backup_file_path)
+                raise
             print(f"已备份原JSON文件到: {backup_file_path}")
             
             # 2. 读取json文件数据
@@ -2327,47 +2366,53 @@ class AudioConverterGUI:
             if not self.tasks:
                 return {"success": False, "error": "没有任务需要转换"}
             
-            # 初始化转换器
-            self.converter = AudioConverter(server_url=self.audio_server_url)
+            # 第二个参数为是否使用语音缓存，默认使用
+            use_cache = bool(args[1]) if len(args) > 1 else True
+            # 第三个参数为是否将长文本按句切分后分发到多个服务器并发合成，默认不切分
+            split_long_text = bool(args[2]) if len(args) > 2 else False
+            
+            # 初始化多服务器转换池
+            self.converter = AudioConverterPool(self._parse_server_urls(self.audio_server_url), use_cache=use_cache)
             
             # 转换任务
             success_count = 0
             error_count = 0
+            cache_hits = 0
             task_results = []
             
-            # 过滤出状态为"未通过"的任务
-            pending_tasks = [task for task in self.tasks if task["status"] == "未通过"]
-            total_pending = len(pending_tasks)
+            # 过滤出状态为"未通过"的任务，记录其在self.tasks中的原始索引
+            pending_indices = [index for index, task in enumerate(self.tasks) if task["status"] == "未通过"]
+            total_pending = len(pending_indices)
             
             if total_pending == 0:
                 return {"success": False, "error": "没有未通过的任务需要转换"}
             
-            for i, task in enumerate(pending_tasks):
+            pending_texts = [self.tasks[index]["text"] for index in pending_indices]
+            
+            # 用已通过任务的时长（JSON中的duration或WAV文件头）训练时长估计器，预测待转换任务的时长
+            speed = self.converter.converters[0].build_tts_params("")["speed"]
+            estimator = DurationEstimator(speed=speed)
+            pending_set = set(pending_indices)
+            sample_count = estimator.train_from_tasks(
+                [task for index, task in enumerate(self.tasks) if index not in pending_set])
+            predictions = [estimator.predict(text) for text in pending_texts]
+            prediction_errors = []
+            message = f"📐 时长估计器已用 {sample_count} 条样本训练，预计总时长 {round(sum(predictions), 2)}秒，按预测时长从长到短调度"
+            self.window.evaluate_js(f"add_log({json.dumps(message)})")
+            
+            # 任务由空闲的服务器领取，结果按完成顺序返回，通过原始索引写回self.tasks
+            for i, (pending_index, server_url, result) in enumerate(self.converter.convert_all(
+                    pending_texts, output_dir=self.output_folder, split_long_text=split_long_text, estimator=estimator)):
+                original_index = pending_indices[pending_index]
                 try:
-                    # 获取任务在self.tasks中的原始索引
-                    original_index = self.tasks.index(task)
-                    
-                    # 调用转换函数
-                    result = self.converter.ConvertBySingleText(task["text"])
-                    
                     if "error" not in result or result["error"] is None:
                         # 转换成功
                         success_count += 1
+                        if result.get("cache_hit"):
+                            cache_hits += 1
+                        # 设置了输出文件夹时，音频已直接生成在该文件夹中
                         audio_path = result.get("local_audio_path")
                         
-                        # 如果设置了输出文件夹，将音频文件移动到该文件夹
-                        if self.output_folder:
-                            import shutil
-                            import os
-                            # 获取文件名
-                            audio_filename = os.path.basename(audio_path)
-                            # 生成新的保存路径
-                            new_audio_path = os.path.join(self.output_folder, audio_filename)
-                            # 移动文件
-                            shutil.move(audio_path, new_audio_path)
-                            # 更新audio_path为新路径
-                            audio_path = new_audio_path
-                        
                         task_results.append({"success": True, "audio_path": audio_path, "index": original_index})
                         
                         # 更新audio_path和duration
@@ -2380,8 +2425,13 @@ class AudioConverterGUI:
                         # 更新GUI中的时长显示
                         self.window.evaluate_js(f"document.getElementById('duration-{original_index}').value = {duration}")
                         
+                        # 记录预测误差
+                        predicted = predictions[pending_index]
+                        prediction_errors.append(duration - predicted)
+                        
                         # 更新日志
-                        message = f"✅ 第 {i+1}/{total_pending} 条转换成功，时长: {duration}秒"
+                        message = (f"✅ 第 {i+1}/{total_pending} 条（分镜 {original_index+1}，{server_url}）转换成功，"
+                                   f"时长: {duration}秒，预测: {predicted}秒（误差 {duration - predicted:+.2f}秒）")
                         self.window.evaluate_js(f"add_log({json.dumps(message)})")
                     else:
                         # 转换失败
@@ -2389,7 +2439,7 @@ class AudioConverterGUI:
                         task_results.append({"success": False, "error": result["error"], "index": original_index})
                         
                         # 更新日志
-                        error_message = f"❌ 第 {i+1}/{total_pending} 条转换失败: {result['error']}"
+                        error_message = f"❌ 第 {i+1}/{total_pending} 条（分镜 {original_index+1}，{server_url}）转换失败: {result['error']}"
                         self.window.evaluate_js(f"add_log({json.dumps(error_message)})")
                         
                 except Exception as e:
@@ -2397,13 +2447,35 @@ class AudioConverterGUI:
                     task_results.append({"success": False, "error": str(e), "index": original_index})
                     
                     # 更新日志
-                    error_message = f"❌ 第 {i+1}/{total_pending} 条转换异常: {str(e)}"
+                    error_message = f"❌ 第 {i+1}/{total_pending} 条（分镜 {original_index+1}）转换异常: {str(e)}"
                     self.window.evaluate_js(f"add_log({json.dumps(error_message)})")
             
+            # 按原始顺序整理结果
+            task_results.sort(key=lambda item: item["index"])
+            self.get_media_cache().save()
+            
+            # 输出时长预测的平均绝对误差
+            prediction_mae = round(sum(abs(e) for e in prediction_errors) / len(prediction_errors), 2) if prediction_errors else None
+            if prediction_mae is not None:
+                message = f"📐 时长预测平均绝对误差: {prediction_mae}秒（{len(prediction_errors)} 条）"
+                self.window.evaluate_js(f"add_log({json.dumps(message)})")
+            
+            # 输出每个服务器的吞吐量和失败统计
+            server_report = self.converter.get_server_report()
+            for stats in server_report:
+                message = (f"🖥️ {stats['server_url']}: 成功 {stats['success_count']}，失败 {stats['error_count']}，"
+                           f"耗时 {stats['busy_seconds']}秒，吞吐量 {stats['throughput_per_minute']} 条/分钟，"
+                           f"熔断 {stats['ejection_count']} 次，当前状态 {stats['state']}")
+                self.window.evaluate_js(f"add_log({json.dumps(message)})")
+            
             return {
                 "success": True,
                 "success_count": success_count,
                 "error_count": error_count,
+                "skipped_weight_switches": self.converter.skipped_weight_switches,
+                "cache_hits": cache_hits,
+                "duration_prediction_mae": prediction_mae,
+                "server_report": server_report,
                 "task_results": task_results
             }
         except Exception as e:
@@ -2513,12 +2585,8 @@ class AudioConverterGUI:
             if not audio_path or not os.path.exists(audio_path):
                 return 0
             
-            # 使用wave模块获取WAV文件时长
-            with wave.open(audio_path, 'rb') as wf:
-                frames = wf.getnframes()
-                rate = wf.getframerate()
-                duration = frames / float(rate)
-                return round(duration, 2)
+            # 从媒体元数据缓存获取时长，文件未变化时不再读取文件头
+            return round(self.get_media_cache().get_duration(audio_path), 2)
         except Exception as e:
             return 0
     
@@ -3040,8 +3108,14 @@ class AudioConverterGUI:
     def export_audio(self, *args):
         """
         导出音频
+        参数：导出格式（"wav"、"flac"或"opus"，默认"wav"）
+        选择FLAC或Opus时，先增量更新WAV总音频，再把总音频和各分镜音频并行编码为所选格式
         """
         try:
+            audio_format = args[0] if len(args) > 0 and args[0] else "wav"
+            if audio_format not in AUDIO_FORMATS:
+                return {"success": False, "error": f"不支持的导出格式: {audio_format}"}
+            
             # 检查所有任务是否都已通过
             for task in self.tasks:
                 if task["status"] != "已通过":
@@ -3064,53 +3138,62 @@ class AudioConverterGUI:
                 base_info_path = "ExportAudioInfo.json"
             
             # 处理同名文件备份
-            import time
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            
-            # 备份音频文件
-            if os.path.exists(base_audio_path):
-                backup_audio_path = f"{os.path.splitext(base_audio_path)[0]}_{timestamp}.wav"
-                import shutil
-                shutil.copy2(base_audio_path, backup_audio_path)
-                print(f"备份音频文件: {backup_audio_path}")
-            
+            # 音频文件按片段增量更新，只有完整重建时才把旧文件重命名为备份，由export_wav_incremental处理
             # 备份信息文件
             if os.path.exists(base_info_path):
-                backup_info_path = f"{os.path.splitext(base_info_path)[0]}_{timestamp}.json"
+                backup_info_path = allocate_backup_path(base_info_path)
                 import shutil
-                shutil.copy2(base_info_path, backup_info_path)
+                try:
+                    shutil.copy2(base_info_path, backup_info_path)
+                except OSError:
+                    release_path(backup_info_path)
+                    raise
                 print(f"备份信息文件: {backup_info_path}")
             
             export_audio_path = base_audio_path
             export_info_path = base_info_path
             
-            # 读取第一个音频文件的参数
-            first_audio = self.tasks[0]["audio_path"]
-            with wave.open(first_audio, 'rb') as wf:
-                nchannels = wf.getnchannels()
-                sampwidth = wf.getsampwidth()
-                framerate = wf.getframerate()
-                comptype = wf.getcomptype()
-                compname = wf.getcompname()
-            
-            # 打开输出文件
-            with wave.open(export_audio_path, 'wb') as output:
-                output.setnchannels(nchannels)
-                output.setsampwidth(sampwidth)
-                output.setframerate(framerate)
-                output.setcomptype(comptype, compname)
-                
-                # 逐个读取并写入音频数据
-                for task in self.tasks:
-                    with wave.open(task["audio_path"], 'rb') as wf:
-                        # 检查音频参数是否一致
-                        if (wf.getnchannels() != nchannels or
-                            wf.getsampwidth() != sampwidth or
-                            wf.getframerate() != framerate):
-                            return {"success": False, "error": f"任务 {task['id']} 的音频参数与其他音频不一致"}
-                        
-                        # 读取并写入音频数据
-                        output.writeframes(wf.readframes(wf.getnframes()))
+            # 一次性读取并校验所有音频的文件头
+            audio_paths = [task["audio_path"] for task in self.tasks]
+            headers, mismatched = validate_wav_headers(audio_paths)
+            if mismatched:
+                # 采样率、声道数或位深不一致（如切换过超分），统一转换为最常见的格式，转换结果会被缓存
+                headers, normalize_stats = normalize_wav_segments(headers)
+                print(f"🔧 {len(mismatched)} 段音频参数与其他音频不一致，已统一为 "
+                      f"{normalize_stats['target_format'][2]}Hz/{normalize_stats['target_format'][1]}声道/"
+                      f"{normalize_stats['target_format'][3] * 8}位（转换 {normalize_stats['converted']} 段，"
+                      f"使用缓存 {normalize_stats['cache_hits']} 段）")
+                audio_paths = [header["path"] for header in headers]
+            
+            # 按块流式拼接，根据上次导出的片段索引只重写发生变化的片段
+            concat_result = export_wav_incremental(audio_paths, export_audio_path, headers=headers, backup_old=True)
+            mode_names = {"full": "完整重建", "append": "末尾追加", "patch": "原位替换", "splice": "截断重写", "unchanged": "无变化"}
+            message = (f"🎵 音频导出（{mode_names[concat_result['mode']]}）：{len(audio_paths)} 段中 "
+                       f"{len(concat_result['changed_segments'])} 段有变化，写入 {concat_result['bytes_written'] / 1024 / 1024:.1f} MB / "
+                       f"共 {concat_result['total_bytes'] / 1024 / 1024:.1f} MB，耗时 {concat_result['seconds']}秒，"
+                       f"速度 {concat_result['bytes_per_second'] / 1024 / 1024:.1f} MB/秒")
+            print(message)
+            
+            # 压缩导出：总音频和各分镜音频一起放入线程池，每个文件一个ffmpeg进程并行编码
+            encoded_audio_path = None
+            encoded_shot_paths = {}
+            if audio_format != "wav":
+                extension = AUDIO_FORMATS[audio_format]["extension"]
+                encoded_audio_path = os.path.splitext(export_audio_path)[0] + extension
+                shot_dir = os.path.splitext(export_audio_path)[0] + f"_{audio_format}"
+                # 分镜音频按源文件名命名，源文件被替换后自动重新编码
+                jobs = [(export_audio_path, encoded_audio_path)] + [
+                    (task["audio_path"], os.path.join(shot_dir, os.path.splitext(os.path.basename(task["audio_path"]))[0] + extension))
+                    for task in self.tasks
+                ]
+                encode_results, encode_stats = encode_audio_files(jobs, audio_format)
+                for result in encode_results:
+                    if result.get("error"):
+                        return {"success": False, "error": f"音频压缩失败: {result['error']}"}
+                encoded_shot_paths = {task["id"]: result["output_path"] for task, result in zip(self.tasks, encode_results[1:])}
+                print(f"🗜️ {audio_format.upper()}压缩：编码 {encode_stats['encoded']} 个文件，跳过未变化的 {encode_stats['skipped']} 个，"
+                      f"{encode_stats['input_bytes'] / 1024 / 1024:.1f} MB -> {encode_stats['output_bytes'] / 1024 / 1024:.1f} MB，"
+                      f"耗时 {encode_stats['seconds']}秒")
             
             # 生成导出信息JSON
             export_info = []
@@ -3119,14 +3202,17 @@ class AudioConverterGUI:
                 absolute_audio_path = os.path.abspath(task["audio_path"])
                 # 计算Audio_Update_Flag
                 audio_update_flag = 1 if task["status"] == "未通过" else 0
-                export_info.append({
+                item = {
                     "text": task["text"],
                     "audio": absolute_audio_path,
                     "duration": task["duration"],
                     "chapter": task["chapter"],
                     "description": task["description"],
                     "Audio_Update_Flag": audio_update_flag
-                })
+                }
+                if task["id"] in encoded_shot_paths:
+                    item["audio_encoded"] = os.path.abspath(encoded_shot_paths[task["id"]])
+                export_info.append(item)
             
             with open(export_info_path, 'w', encoding='utf-8') as f:
                 json.dump(export_info, f, ensure_ascii=False, indent=2)
@@ -3134,7 +3220,11 @@ class AudioConverterGUI:
             return {
                 "success": True,
                 "audio_file": export_audio_path,
-                "info_file": export_info_path
+                "info_file": export_info_path,
+                "export_mode": concat_result["mode"],
+                "bytes_per_second": concat_result["bytes_per_second"],
+                "encoded_file": encoded_audio_path,
+                "encoded_bytes": os.path.getsize(encoded_audio_path) if encoded_audio_path else 0
             }
         except Exception as e:
             return {"success": False, "error": f"导出失败: {str(e)}"}
@@ -3251,19 +3341,16 @@ class AudioConverterGUI:
                 os.makedirs(delivery_folder)
                 print(f"创建Delivery文件夹: {delivery_folder}")
             
-            # 生成时间戳
-            import time
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            
-            # 构建交付文件名
-            original_filename = os.path.basename(video_file_path)
-            original_base_name = os.path.splitext(original_filename)[0]
-            delivery_filename = f"{original_base_name}_Delivery_{timestamp}.mp4"
-            delivery_file_path = os.path.join(delivery_folder, delivery_filename)
+            # 分配交付文件名（原文件名_Delivery_时间戳_序号）
+            delivery_file_path = allocate_backup_path(video_file_path, delivery_folder, suffix="_Delivery")
             
             # 复制视频文件
             import shutil
-            shutil.copy2(video_file_path, delivery_file_path)
+            try:
+                shutil.copy2(video_file_path, delivery_file_path)
+            except OSError:
+                release_path(delivery_file_path)
+                raise
             print(f"复制视频文件到: {delivery_file_path}")
             
             return {
@@ -3278,5 +3365,7 @@ class AudioConverterGUI:
 
 # 运行GUI
 if __name__ == "__main__":
+    # 打包后的程序使用进程池（字幕上传前的音频预处理）时需要
+    multiprocessing.freeze_support()
     app = AudioConverterGUI()
     app.start()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+音频压缩导出
+把拼接好的WAV和各分镜音频编码为FLAC（无损）或Opus（交付用），由ffmpeg边读边编码，内存占用与音频时长无关；
+多个文件在线程池中各自启动一个ffmpeg进程并行编码，充分利用多核CPU
+"""
+
+import os
+import time
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 默认的ffmpeg可执行文件路径
+DEFAULT_FFMPEG_PATH = r"D:\05 SelfMidea\98 SelfDevelopedTools\01 BatchTTS_tool\ffmpeg\bin\ffmpeg.exe"
+
+# Opus默认码率，解说人声96k已接近透明
+DEFAULT_OPUS_BITRATE = "96k"
+
+# 支持的导出格式：扩展名、MIME类型、ffmpeg封装格式和编码参数
+AUDIO_FORMATS = {
+    "wav": {"extension": ".wav", "mime": "audio/wav", "muxer": "wav", "codec_args": ['-c:a', 'pcm_s16le']},
+    "flac": {"extension": ".flac", "mime": "audio/flac", "muxer": "flac", "codec_args": ['-c:a', 'flac', '-compression_level', '5']},
+    "opus": {"extension": ".opus", "mime": "audio/ogg", "muxer": "ogg", "codec_args": ['-c:a', 'libopus', '-ar', '48000']}
+}
+
+
+def find_ffmpeg(ffmpeg_path=None):
+    """
+    查找ffmpeg可执行文件：依次尝试指定路径、默认路径、PATH和imageio_ffmpeg自带的ffmpeg
+    :param ffmpeg_path: 可选的ffmpeg可执行文件路径
+    :return: ffmpeg路径，找不到时返回None
+    """
+    for candidate in (ffmpeg_path, DEFAULT_FFMPEG_PATH, shutil.which("ffmpeg")):
+        if candidate and os.path.exists(candidate):
+            return candidate
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+def detect_audio_format(path):
+    """
+    根据扩展名获取音频格式名称
+    :return: "wav"、"flac"、"opus"，不支持的格式返回None
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for audio_format, info in AUDIO_FORMATS.items():
+        if info["extension"] == extension:
+            return audio_format
+    return None
+
+
+def get_audio_mime_type(path):
+    """
+    根据扩展名获取音频文件的MIME类型
+    """
+    audio_format = detect_audio_format(path)
+    return AUDIO_FORMATS[audio_format]["mime"] if audio_format else "application/octet-stream"
+
+
+def find_audio_file(directory, base_name, formats=("wav", "flac", "opus")):
+    """
+    按格式优先级查找同名音频文件
+    :param directory: 所在目录
+    :param base_name: 不含扩展名的文件名
+    :param formats: 依次尝试的格式
+    :return: 找到的文件路径，都不存在时返回None
+    """
+    for audio_format in formats:
+        path = os.path.join(directory, base_name + AUDIO_FORMATS[audio_format]["extension"])
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def encode_audio(source_path, output_path, audio_format, ffmpeg_path=None, bitrate=DEFAULT_OPUS_BITRATE):
+    """
+    把音频编码为指定格式，先写入临时文件，完成后再替换目标文件
+    :param source_path: 源音频路径
+    :param output_path: 输出文件路径
+    :param audio_format: "wav"、"flac"或"opus"
+    :param ffmpeg_path: 可选的ffmpeg可执行文件路径
+    :param bitrate: Opus码率
+    :return: 结果字典{"output_path", "input_bytes", "output_bytes", "seconds"}，失败时返回{"error": 错误信息}
+    """
+    if audio_format not in AUDIO_FORMATS:
+        return {"error": f"不支持的音频格式: {audio_format}"}
+    ffmpeg_path = find_ffmpeg(ffmpeg_path)
+    if not ffmpeg_path:
+        return {"error": "找不到ffmpeg可执行文件"}
+
+    info = AUDIO_FORMATS[audio_format]
+    codec_args = list(info["codec_args"])
+    if audio_format == "opus":
+        codec_args += ['-b:a', bitrate]
+    temp_path = f"{output_path}.part"
+    # 每个ffmpeg进程只用一个线程，并行度由线程池控制
+    cmd = [ffmpeg_path, '-v', 'error', '-y', '-i', source_path, '-vn', '-threads', '1'] + codec_args + \
+          ['-f', info["muxer"], temp_path]
+
+    start_time = time.time()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"error": f"编码失败: {result.stderr.strip()}"}
+        os.replace(temp_path, output_path)
+    except OSError as e:
+        return {"error": f"编码失败: {str(e)}"}
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return {
+        "output_path": output_path,
+        "input_bytes": os.path.getsize(source_path),
+        "output_bytes": os.path.getsize(output_path),
+        "seconds": round(time.time() - start_time, 3)
+    }
+
+
+def encode_audio_files(jobs, audio_format, ffmpeg_path=None, max_workers=None, skip_unchanged=True,
+                       bitrate=DEFAULT_OPUS_BITRATE):
+    """
+    并行编码多个音频文件
+    :param jobs: (源音频路径, 输出文件路径) 列表
+    :param audio_format: "wav"、"flac"或"opus"
+    :param ffmpeg_path: 可选的ffmpeg可执行文件路径
+    :param max_workers: 并行的ffmpeg进程数，默认为CPU核心数
+    :param skip_unchanged: 输出文件比源文件新时跳过
+    :param bitrate: Opus码率
+    :return: (与jobs顺序一致的结果字典列表, 统计字典{"encoded", "skipped", "failed", "input_bytes", "output_bytes", "seconds"})
+    """
+    ffmpeg_path = find_ffmpeg(ffmpeg_path)
+    start_time = time.time()
+
+    def encode(job):
+        source_path, output_path = job
+        if skip_unchanged and os.path.exists(output_path) and \
+                os.path.getmtime(output_path) >= os.path.getmtime(source_path):
+            return {
+                "output_path": output_path,
+                "input_bytes": os.path.getsize(source_path),
+                "output_bytes": os.path.getsize(output_path),
+                "seconds": 0,
+                "skipped": True
+            }
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        return encode_audio(source_path, output_path, audio_format, ffmpeg_path, bitrate)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        results = list(executor.map(encode, jobs))
+
+    succeeded = [result for result in results if not result.get("error")]
+    return results, {
+        "encoded": sum(1 for result in succeeded if not result.get("skipped")),
+        "skipped": sum(1 for result in succeeded if result.get("skipped")),
+        "failed": len(results) - len(succeeded),
+        "input_bytes": sum(result["input_bytes"] for result in succeeded),
+        "output_bytes": sum(result["output_bytes"] for result in succeeded),
+        "seconds": round(time.time() - start_time, 3)
+    }
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TTS批量转换压测脚本
+使用AudioConverterPool对一个或多个（模拟）GPT-SoVITS服务器进行批量转换，统计吞吐量（条/秒）和p50/p95/p99延迟
+
+用法：
+    # 启动3个本地模拟服务器并压测
+    python BenchmarkTTS.py --spawn 3 --count 60 --latency 0.5 --failure-rate 0.02
+    # 压测已有的服务器
+    python BenchmarkTTS.py --servers http://127.0.0.1:9872/,http://127.0.0.1:9873/ --count 60
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from ConvertAudio import AudioConverterPool
+from FileCache import FileCache
+
+
+def percentile(values, percent):
+    """
+    计算百分位数（线性插值）
+    :param values: 数值列表
+    :param percent: 百分位，如 95
+    :return: 百分位数，列表为空时返回0
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def load_texts(json_file_path, count):
+    """
+    从解说文稿JSON中读取测试文本，数量不足时循环使用
+    :param json_file_path: JSON文件路径，每项包含text字段
+    :param count: 需要的文本数量
+    :return: 文本列表
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        texts = [item["text"] for item in json.load(f) if item.get("text")]
+    if not texts:
+        raise ValueError(f"JSON文件中没有文本: {json_file_path}")
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def wait_for_server(server_url, timeout=60):
+    """
+    等待服务器启动完成
+    :param server_url: 服务器地址
+    :param timeout: 最长等待秒数
+    :return: 是否已启动
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(server_url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def spawn_mock_servers(count, base_port, mock_args):
+    """
+    启动多个本地模拟服务器
+    :param count: 服务器数量
+    :param base_port: 第一个服务器的端口，之后依次加1
+    :param mock_args: 传给MockGPTSoVITSServer.py的额外参数
+    :return: (服务器地址列表, 进程列表)
+    """
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MockGPTSoVITSServer.py")
+    server_urls = []
+    processes = []
+    for i in range(count):
+        port = base_port + i
+        process = subprocess.Popen([sys.executable, script_path, "--port", str(port)] + mock_args,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        server_urls.append(f"http://127.0.0.1:{port}/")
+    for server_url in server_urls:
+        if not wait_for_server(server_url):
+            raise RuntimeError(f"模拟服务器启动超时: {server_url}")
+        print(f"✅ 模拟服务器已启动: {server_url}")
+    return server_urls, processes
+
+
+def run_benchmark(server_urls, texts, split_long_text=False):
+    """
+    使用AudioConverterPool批量转换并统计性能
+    使用临时的缓存和输出目录，不污染用户目录下的共享语音缓存
+    :param server_urls: 服务器地址列表
+    :param texts: 文本列表
+    :param split_long_text: 是否按句切分长文本并行合成
+    :return: 统计结果字典
+    """
+    work_dir = tempfile.mkdtemp(prefix="benchmark_tts_")
+    try:
+        cache = FileCache(os.path.join(work_dir, "cache"))
+        pool = AudioConverterPool(server_urls, use_cache=False, cache=cache)
+        latencies = []
+        error_count = 0
+        start_time = time.time()
+        for i, (index, server_url, result) in enumerate(pool.convert_all(
+                texts, output_dir=os.path.join(work_dir, "output"), split_long_text=split_long_text)):
+            if result.get("error"):
+                error_count += 1
+                print(f"❌ [{i + 1}/{len(texts)}] 第 {index + 1} 条失败（{server_url}）: {result['error']}")
+            else:
+                latencies.append(result.get("elapsed_seconds", 0))
+                print(f"✅ [{i + 1}/{len(texts)}] 第 {index + 1} 条完成（{server_url}），耗时 {result.get('elapsed_seconds', 0)}秒")
+        wall_seconds = time.time() - start_time
+
+        return {
+            "server_count": len(pool.converters),
+            "request_count": len(texts),
+            "success_count": len(latencies),
+            "error_count": error_count,
+            "wall_seconds": round(wall_seconds, 2),
+            "requests_per_second": round(len(texts) / wall_seconds, 3) if wall_seconds > 0 else 0,
+            "latency_p50": round(percentile(latencies, 50), 3),
+            "latency_p95": round(percentile(latencies, 95), 3),
+            "latency_p99": round(percentile(latencies, 99), 3),
+            "server_report": pool.get_server_report()
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """
+    主函数，解析命令行参数并运行压测
+    """
+    parser = argparse.ArgumentParser(description="TTS批量转换压测")
+    parser.add_argument("--servers", default="", help="逗号分隔的服务器地址列表")
+    parser.add_argument("--spawn", type=int, default=0, help="启动的本地模拟服务器数量")
+    parser.add_argument("--base-port", type=int, default=19872, help="模拟服务器的起始端口")
+    parser.add_argument("--count", type=int, default=40, help="转换的文本条数")
+    parser.add_argument("--json", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Commentary.json"),
+                        help="测试文本来源JSON文件")
+    parser.add_argument("--split", action="store_true", help="按句切分长文本并行合成")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟服务器的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="模拟服务器延迟的随机波动范围（秒）")
+    parser.add_argument("--rtf", type=float, default=0.05, help="模拟服务器的实时率")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="模拟服务器的失败概率")
+    args = parser.parse_args()
+
+    server_urls = [url for url in args.servers.split(",") if url.strip()]
+    processes = []
+    try:
+        if args.spawn:
+            mock_args = ["--latency", str(args.latency), "--jitter", str(args.jitter),
+                         "--rtf", str(args.rtf), "--failure-rate", str(args.failure_rate)]
+            spawned_urls, processes = spawn_mock_servers(args.spawn, args.base_port, mock_args)
+            server_urls += spawned_urls
+        if not server_urls:
+            parser.error("请通过 --servers 指定服务器地址或通过 --spawn 启动模拟服务器")
+
+        texts = load_texts(args.json, args.count)
+        print(f"🚀 开始压测: {len(server_urls)} 个服务器，{len(texts)} 条文本")
+        stats = run_benchmark(server_urls, texts, split_long_text=args.split)
+
+        print("\n=== 压测结果 ===")
+        print(f"🖥️ 服务器数: {stats['server_count']}")
+        print(f"📊 请求数: {stats['request_count']}（成功 {stats['success_count']}，失败 {stats['error_count']}）")
+        print(f"⏱️ 总耗时: {stats['wall_seconds']}秒")
+        print(f"🚀 吞吐量: {stats['requests_per_second']} 条/秒")
+        print(f"📈 延迟 p50/p95/p99: {stats['latency_p50']} / {stats['latency_p95']} / {stats['latency_p99']} 秒")
+        for report in stats["server_report"]:
+            print(f"   {report['server_url']}: 成功 {report['success_count']}，失败 {report['error_count']}，"
+                  f"吞吐量 {report['throughput_per_minute']} 条/分钟，熔断 {report['ejection_count']} 次")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
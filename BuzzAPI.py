@@ -9,8 +9,488 @@ Buzz转录服务API封装
 import requests
 import time
 import os
+import re
 import json
+import queue
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
+from FileCache import FileCache, DEFAULT_CACHE_ROOT, hash_file, make_cache_key
+from OutputNaming import allocate_backup_path, release_path
+from AudioEncode import AUDIO_FORMATS, detect_audio_format, encode_audio, get_audio_mime_type
+from SrtUtils import parse_srt, format_srt, split_srt_by_segments
+from WavConcat import (
+    WAVE_FORMAT_PCM,
+    build_wav_header,
+    concatenate_wav_files,
+    get_audio_format,
+    read_wav_header,
+    validate_wav_headers
+)
+import WavNormalize
+from WavNormalize import normalize_wav_file, normalize_wav_segments
+
+# 拼接转录时各音频之间插入的静音时长（秒），让转录结果在分镜边界处断句
+JOIN_GAP_SECONDS = 0.5
+
+# 自适应轮询的最短和最长间隔（秒）
+MIN_POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 10
+
+# 长轮询时服务端每次最多挂起的时间（秒）
+LONG_POLL_TIMEOUT = 30
+
+# 请求超时（秒）：状态和任务查询、下载字幕、上传音频（连接超时, 读取超时）
+# 服务器卡住时请求超时失败，多服务器调度据此判定服务器不可用，不会一直占用工作线程
+REQUEST_TIMEOUT = 10
+DOWNLOAD_TIMEOUT = 60
+UPLOAD_TIMEOUT = (10, 120)
+
+# 流式上传时每次从磁盘读取的字节数
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# 一个服务器上同时提交的转录任务数（服务支持按任务查询状态时）
+MAX_JOBS_IN_FLIGHT = 4
+
+# 转录任务的结束状态
+JOB_FINISHED_STATES = ("completed", "failed")
+
+# 字幕缓存的大小上限
+SRT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 默认的字幕缓存
+_srt_cache = None
+_srt_cache_lock = threading.Lock()
+
+def get_srt_cache():
+    """
+    获取默认的字幕缓存（用户目录下各项目共享，按总大小淘汰最久未使用的字幕）
+    
+    Returns:
+        FileCache: 字幕缓存
+    """
+    global _srt_cache
+    with _srt_cache_lock:
+        if _srt_cache is None:
+            _srt_cache = FileCache(os.path.join(DEFAULT_CACHE_ROOT, "srt"), max_size_bytes=SRT_CACHE_MAX_BYTES,
+                                   extension=".srt")
+        return _srt_cache
+
+def make_srt_cache_key(audio_file, model_id, join_audio=False, preprocess_format=None):
+    """
+    生成字幕缓存键：音频内容的SHA-256加上转录模型/配置标识，与文件路径无关
+    
+    Args:
+        audio_file (str): 音频文件路径
+        model_id (str): 转录服务的模型/配置标识
+        join_audio (bool): 是否为拼接转录（拆分得到的字幕与单独转录的结果不同）
+        preprocess_format (str): 上传前预处理的格式，None表示上传原始音频
+        
+    Returns:
+        str: 缓存键
+    """
+    parts = ["buzz_srt", hash_file(audio_file), model_id, "joined" if join_audio else "single"]
+    if preprocess_format:
+        parts.append(f"preprocess_{preprocess_format}_{WavNormalize.RESAMPLER}")
+    return make_cache_key(*parts)
+
+def put_srt_cache(cache, key, srt_path):
+    """
+    把字幕复制一份存入缓存（不使用硬链接，之后修改项目中的字幕不会影响缓存）
+    
+    Args:
+        cache (FileCache): 字幕缓存
+        key (str): 缓存键
+        srt_path (str): 字幕文件路径
+    """
+    temp_path = os.path.join(cache.cache_dir, f"{key}.{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        shutil.copyfile(srt_path, temp_path)
+        cache.put(key, temp_path, move=True)
+    except OSError as e:
+        print(f"警告: 写入字幕缓存失败 - {str(e)}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def get_srt_journal_path(json_file):
+    """
+    获取项目JSON对应的转录进度日志路径
+    
+    Args:
+        json_file (str): 项目JSON文件路径
+        
+    Returns:
+        str: 日志文件路径，如 Commentary.srt_journal.jsonl
+    """
+    return os.path.splitext(json_file)[0] + ".srt_journal.jsonl"
+
+def make_srt_journal_record(scene_id, audio_path, srt_path):
+    """
+    生成一条转录进度记录，记录音频的大小和修改时间，恢复时据此判断音频是否变化
+    
+    Args:
+        scene_id (str): 分镜ID
+        audio_path (str): 音频文件路径
+        srt_path (str): 字幕文件路径
+        
+    Returns:
+        dict: 进度记录
+    """
+    stat = os.stat(audio_path)
+    return {
+        "scene_id": scene_id,
+        "audio": os.path.abspath(audio_path),
+        "audio_size": stat.st_size,
+        "audio_mtime_ns": stat.st_mtime_ns,
+        "srt_path": os.path.abspath(srt_path)
+    }
+
+def load_srt_journal(journal_path):
+    """
+    读取转录进度日志，崩溃时写了一半的最后一行会被忽略
+    
+    Args:
+        journal_path (str): 日志文件路径
+        
+    Returns:
+        dict: 分镜ID到进度记录的映射，日志不存在时为空
+    """
+    records = {}
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get("scene_id"):
+                    records[record["scene_id"]] = record
+    except OSError:
+        pass
+    return records
+
+def append_srt_journal(journal_path, record):
+    """
+    向转录进度日志追加一条记录并立即落盘
+    
+    Args:
+        journal_path (str): 日志文件路径
+        record (dict): 进度记录
+    """
+    try:
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    except OSError as e:
+        print(f"警告: 写入转录进度日志失败 - {str(e)}")
+
+def is_srt_journal_record_valid(record, audio_path):
+    """
+    判断进度记录是否仍然有效：音频未变化且字幕文件仍然存在
+    
+    Args:
+        record (dict): 进度记录
+        audio_path (str): 当前分镜的音频文件路径
+        
+    Returns:
+        bool: 是否可以直接使用记录中的字幕
+    """
+    stat = os.stat(audio_path)
+    return record.get("audio") == os.path.abspath(audio_path) and \
+        record.get("audio_size") == stat.st_size and \
+        record.get("audio_mtime_ns") == stat.st_mtime_ns and \
+        os.path.exists(record.get("srt_path", ""))
+
+# 上传前预处理的目标格式：16kHz单声道16位PCM，转录模型只需要这个精度
+UPLOAD_AUDIO_FORMAT = (WAVE_FORMAT_PCM, 1, 16000, 2)
+
+# 上传前压缩为Opus时的码率
+UPLOAD_OPUS_BITRATE = "32k"
+
+# 预处理结果缓存的大小上限
+UPLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# 各格式的预处理结果缓存
+_upload_caches = {}
+_upload_caches_lock = threading.Lock()
+
+def get_upload_cache(audio_format):
+    """
+    获取上传预处理结果的缓存（用户目录下共享，每种格式一个缓存目录）
+    
+    Args:
+        audio_format (str): "wav"、"flac"或"opus"
+        
+    Returns:
+        FileCache: 预处理结果缓存
+    """
+    with _upload_caches_lock:
+        if audio_format not in _upload_caches:
+            _upload_caches[audio_format] = FileCache(
+                os.path.join(DEFAULT_CACHE_ROOT, "upload", audio_format),
+                max_size_bytes=UPLOAD_CACHE_MAX_BYTES,
+                extension=AUDIO_FORMATS[audio_format]["extension"]
+            )
+        return _upload_caches[audio_format]
+
+def make_upload_cache_key(audio_file, audio_format):
+    """
+    生成上传预处理结果的缓存键：音频内容的SHA-256加上目标格式
+    
+    Args:
+        audio_file (str): 音频文件路径
+        audio_format (str): "wav"、"flac"或"opus"
+        
+    Returns:
+        str: 缓存键
+    """
+    return make_cache_key("buzz_upload", hash_file(audio_file), list(UPLOAD_AUDIO_FORMAT), audio_format,
+                          WavNormalize.RESAMPLER)
+
+def _preprocess_worker(audio_file, output_path, audio_format):
+    """
+    预处理单个音频（在子进程中运行）：用NumPy重采样为16kHz单声道，再用ffmpeg编码为指定格式
+    
+    Args:
+        audio_file (str): WAV音频文件路径
+        output_path (str): 输出文件路径
+        audio_format (str): "wav"、"flac"或"opus"
+        
+    Returns:
+        tuple: (输出文件路径, 错误信息)，成功时错误信息为None；编码失败时退回16kHz的WAV
+    """
+    try:
+        wav_path = output_path if audio_format == "wav" else os.path.splitext(output_path)[0] + ".16k.wav"
+        header = read_wav_header(audio_file)
+        if get_audio_format(header) == UPLOAD_AUDIO_FORMAT:
+            shutil.copyfile(audio_file, wav_path)
+        else:
+            normalize_wav_file(header, UPLOAD_AUDIO_FORMAT, wav_path)
+        if audio_format == "wav":
+            return output_path, None
+        result = encode_audio(wav_path, output_path, audio_format, bitrate=UPLOAD_OPUS_BITRATE)
+        if result.get("error"):
+            return wav_path, result["error"]
+        os.remove(wav_path)
+        return output_path, None
+    except Exception as e:
+        return None, str(e)
+
+def preprocess_audio_files(audio_files, audio_format="flac", max_workers=None):
+    """
+    上传前批量预处理音频：重采样为16kHz单声道并压缩，多个文件在进程池中并行处理，结果按内容哈希缓存
+    
+    非WAV文件、缺少numpy或处理失败时使用原文件
+    
+    Args:
+        audio_files (list): 音频文件路径列表
+        audio_format (str): 压缩格式，"wav"、"flac"或"opus"，默认"flac"
+        max_workers (int): 进程数，默认为CPU核心数
+        
+    Returns:
+        tuple: (与audio_files顺序一致的待上传文件路径列表, 统计字典{"processed", "cache_hits", "input_bytes", "output_bytes"})
+    """
+    results = list(audio_files)
+    stats = {"processed": 0, "cache_hits": 0, "input_bytes": 0, "output_bytes": 0}
+    if audio_format not in AUDIO_FORMATS:
+        print(f"警告: 不支持的预处理格式 {audio_format}，上传原始音频")
+        return results, stats
+    if WavNormalize.np is None:
+        print("警告: 缺少numpy，跳过上传前的重采样，请安装: pip install numpy")
+        return results, stats
+    
+    cache = get_upload_cache(audio_format)
+    misses = []
+    for index, audio_file in enumerate(audio_files):
+        if detect_audio_format(audio_file) != "wav":
+            continue
+        key = make_upload_cache_key(audio_file, audio_format)
+        cached_path = cache.get(key)
+        if cached_path:
+            results[index] = cached_path
+            stats["cache_hits"] += 1
+        else:
+            misses.append((index, audio_file, key))
+    
+    if misses:
+        work_dir = tempfile.mkdtemp(prefix="buzz_upload_")
+        try:
+            jobs = [(audio_file, os.path.join(work_dir, f"{index}{AUDIO_FORMATS[audio_format]['extension']}"), audio_format)
+                    for index, audio_file, _ in misses]
+            if len(jobs) == 1:
+                outputs = [_preprocess_worker(*jobs[0])]
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+                    outputs = list(executor.map(_preprocess_worker, *zip(*jobs)))
+            for (index, audio_file, key), (output_path, error) in zip(misses, outputs):
+                if error:
+                    print(f"警告: 预处理音频失败 - {audio_file}: {error}")
+                if not output_path:
+                    continue
+                # 编码失败时退回16kHz的WAV，存入WAV格式的缓存
+                if error:
+                    cached_path = get_upload_cache("wav").put(make_upload_cache_key(audio_file, "wav"), output_path, move=True)
+                else:
+                    cached_path = cache.put(key, output_path, move=True)
+                results[index] = cached_path or audio_file
+                stats["processed"] += 1
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    for audio_file, upload_file in zip(audio_files, results):
+        stats["input_bytes"] += os.path.getsize(audio_file)
+        stats["output_bytes"] += os.path.getsize(upload_file)
+    print(f"上传前预处理（16kHz单声道 {audio_format.upper()}）：处理 {stats['processed']} 个，使用缓存 {stats['cache_hits']} 个，"
+          f"{stats['input_bytes'] / 1024 / 1024:.1f} MB -> {stats['output_bytes'] / 1024 / 1024:.1f} MB")
+    return results, stats
+
+class UploadProgress:
+    """
+    多个文件共用的上传进度条
+    
+    并行上传时各线程把进度累加到同一个进度条，避免每个上传各自创建进度条、在控制台上互相覆盖。
+    """
+    
+    def __init__(self, audio_files, desc='上传进度'):
+        """
+        初始化进度条
+        
+        Args:
+            audio_files (list): 待上传的音频文件路径列表，用于计算总字节数
+            desc (str): 进度条描述
+        """
+        total = sum(os.path.getsize(audio_file) for audio_file in audio_files if os.path.exists(audio_file))
+        self.pbar = tqdm(total=total, unit='B', unit_scale=True, unit_divisor=1024, desc=desc, ncols=80)
+        self.lock = threading.Lock()
+        self.started = set()
+    
+    def callback(self, audio_file):
+        """
+        获取单个文件的上传进度回调，同一文件重试上传时总字节数相应增加
+        
+        Args:
+            audio_file (str): 音频文件路径
+            
+        Returns:
+            callable: 进度回调，参数为 (已上传字节数, 文件总字节数)
+        """
+        with self.lock:
+            if audio_file in self.started and os.path.exists(audio_file):
+                self.pbar.total += os.path.getsize(audio_file)
+                self.pbar.refresh()
+            self.started.add(audio_file)
+        last_sent = [0]
+        
+        def update(sent, total):
+            with self.lock:
+                self.pbar.update(sent - last_sent[0])
+                last_sent[0] = sent
+        return update
+    
+    def close(self):
+        """
+        关闭进度条
+        """
+        self.pbar.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class MultipartFileStream:
+    """
+    流式multipart/form-data请求体
+    
+    按需从磁盘读取文件内容，不把整个文件读入内存；提供长度以便requests设置Content-Length，
+    每次被读取时通过回调报告已发送的文件字节数。
+    """
+    
+    def __init__(self, file_path, field_name='file', content_type=None, progress_callback=None):
+        """
+        初始化请求体
+        
+        Args:
+            file_path (str): 要上传的文件路径
+            field_name (str): 表单字段名，默认file
+            content_type (str): 文件的MIME类型，默认按扩展名推断
+            progress_callback (callable): 进度回调，参数为 (已发送字节数, 文件总字节数)
+        """
+        self.boundary = uuid.uuid4().hex
+        # 文件名按HTML5方式直接使用UTF-8，只转义双引号和换行
+        filename = os.path.basename(file_path).replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+        self.preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type or get_audio_mime_type(file_path)}\r\n\r\n'
+        ).encode('utf-8')
+        self.epilogue = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self.file_size = os.path.getsize(file_path)
+        self.total_size = len(self.preamble) + self.file_size + len(self.epilogue)
+        self.progress_callback = progress_callback
+        self.position = 0
+        self.file = open(file_path, 'rb')
+    
+    @property
+    def content_type(self):
+        """
+        请求的Content-Type，包含分隔符
+        """
+        return f'multipart/form-data; boundary={self.boundary}'
+    
+    def __len__(self):
+        return self.total_size
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def read(self, size=-1):
+        """
+        读取请求体的下一段数据
+        
+        Args:
+            size (int): 最多读取的字节数，-1表示读取剩余全部
+            
+        Returns:
+            bytes: 数据，读取完毕时返回空字节串
+        """
+        if size is None or size < 0:
+            size = self.total_size - self.position
+        chunks = []
+        while size > 0 and self.position < self.total_size:
+            file_start = len(self.preamble)
+            file_end = file_start + self.file_size
+            if self.position < file_start:
+                chunk = self.preamble[self.position:self.position + size]
+            elif self.position < file_end:
+                chunk = self.file.read(min(size, file_end - self.position))
+                if not chunk:
+                    raise IOError("上传过程中文件被截断")
+            else:
+                chunk = self.epilogue[self.position - file_end:self.position - file_end + size]
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+        if self.progress_callback:
+            sent = min(max(self.position - len(self.preamble), 0), self.file_size)
+            self.progress_callback(sent, self.file_size)
+        return b''.join(chunks)
+    
+    def close(self):
+        """
+        关闭文件
+        """
+        self.file.close()
+
 
 class BuzzAPI:
     """
@@ -19,15 +499,99 @@ Buzz转录服务API类
     提供与Buzz转录服务交互的方法，包括音频文件上传、转换进程查询和字幕文件下载。
     """
     
-    def __init__(self, base_url):
+    def __init__(self, base_url, model_id=None):
         """
         初始化BuzzAPI实例
         
         Args:
             base_url (str): Buzz转录服务的基础URL，例如 "http://116.62.7.179:10002"
+            model_id (str): 可选的模型/配置标识，用于字幕缓存，默认从服务获取
         """
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
+        self.model_id = model_id
+        self._endpoints = None
+        self.status_request_count = 0
+        # 本地任务表：task_id -> 任务信息
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+    
+    def get_endpoints(self):
+        """
+        获取服务提供的接口列表（根接口返回的endpoints字段），结果会被缓存
+        
+        Returns:
+            dict: 接口到说明的字典，获取失败时返回空字典
+        """
+        if self._endpoints is None:
+            try:
+                response = self.session.get(f"{self.base_url}/", timeout=REQUEST_TIMEOUT)
+                info = response.json() if response.status_code == 200 else {}
+                self._endpoints = info.get('endpoints', {}) or {}
+            except Exception as e:
+                print(f"获取接口列表异常: {str(e)}")
+                self._endpoints = {}
+        return self._endpoints
+    
+    def get_model_id(self):
+        """
+        获取转录服务的模型/配置标识，用作字幕缓存键的一部分
+        
+        优先使用根接口或/status返回的model字段，服务未提供时使用服务地址
+        
+        Returns:
+            str: 模型/配置标识
+        """
+        if self.model_id is None:
+            model_id = None
+            try:
+                response = self.session.get(f"{self.base_url}/", timeout=REQUEST_TIMEOUT)
+                if response.status_code == 200:
+                    info = response.json()
+                    model_id = info.get('model') or info.get('model_name')
+            except Exception as e:
+                print(f"获取模型标识异常: {str(e)}")
+            if not model_id:
+                status = self.get_status() or {}
+                model_id = status.get('model') or status.get('model_name')
+            self.model_id = str(model_id) if model_id else self.base_url
+        return self.model_id
+    
+    def supports_long_poll(self):
+        """
+        服务是否提供长轮询接口 /status/wait
+        
+        Returns:
+            bool: 是否支持长轮询
+        """
+        return any('/status/wait' in endpoint for endpoint in self.get_endpoints())
+    
+    def wait_status_change(self, progress, timeout=LONG_POLL_TIMEOUT):
+        """
+        长轮询服务状态：服务端在进度超过progress或任务结束时立即返回，否则最多挂起timeout秒后返回当前状态
+        
+        Args:
+            progress (int): 客户端已知的进度百分比
+            timeout (float): 服务端最多挂起的时间（秒）
+            
+        Returns:
+            dict: 服务状态，与get_status相同
+            None: 如果请求失败
+        """
+        self.status_request_count += 1
+        try:
+            response = self.session.get(
+                f"{self.base_url}/status/wait",
+                params={"progress": progress, "timeout": timeout},
+                timeout=timeout + 10
+            )
+            if response.status_code == 200:
+                return response.json()
+            print(f"长轮询状态失败: {response.status_code}")
+            return None
+        except Exception as e:
+            print(f"长轮询状态异常: {str(e)}")
+            return None
     
     def get_status(self):
         """
@@ -44,8 +608,9 @@ Buzz转录服务API类
             }
             None: 如果获取状态失败
         """
+        self.status_request_count += 1
         try:
-            response = self.session.get(f"{self.base_url}/status")
+            response = self.session.get(f"{self.base_url}/status", timeout=REQUEST_TIMEOUT)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -55,12 +620,15 @@ Buzz转录服务API类
             print(f"获取状态异常: {str(e)}")
             return None
     
-    def upload_audio(self, audio_file):
+    def upload_audio(self, audio_file, progress_callback=None):
         """
         上传音频文件到转录服务
         
+        文件按块从磁盘流式读取，内存占用与文件大小无关
+        
         Args:
-            audio_file (str): 音频文件路径
+            audio_file (str): 音频文件路径，支持WAV、FLAC和Opus
+            progress_callback (callable): 上传进度回调，参数为 (已上传字节数, 文件总字节数)，默认显示进度条
             
         Returns:
             tuple: (成功标志, 任务ID, 消息, SRT文件路径)
@@ -71,57 +639,79 @@ Buzz转录服务API类
             return False, None, f"文件不存在: {audio_file}", None
         
         try:
-            # 检查服务状态
-            status = self.get_status()
-            if status and status['is_processing']:
-                return False, None, "服务忙，正在处理其他任务", None
-            
-            # 读取文件内容
-            with open(audio_file, 'rb') as f:
-                file_content = f.read()
-            
-            # 准备文件数据
-            files = {'file': (os.path.basename(audio_file), file_content, 'audio/wav')}
+            # 检查服务状态，支持按任务查询状态的服务可以排队，不需要等待空闲
+            if not self.supports_job_status():
+                status = self.get_status()
+                if status and status['is_processing']:
+                    return False, None, "服务忙，正在处理其他任务", None
             
-            # 发送请求
+            if progress_callback is None:
+                with tqdm(total=os.path.getsize(audio_file), unit='B', unit_scale=True, unit_divisor=1024,
+                          desc='上传进度', ncols=80) as pbar:
+                    def progress_callback(sent, total):
+                        pbar.update(sent - pbar.n)
+                    return self._upload(audio_file, progress_callback)
+            return self._upload(audio_file, progress_callback)
+        except Exception as e:
+            return False, None, f"上传异常: {str(e)}", None
+    
+    def _upload(self, audio_file, progress_callback):
+        """
+        以流式multipart请求体上传文件
+        """
+        with MultipartFileStream(audio_file, progress_callback=progress_callback) as body:
             response = self.session.post(
                 f"{self.base_url}/transcribe/upload",
-                files=files,
-                stream=False
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=UPLOAD_TIMEOUT
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return True, result.get('task_id'), result.get('message'), result.get('srt_file')
-            else:
-                return False, None, f"上传失败: {response.status_code} - {response.text}", None
-        except Exception as e:
-            return False, None, f"上传异常: {str(e)}", None
+        
+        if response.status_code == 200:
+            result = response.json()
+            return True, result.get('task_id'), result.get('message'), result.get('srt_file')
+        else:
+            return False, None, f"上传失败: {response.status_code} - {response.text}", None
     
-    def wait_for_completion(self, max_wait=300, check_interval=2):
+    def wait_for_completion(self, max_wait=300, check_interval=None):
         """
         等待转录完成
         
+        服务提供 /status/wait 长轮询接口时，由服务端在进度变化或任务结束时立即返回；
+        否则按进度增长速度估计剩余时间自适应调整轮询间隔，接近完成时缩短间隔，没有进度时逐渐放慢
+        
         Args:
             max_wait (int): 最大等待时间（秒），默认300秒
-            check_interval (int): 检查间隔（秒），默认2秒
+            check_interval (float): 固定的检查间隔（秒），默认None表示使用长轮询或自适应间隔
             
         Returns:
             dict: 完成时的服务状态
             None: 如果超时或出现错误
         """
         start_time = time.time()
+        request_count = self.status_request_count
+        use_long_poll = check_interval is None and self.supports_long_poll()
         
-        print("等待转录完成...")
+        print(f"等待转录完成（{'长轮询' if use_long_poll else '固定间隔' if check_interval else '自适应轮询'}）...")
         
         # 初始化进度条
         with tqdm(total=100, unit='%', desc='转换进度', ncols=80) as pbar:
             last_progress = 0
+            interval = MIN_POLL_INTERVAL
+            # 第一次观察到进度的时间和进度，用于估计进度增长速度
+            first_sample = None
             
             while time.time() - start_time < max_wait:
-                status = self.get_status()
+                if use_long_poll:
+                    remaining_wait = max_wait - (time.time() - start_time)
+                    status = self.wait_status_change(last_progress, min(LONG_POLL_TIMEOUT, max(1, remaining_wait)))
+                    if not status:
+                        print("\n长轮询失败，改为自适应轮询")
+                        use_long_poll = False
+                else:
+                    status = self.get_status()
                 if not status:
-                    time.sleep(check_interval)
+                    time.sleep(check_interval or interval)
                     continue
                 
                 # 更新进度条
@@ -136,15 +726,247 @@ Buzz转录服务API类
                 
                 # 检查是否完成
                 if not status['is_processing']:
-                    print("\n转录已完成")
+                    print(f"\n转录已完成（状态请求 {self.status_request_count - request_count} 次）")
                     pbar.update(100 - last_progress)  # 确保进度条达到100%
                     return status
                 
-                time.sleep(check_interval)
+                if use_long_poll:
+                    continue
+                if check_interval:
+                    time.sleep(check_interval)
+                    continue
+                
+                if first_sample is None:
+                    first_sample = (time.time(), current_progress)
+                interval = self.next_poll_interval(interval, first_sample, current_progress)
+                time.sleep(interval)
             
             print(f"\n超时: 转录在 {max_wait} 秒内未完成")
             return None
     
+    @staticmethod
+    def next_poll_interval(interval, first_sample, progress):
+        """
+        计算自适应轮询的下一次间隔：按进度增长速度估计剩余时间，每次等待剩余时间的四分之一，没有进度时逐渐放慢
+        
+        Args:
+            interval (float): 上一次的间隔（秒）
+            first_sample (tuple): 第一次观察到进度时的 (时间, 进度)
+            progress (int): 当前进度百分比
+            
+        Returns:
+            float: 下一次的间隔（秒）
+        """
+        elapsed = time.time() - first_sample[0]
+        rate = (progress - first_sample[1]) / elapsed if elapsed > 0 else 0
+        if rate > 0:
+            interval = (100 - progress) / rate / 4
+        else:
+            interval *= 1.5
+        return min(max(interval, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+    
+    def supports_job_status(self):
+        """
+        服务是否提供按任务查询状态的接口 /tasks/{task_id}
+        
+        Returns:
+            bool: 是否支持按任务查询状态
+        """
+        return any('/tasks/' in endpoint for endpoint in self.get_endpoints())
+    
+    def submit(self, audio_file, progress_callback=None):
+        """
+        提交转录任务，记录到本地任务表
+        
+        Args:
+            audio_file (str): 音频文件路径
+            progress_callback (callable): 上传进度回调，参数为 (已上传字节数, 文件总字节数)
+            
+        Returns:
+            str: 任务ID
+            None: 如果提交失败
+        """
+        success, task_id, message, srt_file = self.upload_audio(audio_file, progress_callback)
+        if not success:
+            print(f"上传失败: {message}")
+            return None
+        # 服务未返回任务ID时使用本地ID，只能通过全局的is_processing判断是否完成
+        untracked = not task_id
+        if untracked:
+            task_id = f"local_{uuid.uuid4().hex[:12]}"
+        with self.jobs_lock:
+            self.jobs[task_id] = {
+                "task_id": task_id,
+                "server_url": self.base_url,
+                "audio_file": audio_file,
+                "state": "processing" if untracked else "queued",
+                "progress": 0,
+                "srt_file": srt_file,
+                "error": None,
+                "untracked": untracked,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "downloaded_path": None
+            }
+        print(f"已提交任务: {task_id}（{os.path.basename(audio_file)}）")
+        return task_id
+    
+    def _update_job(self, task_id, **fields):
+        """
+        更新本地任务表中的任务信息
+        
+        Returns:
+            dict: 更新后的任务信息副本
+        """
+        with self.jobs_lock:
+            job = self.jobs[task_id]
+            for key, value in fields.items():
+                if value is not None:
+                    job[key] = value
+            if job["state"] in JOB_FINISHED_STATES and not job["finished_at"]:
+                job["finished_at"] = time.time()
+            return dict(job)
+    
+    def get_job_status(self, task_id):
+        """
+        查询单个任务的状态并更新本地任务表
+        
+        服务提供 /tasks/{task_id} 时直接查询；否则从 /status 的任务历史中按task_id查找，
+        不再假设最后一条历史记录就是自己的任务（只有服务未返回任务ID时才退回使用最后一条记录）
+        
+        Args:
+            task_id (str): 任务ID
+            
+        Returns:
+            dict: 任务信息，state为 queued、processing、completed 或 failed
+        """
+        with self.jobs_lock:
+            untracked = self.jobs[task_id]["untracked"]
+        if untracked:
+            status = self.get_status()
+            if not status or status.get('is_processing'):
+                return self._update_job(task_id, progress=status.get('progress') if status else None)
+            srt_file = None
+            task_history = status.get('task_history', [])
+            if task_history and isinstance(task_history[-1], dict):
+                srt_file = task_history[-1].get('srt_file')
+            return self._update_job(task_id, state="completed", progress=100, srt_file=srt_file)
+        
+        if self.supports_job_status():
+            self.status_request_count += 1
+            try:
+                response = self.session.get(f"{self.base_url}/tasks/{task_id}", timeout=REQUEST_TIMEOUT)
+                if response.status_code == 404:
+                    return self._update_job(task_id, state="failed", error="服务端不存在该任务")
+                if response.status_code == 200:
+                    result = response.json()
+                    return self._update_job(task_id, state=result.get('status'), progress=result.get('progress'),
+                                            srt_file=result.get('srt_file'), error=result.get('error'))
+                print(f"查询任务状态失败: {response.status_code}")
+            except Exception as e:
+                print(f"查询任务状态异常: {str(e)}")
+            return self._update_job(task_id)
+        
+        status = self.get_status()
+        if not status:
+            return self._update_job(task_id)
+        for entry in reversed(status.get('task_history', [])):
+            if isinstance(entry, dict) and entry.get('task_id') == task_id:
+                failed = entry.get('status') in ('failed', 'error') or entry.get('error')
+                return self._update_job(task_id, state="failed" if failed else "completed", progress=100,
+                                        srt_file=entry.get('srt_file'), error=entry.get('error'))
+        if status.get('last_task_id') == task_id:
+            if status.get('is_processing'):
+                return self._update_job(task_id, state="processing", progress=status.get('progress', 0))
+            return self._update_job(task_id, state="completed", progress=100)
+        return self._update_job(task_id)
+    
+    def wait_for_job(self, task_id, max_wait=300):
+        """
+        等待单个任务结束或超时
+        
+        服务提供 /status/wait 长轮询接口时，由服务端在进度变化或任务结束时唤醒后再查询该任务；
+        长轮询失败或立即返回（服务空闲、任务排队中）时按自适应间隔轮询
+        
+        Args:
+            task_id (str): 任务ID
+            max_wait (int): 最大等待时间（秒），默认300秒
+            
+        Returns:
+            dict: 任务信息，超时时state保持未结束状态
+        """
+        start_time = time.time()
+        interval = MIN_POLL_INTERVAL
+        first_sample = None
+        use_long_poll = self.supports_long_poll()
+        # 长轮询以服务端当前进度为基准，而不是本任务的进度（排队中的任务进度始终为0）
+        server_progress = 0
+        job = self.get_job_status(task_id)
+        while job["state"] not in JOB_FINISHED_STATES and time.time() - start_time < max_wait:
+            if job["state"] == "processing" and first_sample is None:
+                first_sample = (time.time(), job["progress"])
+            if first_sample:
+                interval = self.next_poll_interval(interval, first_sample, job["progress"])
+            else:
+                interval = min(interval * 1.5, MAX_POLL_INTERVAL)
+            
+            if use_long_poll:
+                remaining_wait = max_wait - (time.time() - start_time)
+                poll_start = time.time()
+                status = self.wait_status_change(server_progress, min(LONG_POLL_TIMEOUT, max(1, remaining_wait)))
+                if not status:
+                    print("长轮询失败，改为自适应轮询")
+                    use_long_poll = False
+                    time.sleep(interval)
+                else:
+                    server_progress = status.get('progress', 0)
+                    # 服务端立即返回说明没有可等待的变化，避免空转
+                    if time.time() - poll_start < MIN_POLL_INTERVAL:
+                        time.sleep(interval)
+            else:
+                time.sleep(interval)
+            job = self.get_job_status(task_id)
+        return job
+    
+    def fetch_result(self, task_id, output_folder='.'):
+        """
+        下载已完成任务的SRT文件
+        
+        Args:
+            task_id (str): 任务ID
+            output_folder (str): 输出文件夹路径，默认当前目录
+            
+        Returns:
+            str: 下载后的SRT文件路径
+            None: 如果任务未完成或下载失败
+        """
+        with self.jobs_lock:
+            job = dict(self.jobs[task_id])
+        if job["state"] != "completed":
+            print(f"任务 {task_id} 未完成: {job['state']} {job['error'] or ''}")
+            return None
+        if not job["srt_file"]:
+            print(f"错误: 任务 {task_id} 未找到SRT文件路径")
+            return None
+        downloaded_path = self.download_srt(job["srt_file"], output_folder)
+        self._update_job(task_id, downloaded_path=downloaded_path)
+        return downloaded_path
+    
+    def get_jobs(self, active_only=False):
+        """
+        获取本地任务表
+        
+        Args:
+            active_only (bool): 是否只返回未结束的任务
+            
+        Returns:
+            list: 任务信息副本列表，按提交时间排序
+        """
+        with self.jobs_lock:
+            jobs = [dict(job) for job in self.jobs.values()
+                    if not active_only or job["state"] not in JOB_FINISHED_STATES]
+        return sorted(jobs, key=lambda job: job["submitted_at"])
+    
     def download_srt(self, srt_file, output_folder='.'):
         """
         下载SRT字幕文件
@@ -166,7 +988,7 @@ Buzz转录服务API类
             os.makedirs(output_folder, exist_ok=True)
             
             # 下载文件
-            response = self.session.get(f"{self.base_url}/download/{srt_file}")
+            response = self.session.get(f"{self.base_url}/download/{srt_file}", timeout=DOWNLOAD_TIMEOUT)
             if response.status_code == 200:
                 # 生成下载路径
                 filename = f"downloaded_{srt_file}"
@@ -186,7 +1008,7 @@ Buzz转录服务API类
             print(f"下载异常: {str(e)}")
             return None
     
-    def transcribe_audio(self, audio_file, output_folder='.', max_wait=300):
+    def transcribe_audio(self, audio_file, output_folder='.', max_wait=300, progress_callback=None):
         """
         完整的音频转录流程
         
@@ -194,6 +1016,7 @@ Buzz转录服务API类
             audio_file (str): 音频文件路径
             output_folder (str): 输出文件夹路径，默认当前目录
             max_wait (int): 最大等待时间（秒），默认300秒
+            progress_callback (callable): 上传进度回调，默认显示该文件的上传进度条
             
         Returns:
             str: 下载后的SRT文件路径
@@ -204,38 +1027,22 @@ Buzz转录服务API类
         
         # 1. 上传音频文件
         print("1. 上传音频文件...")
-        success, task_id, message, srt_file = self.upload_audio(audio_file)
+        task_id = self.submit(audio_file, progress_callback)
         
-        if not success:
-            print(f"上传失败: {message}")
+        if not task_id:
             return None
         
-        print(f"上传成功: {message}")
-        if task_id:
-            print(f"任务ID: {task_id}")
-        
-        # 2. 等待转录完成
+        # 2. 等待转录完成，按任务ID跟踪状态
         print("\n2. 等待转录完成...")
-        status = self.wait_for_completion(max_wait=max_wait)
+        job = self.wait_for_job(task_id, max_wait=max_wait)
         
-        if not status:
-            print("转录未完成或超时")
+        if job["state"] != "completed":
+            print(f"转录未完成或超时: {job['state']} {job['error'] or ''}")
             return None
         
         # 3. 下载SRT文件
         print("\n3. 下载SRT文件...")
-        if not srt_file:
-            # 如果上传时没有返回SRT文件路径，尝试从状态中获取
-            task_history = status.get('task_history', [])
-            if task_history:
-                last_task = task_history[-1]
-                srt_file = last_task.get('srt_file')
-        
-        if not srt_file:
-            print("错误: 未找到SRT文件路径")
-            return None
-        
-        downloaded_path = self.download_srt(srt_file, output_folder)
+        downloaded_path = self.fetch_result(task_id, output_folder)
         
         print("\n" + "=" * 60)
         if downloaded_path:
@@ -245,7 +1052,158 @@ Buzz转录服务API类
         
         return downloaded_path
     
-    def batch_transcribe_from_json(self, json_file, output_folder='.', max_wait=300):
+    def transcribe_files(self, audio_files, output_folder='.', max_wait=300, max_in_flight=MAX_JOBS_IN_FLIGHT):
+        """
+        转录多个音频文件
+        
+        服务支持按任务查询状态时，最多同时提交max_in_flight个任务，前面的任务转录时继续上传后面的音频；
+        否则依次转录
+        
+        Args:
+            audio_files (list): 音频文件路径列表
+            output_folder (str): 输出文件夹路径，默认当前目录
+            max_wait (int): 每个文件的最大等待时间（秒），默认300秒
+            max_in_flight (int): 同时提交的任务数
+            
+        Yields:
+            tuple: (音频在列表中的序号, 服务器地址, 下载后的SRT文件路径或None)，按完成顺序
+        """
+        with UploadProgress(audio_files) as upload_progress:
+            yield from self._transcribe_files(audio_files, output_folder, max_wait, max_in_flight, upload_progress)
+    
+    def _transcribe_files(self, audio_files, output_folder, max_wait, max_in_flight, upload_progress):
+        """
+        transcribe_files的实现，所有文件的上传进度汇总到upload_progress
+        """
+        if not self.supports_job_status():
+            for index, audio_file in enumerate(audio_files):
+                yield index, self.base_url, self.transcribe_audio(audio_file, output_folder, max_wait,
+                                                                  upload_progress.callback(audio_file))
+            return
+        
+        pending = list(enumerate(audio_files))
+        pending.reverse()
+        in_flight = {}
+        interval = MIN_POLL_INTERVAL
+        while pending or in_flight:
+            # 补充提交任务
+            while pending and len(in_flight) < max_in_flight:
+                index, audio_file = pending.pop()
+                task_id = self.submit(audio_file, upload_progress.callback(audio_file))
+                if not task_id:
+                    yield index, self.base_url, None
+                    continue
+                in_flight[task_id] = index
+            
+            # 查询各任务状态，结束的任务下载结果
+            finished = False
+            for task_id, index in list(in_flight.items()):
+                job = self.get_job_status(task_id)
+                if job["state"] in JOB_FINISHED_STATES or time.time() - job["submitted_at"] > max_wait:
+                    del in_flight[task_id]
+                    finished = True
+                    if job["state"] == "completed":
+                        yield index, self.base_url, self.fetch_result(task_id, output_folder)
+                    else:
+                        print(f"任务 {task_id} 失败或超时: {job['state']} {job['error'] or ''}")
+                        yield index, self.base_url, None
+            
+            if in_flight and not finished:
+                interval = min(interval * 1.5, MAX_POLL_INTERVAL)
+                time.sleep(interval)
+            else:
+                interval = MIN_POLL_INTERVAL
+    
+    def transcribe_files_joined(self, audio_files, output_folder='.', max_wait=300, gap_seconds=JOIN_GAP_SECONDS,
+                                preprocess_format=None):
+        """
+        把多个WAV音频拼接为一个文件只转录一次，再按各音频在拼接文件中的起止时间把字幕拆分回每个音频
+        
+        省去每个音频单独上传、模型预热、轮询和下载的开销，适合大量短分镜
+        
+        Args:
+            audio_files (list): WAV音频文件路径列表
+            output_folder (str): 输出文件夹路径，默认当前目录
+            max_wait (int): 每个音频的最大等待时间（秒），拼接文件的最大等待时间按音频数量累加
+            gap_seconds (float): 各音频之间插入的静音时长（秒）
+            preprocess_format (str): 上传前把拼接后的音频重采样为16kHz单声道并压缩的格式，None表示不处理
+            
+        Yields:
+            tuple: (音频在列表中的序号, 服务器地址, 拆分后的SRT文件路径或None)
+        """
+        if not audio_files:
+            return
+        if any(detect_audio_format(audio_file) != "wav" for audio_file in audio_files):
+            print("存在非WAV音频，无法拼接，改为逐个转录")
+            yield from self.transcribe_files(audio_files, output_folder, max_wait)
+            return
+        
+        os.makedirs(output_folder, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix="buzz_joined_")
+        try:
+            # 1. 读取文件头，参数不一致时统一格式
+            headers, mismatched = validate_wav_headers(audio_files)
+            if mismatched:
+                headers, _ = normalize_wav_segments(headers)
+            format_tag, channels, sample_rate, sample_width = get_audio_format(headers[0])
+            
+            # 2. 生成静音片段，记录每个音频在拼接文件中的起止时间
+            gap_frames = int(gap_seconds * sample_rate)
+            gap_size = gap_frames * channels * sample_width
+            gap_path = os.path.join(work_dir, "gap.wav")
+            with open(gap_path, 'wb') as f:
+                f.write(build_wav_header(format_tag, channels, sample_rate, sample_width, gap_size))
+                # 8位PCM是无符号数，静音为0x80
+                f.write((b'\x80' if sample_width == 1 else b'\x00') * gap_size)
+            gap_header = read_wav_header(gap_path)
+            
+            joined_headers = []
+            segments = []
+            position = 0.0
+            for i, header in enumerate(headers):
+                if i > 0:
+                    joined_headers.append(gap_header)
+                    position += gap_frames / sample_rate
+                duration = header["frames"] / sample_rate
+                joined_headers.append(header)
+                segments.append((position, position + duration))
+                position += duration
+            
+            joined_path = os.path.join(work_dir, f"joined_{len(audio_files)}.wav")
+            concatenate_wav_files([header["path"] for header in joined_headers], joined_path, headers=joined_headers)
+            print(f"已拼接 {len(audio_files)} 个音频，总时长 {position:.1f} 秒")
+            if preprocess_format:
+                joined_path = preprocess_audio_files([joined_path], preprocess_format)[0][0]
+            
+            # 3. 转录拼接后的音频
+            server_url, joined_srt = None, None
+            for _, server_url, joined_srt in self.transcribe_files([joined_path], output_folder,
+                                                                    max_wait * len(audio_files)):
+                pass
+            if not joined_srt:
+                for index in range(len(audio_files)):
+                    yield index, server_url, None
+                return
+            
+            # 4. 按起止时间拆分字幕
+            with open(joined_srt, 'r', encoding='utf-8') as f:
+                entries = parse_srt(f.read())
+            os.remove(joined_srt)
+            split_entries = split_srt_by_segments(entries, segments)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        for index, (audio_file, shot_entries) in enumerate(zip(audio_files, split_entries)):
+            if not shot_entries:
+                print(f"警告: 第 {index + 1} 个音频没有识别到字幕 - {audio_file}")
+            srt_path = os.path.join(output_folder,
+                                    f"joined_{index + 1}_{os.path.splitext(os.path.basename(audio_file))[0]}.srt")
+            with open(srt_path, 'w', encoding='utf-8') as f:
+                f.write(format_srt(shot_entries))
+            yield index, server_url, srt_path
+    
+    def batch_transcribe_from_json(self, json_file, output_folder='.', max_wait=300, join_audio=False, use_cache=True,
+                                   preprocess_format=None):
         """
         批量转换音频到字幕文件
         
@@ -253,6 +1211,12 @@ Buzz转录服务API类
             json_file (str): 包含分镜信息的JSON文件路径
             output_folder (str): 输出文件夹路径，默认当前目录
             max_wait (int): 最大等待时间（秒），默认300秒
+            join_audio (bool): 是否把所有待转录分镜的音频拼接为一个文件只转录一次，再按分镜拆分字幕
+            use_cache (bool): 是否使用按音频内容缓存的字幕，内容相同的音频不再重新转录
+            preprocess_format (str): 上传前把音频重采样为16kHz单声道并压缩的格式（"flac"或"opus"），None表示上传原始音频
+            
+        每个分镜转录完成后立即追加到JSON旁的进度日志（*.srt_journal.jsonl），中断后重新运行时从日志恢复，
+        已完成的分镜不再重新转录；全部完成后原子地写入JSON并删除日志。
             
         Returns:
             bool: 批量转换是否成功
@@ -282,6 +1246,15 @@ Buzz转录服务API类
         
         success_count = 0
         failed_count = 0
+        cache_hits = 0
+        resumed_count = 0
+        pending_scenes = []
+        srt_cache = get_srt_cache() if use_cache else None
+        model_id = self.get_model_id() if use_cache else None
+        journal_path = get_srt_journal_path(json_file)
+        journal = load_srt_journal(journal_path)
+        if journal:
+            print(f"发现转录进度日志，已记录 {len(journal)} 个分镜: {journal_path}")
         
         # 4. 处理每个分镜
         for i, scene_data in enumerate(data):
@@ -295,8 +1268,11 @@ Buzz转录服务API类
                 print(f"分镜 {scene_id} 的SRT_Update_Flag为0，跳过字幕转换")
                 continue
             
-            # 4.2 检查audio字段
+            # 4.2 检查audio字段，有压缩导出的FLAC/Opus音频时优先上传，减少传输量（上传前预处理时使用原始WAV重采样）
             audio_path = scene_data.get('audio')
+            encoded_audio_path = scene_data.get('audio_encoded')
+            if encoded_audio_path and os.path.exists(encoded_audio_path) and not join_audio and not preprocess_format:
+                audio_path = encoded_audio_path
             if not audio_path:
                 print(f"警告: 分镜 {scene_id} 缺少audio字段，跳过")
                 failed_count += 1
@@ -320,64 +1296,346 @@ Buzz转录服务API类
             srt_filename = os.path.splitext(audio_filename)[0] + '.srt'
             srt_path = os.path.join(output_folder, srt_filename)
             
-            # 4.4 执行转录
-            print(f"转录音频: {audio_filename}")
-            result = self.transcribe_audio(audio_path, output_folder, max_wait)
+            # 4.4 上次中断前已完成的分镜，从进度日志恢复
+            record = journal.get(scene_id)
+            if record and is_srt_journal_record_valid(record, audio_path):
+                scene_data['SRT_Path'] = record["srt_path"]
+                success_count += 1
+                resumed_count += 1
+                print(f"从进度日志恢复: {os.path.basename(record['srt_path'])}")
+                continue
+            
+            # 4.4 按音频内容查询字幕缓存，命中时直接复制，不再转录
+            cache_key = None
+            if srt_cache:
+                cache_key = make_srt_cache_key(audio_path, model_id, join_audio, preprocess_format)
+                cached_srt = srt_cache.get(cache_key)
+                if cached_srt:
+                    shutil.copyfile(cached_srt, srt_path)
+                    scene_data['SRT_Path'] = os.path.abspath(srt_path)
+                    success_count += 1
+                    cache_hits += 1
+                    print(f"使用缓存字幕: {srt_filename}")
+                    continue
             
-            if result:
-                # 4.5 重命名SRT文件
+            print(f"加入转录队列: {audio_filename}")
+            pending_scenes.append((scene_id, scene_data, audio_path, srt_path, cache_key))
+        
+        # 4.5 执行转录，结果按完成顺序返回
+        print(f"\n待转录分镜: {len(pending_scenes)} 个，使用缓存: {cache_hits} 个，从日志恢复: {resumed_count} 个")
+        audio_files = [audio_path for _, _, audio_path, _, _ in pending_scenes]
+        if join_audio:
+            scene_indices = {index: [index] for index in range(len(audio_files))}
+            results = self.transcribe_files_joined(audio_files, output_folder, max_wait,
+                                                   preprocess_format=preprocess_format)
+        else:
+            # 上传前预处理在进程池中并行完成，再分发转录
+            if preprocess_format and audio_files:
+                audio_files, _ = preprocess_audio_files(audio_files, preprocess_format)
+            # 预处理后的文件按内容命名，内容相同的分镜只上传转录一次
+            upload_files = list(dict.fromkeys(audio_files))
+            upload_indices = {audio_file: index for index, audio_file in enumerate(upload_files)}
+            scene_indices = {}
+            for index, audio_file in enumerate(audio_files):
+                scene_indices.setdefault(upload_indices[audio_file], []).append(index)
+            results = self.transcribe_files(upload_files, output_folder, max_wait)
+        # 每个上传文件第一个成功写入的分镜字幕，内容相同的其他分镜从这里复制
+        first_srt_paths = {}
+        for upload_index, server_url, result in results:
+            for index in scene_indices[upload_index]:
+                scene_id, scene_data, audio_path, srt_path, cache_key = pending_scenes[index]
+                srt_filename = os.path.basename(srt_path)
+                if not result:
+                    print(f"失败: 转录分镜 {scene_id} 失败")
+                    failed_count += 1
+                    continue
+                
+                # 4.5 重命名SRT文件（内容相同的其他分镜复制第一个分镜的字幕）
                 if result != srt_path:
                     try:
                         # 如果目标SRT文件已存在，先删除它
                         if os.path.exists(srt_path):
                             os.remove(srt_path)
                             print(f"删除已存在的SRT文件: {srt_filename}")
-                        # 重命名SRT文件
-                        os.rename(result, srt_path)
-                        print(f"重命名SRT文件: {os.path.basename(result)} -> {srt_filename}")
+                        first_srt_path = first_srt_paths.get(upload_index)
+                        if first_srt_path:
+                            shutil.copyfile(first_srt_path, srt_path)
+                            print(f"复制SRT文件: {os.path.basename(first_srt_path)} -> {srt_filename}")
+                        elif os.path.exists(result):
+                            os.rename(result, srt_path)
+                            print(f"重命名SRT文件: {os.path.basename(result)} -> {srt_filename}")
                     except Exception as e:
                         print(f"警告: 重命名SRT文件失败 - {str(e)}")
+                if not os.path.exists(srt_path):
+                    print(f"失败: 分镜 {scene_id} 的SRT文件不存在 - {srt_path}")
+                    failed_count += 1
+                    continue
+                first_srt_paths.setdefault(upload_index, srt_path)
                 
-                # 4.6 更新分镜信息
+                # 4.6 更新分镜信息，记录进度，并把字幕存入缓存
                 scene_data['SRT_Path'] = os.path.abspath(srt_path)
                 success_count += 1
-            else:
-                print(f"失败: 转录分镜 {scene_id} 失败")
-                failed_count += 1
+                append_srt_journal(journal_path, make_srt_journal_record(scene_id, audio_path, srt_path))
+                if srt_cache:
+                    put_srt_cache(srt_cache, cache_key, srt_path)
+                print(f"完成: 分镜 {scene_id}（{server_url}）")
             
         print("\n" + "=" * 80)
         print(f"批量转录完成")
-        print(f"成功: {success_count} 个")
+        print(f"成功: {success_count} 个（其中使用缓存 {cache_hits} 个，从日志恢复 {resumed_count} 个）")
         print(f"失败: {failed_count} 个")
         print("=" * 80)
+        if srt_cache:
+            srt_cache.flush()
         
         # 5. 备份原JSON文件
-        json_dir = os.path.dirname(json_file)
-        json_basename = os.path.basename(json_file)
-        json_name, json_ext = os.path.splitext(json_basename)
-        timestamp = time.strftime('%Y%m%d_%H%M%S')
-        backup_file = os.path.join(json_dir, f"{json_name}_{timestamp}{json_ext}")
-        
         try:
             with open(json_file, 'r', encoding='utf-8') as f:
                 original_content = f.read()
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                f.write(original_content)
+            backup_file = allocate_backup_path(json_file)
+            try:
+                with open(backup_file, 'w', encoding='utf-8') as f:
+                    f.write(original_content)
+            except OSError:
+                release_path(backup_file)
+                raise
             print(f"备份原JSON文件: {backup_file}")
         except Exception as e:
             print(f"警告: 备份JSON文件失败 - {str(e)}")
         
-        # 6. 写入更新后的JSON文件
+        # 6. 先写入临时文件再替换，写入过程中断不会损坏原JSON
+        temp_file = f"{json_file}.{os.getpid()}.tmp"
         try:
-            with open(json_file, 'w', encoding='utf-8') as f:
+            with open(temp_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, json_file)
             print(f"更新JSON文件: {json_file}")
         except Exception as e:
-            print(f"错误: 写入JSON文件失败 - {str(e)}")
+            print(f"错误: 写入JSON文件失败 - {str(e)}，进度已保存在 {journal_path}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
             return False
         
+        # 7. JSON已包含全部进度，删除进度日志
+        if os.path.exists(journal_path):
+            try:
+                os.remove(journal_path)
+            except OSError as e:
+                print(f"警告: 删除转录进度日志失败 - {str(e)}")
+        
         return True
 
+def parse_server_urls(server_url):
+    """
+    解析服务器地址，支持用逗号分隔的多个地址
+    
+    Args:
+        server_url (str|list): 服务器地址字符串或地址列表
+        
+    Returns:
+        list: 去重后的服务器地址列表
+    """
+    if isinstance(server_url, (list, tuple)):
+        urls = [url.strip() for url in server_url if url and url.strip()]
+    else:
+        urls = [url.strip() for url in re.split(r'[,，;；\s]+', server_url or '') if url.strip()]
+    return list(dict.fromkeys(urls))
+
+class BuzzAPIPool:
+    """
+    多服务器Buzz转录调度类
+    
+    每个服务器一个工作线程（支持按任务查询状态的服务器多个），通过/status确认服务器可以接收任务后领取下一个音频，
+    所有服务器同时工作，转录结果按完成顺序返回；失败的音频交给其他服务器重试。
+    """
+    
+    def __init__(self, server_urls, status_interval=2, max_attempts=2, max_status_failures=5):
+        """
+        初始化调度器
+        
+        Args:
+            server_urls (str|list): 服务器地址列表或逗号分隔的地址字符串
+            status_interval (int): 等待服务器空闲时查询/status的间隔（秒），默认2秒
+            max_attempts (int): 每个音频最多尝试的次数，默认2次
+            max_status_failures (int): 连续多少次无法获取状态后停止向该服务器分发任务，默认5次
+        """
+        self.apis = [BuzzAPI(url) for url in parse_server_urls(server_urls)]
+        if not self.apis:
+            raise ValueError("至少需要一个Buzz服务器地址")
+        self.status_interval = status_interval
+        self.max_attempts = max_attempts
+        self.max_status_failures = max_status_failures
+        self.lock = threading.Lock()
+        self.stats = {api.base_url: {"success_count": 0, "error_count": 0, "busy_seconds": 0.0} for api in self.apis}
+    
+    def wait_until_idle(self, api, stop_event):
+        """
+        等待服务器可以接收任务：支持按任务查询状态的服务器可以排队，只需能访问；其他服务器需要空闲
+        
+        Args:
+            api (BuzzAPI): 服务器对应的BuzzAPI实例
+            stop_event (threading.Event): 停止信号
+            
+        Returns:
+            bool: 服务器空闲返回True，服务器连续无法访问或收到停止信号返回False
+        """
+        failures = 0
+        while not stop_event.is_set():
+            status = api.get_status()
+            if status is None:
+                failures += 1
+                if failures >= self.max_status_failures:
+                    return False
+            elif not status.get('is_processing') or api.supports_job_status():
+                return True
+            else:
+                failures = 0
+            stop_event.wait(self.status_interval)
+        return False
+    
+    def transcribe_files(self, audio_files, output_folder='.', max_wait=300):
+        """
+        把多个音频文件分发到所有服务器并行转录
+        
+        Args:
+            audio_files (list): 音频文件路径列表
+            output_folder (str): 输出文件夹路径，默认当前目录
+            max_wait (int): 每个文件的最大等待时间（秒），默认300秒
+            
+        Yields:
+            tuple: (音频在列表中的序号, 服务器地址, 下载后的SRT文件路径或None)，按完成顺序
+        """
+        tasks = queue.Queue()
+        for index in range(len(audio_files)):
+            tasks.put((index, 1))
+        results = queue.Queue()
+        stop_event = threading.Event()
+        remaining = len(audio_files)
+        # 各工作线程并行上传，进度汇总到同一个进度条
+        upload_progress = UploadProgress(audio_files)
+        
+        def worker(api, download_folder):
+            try:
+                while not stop_event.is_set():
+                    try:
+                        index, attempt = tasks.get(timeout=self.status_interval)
+                    except queue.Empty:
+                        # 其他服务器失败的音频可能还会放回队列
+                        continue
+                    if not self.wait_until_idle(api, stop_event):
+                        tasks.put((index, attempt))
+                        if not stop_event.is_set():
+                            print(f"⚠️ Buzz服务器无法访问，停止向其分发任务: {api.base_url}")
+                        return
+                    start_time = time.time()
+                    try:
+                        srt_path = api.transcribe_audio(audio_files[index], download_folder, max_wait,
+                                                        upload_progress.callback(audio_files[index]))
+                    except Exception as e:
+                        print(f"转录异常: {str(e)}")
+                        srt_path = None
+                    with self.lock:
+                        stats = self.stats[api.base_url]
+                        stats["busy_seconds"] += time.time() - start_time
+                        stats["success_count" if srt_path else "error_count"] += 1
+                    results.put((index, api.base_url, srt_path, attempt))
+            finally:
+                results.put((None, api.base_url, None, None))
+        
+        # 支持按任务查询状态的服务器可以同时处理多个任务，每个任务一个工作线程
+        worker_apis = []
+        for api in self.apis:
+            worker_apis += [api] * (MAX_JOBS_IN_FLIGHT if api.supports_job_status() else 1)
+        # 不同服务器可能返回同名SRT，各工作线程下载到独立的子文件夹
+        download_folders = [os.path.join(output_folder, f".buzz_{i + 1}") for i in range(len(worker_apis))]
+        workers = []
+        for api, download_folder in zip(worker_apis, download_folders):
+            thread = threading.Thread(target=worker, args=(api, download_folder), daemon=True)
+            thread.start()
+            workers.append(thread)
+        
+        alive = len(workers)
+        try:
+            while remaining > 0 and alive > 0:
+                index, server_url, srt_path, attempt = results.get()
+                if index is None:
+                    alive -= 1
+                    continue
+                if not srt_path and attempt < self.max_attempts:
+                    print(f"🔄 第 {index + 1} 个音频在 {server_url} 转录失败，重新分发（第 {attempt + 1} 次尝试）")
+                    tasks.put((index, attempt + 1))
+                    continue
+                remaining -= 1
+                yield index, server_url, srt_path
+            
+            # 所有服务器都不可用时，剩余音频全部记为失败
+            while remaining > 0:
+                index, _ = tasks.get_nowait()
+                remaining -= 1
+                yield index, None, None
+        finally:
+            stop_event.set()
+            upload_progress.close()
+            for download_folder in download_folders:
+                try:
+                    os.rmdir(download_folder)
+                except OSError:
+                    pass
+    
+    def transcribe_files_joined(self, audio_files, output_folder='.', max_wait=300, gap_seconds=JOIN_GAP_SECONDS,
+                                preprocess_format=None):
+        """
+        拼接转录，流程与BuzzAPI.transcribe_files_joined相同，拼接后的音频交给任意一个空闲服务器
+        """
+        return BuzzAPI.transcribe_files_joined(self, audio_files, output_folder, max_wait, gap_seconds,
+                                               preprocess_format)
+    
+    def get_model_id(self):
+        """
+        获取所有服务器的模型/配置标识，用作字幕缓存键的一部分
+        
+        Returns:
+            str: 各服务器标识去重排序后的组合
+        """
+        return "|".join(sorted(set(api.get_model_id() for api in self.apis)))
+    
+    def batch_transcribe_from_json(self, json_file, output_folder='.', max_wait=300, join_audio=False, use_cache=True,
+                                   preprocess_format=None):
+        """
+        批量转换音频到字幕文件，流程与BuzzAPI.batch_transcribe_from_json相同，各分镜分发到多个服务器并行转录
+        
+        Args:
+            json_file (str): 包含分镜信息的JSON文件路径
+            output_folder (str): 输出文件夹路径，默认当前目录
+            max_wait (int): 每个分镜的最大等待时间（秒），默认300秒
+            join_audio (bool): 是否拼接为一个文件只转录一次
+            use_cache (bool): 是否使用按音频内容缓存的字幕
+            preprocess_format (str): 上传前重采样为16kHz单声道并压缩的格式，None表示上传原始音频
+            
+        Returns:
+            bool: 批量转换是否成功
+        """
+        result = BuzzAPI.batch_transcribe_from_json(self, json_file, output_folder, max_wait, join_audio, use_cache,
+                                                    preprocess_format)
+        for report in self.get_server_report():
+            print(f"   {report['server_url']}: 成功 {report['success_count']}，失败 {report['error_count']}，"
+                  f"忙碌 {report['busy_seconds']}秒")
+        return result
+    
+    def get_server_report(self):
+        """
+        获取各服务器的转录统计
+        
+        Returns:
+            list: 每个服务器的统计字典，包含server_url、success_count、error_count、busy_seconds
+        """
+        with self.lock:
+            return [{"server_url": server_url, "success_count": stats["success_count"],
+                     "error_count": stats["error_count"], "busy_seconds": round(stats["busy_seconds"], 1)}
+                    for server_url, stats in self.stats.items()]
+
 def transcribe_audio(server_url, audio_file, output_folder='.', max_wait=300):
     """
     便捷函数：转录音频文件
@@ -395,21 +1653,29 @@ def transcribe_audio(server_url, audio_file, output_folder='.', max_wait=300):
     api = BuzzAPI(server_url)
     return api.transcribe_audio(audio_file, output_folder, max_wait)
 
-def batch_transcribe_from_json(server_url, json_file, output_folder='.', max_wait=300):
+def batch_transcribe_from_json(server_url, json_file, output_folder='.', max_wait=300, join_audio=False, use_cache=True,
+                               preprocess_format=None):
     """
     便捷函数：批量转换音频到字幕文件
     
     Args:
-        server_url (str): Buzz转录服务的URL
+        server_url (str|list): Buzz转录服务的URL，多个地址（列表或逗号分隔）时并行使用所有服务器
         json_file (str): 包含分镜信息的JSON文件路径
         output_folder (str): 输出文件夹路径，默认当前目录
         max_wait (int): 最大等待时间（秒），默认300秒
+        join_audio (bool): 是否把所有待转录分镜的音频拼接为一个文件只转录一次，再按分镜拆分字幕
+        use_cache (bool): 是否使用按音频内容缓存的字幕（用户目录下各项目共享）
+        preprocess_format (str): 上传前把音频重采样为16kHz单声道并压缩的格式（"flac"或"opus"），None表示上传原始音频
         
     Returns:
         bool: 批量转换是否成功
     """
-    api = BuzzAPI(server_url)
-    return api.batch_transcribe_from_json(json_file, output_folder, max_wait)
+    server_urls = parse_server_urls(server_url)
+    if len(server_urls) > 1:
+        api = BuzzAPIPool(server_urls)
+    else:
+        api = BuzzAPI(server_urls[0] if server_urls else server_url)
+    return api.batch_transcribe_from_json(json_file, output_folder, max_wait, join_audio, use_cache, preprocess_format)
 
 def test_buzz_api():
     """
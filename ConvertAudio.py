@@ -8,10 +8,13 @@
 # 导入GradioAPI模块
 import sys
 import os
-import tempfile
 import shutil
 import json
-from datetime import datetime
+import re
+import time
+import wave
+import queue
+import threading
 
 # 检查是否在打包环境中
 is_frozen = getattr(sys, 'frozen', False)
@@ -131,36 +134,78 @@ except ImportError:
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from GradioAPI import (
+    TTS_API_change_choices,
     TTS_API_change_sovits_weights,
     TTS_API_change_gpt_weights,
-    TTS_API_get_tts_wav
+    TTS_API_get_tts_wav,
+    place_file
 )
+from FileCache import FileCache, DEFAULT_CACHE_ROOT, hash_file, make_cache_key
+from OutputNaming import allocate_output_path, allocate_backup_path, release_path
+from PathResolver import resolve_ref_wav_path
+from MediaMetadata import MediaMetadataCache
+from AudioEncode import DEFAULT_FFMPEG_PATH, find_ffmpeg, find_audio_file
+from SrtUtils import parse_srt_time, format_srt_time, shift_srt_times
 
 
-def get_ref_wav_path():
+def get_default_output_dir():
     """
-    获取ref.WAV文件的正确路径，支持打包环境和开发环境
+    获取默认的语音输出目录（代码所在目录下的output_audio）
     """
-    # 检查是否在打包环境中
-    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-        # 在打包环境中，从临时目录读取
-        meipass_dir = sys._MEIPASS
-        ref_wav_path = os.path.join(meipass_dir, "ref.WAV")
-        if os.path.exists(ref_wav_path):
-            return ref_wav_path
-        
-        # 如果在temp目录中，尝试查找
-        temp_dir = tempfile.gettempdir()
-        for root, dirs, files in os.walk(temp_dir):
-            if '_MEI' in root and 'ref.WAV' in files:
-                return os.path.join(root, 'ref.WAV')
-        
-        # 如果找不到，返回临时目录中的路径（由gradio_client处理）
-        return os.path.join(temp_dir, "ref.WAV")
-    else:
-        # 在开发环境中，使用脚本所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        return os.path.join(current_dir, "ref.WAV")
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "output_audio")
+
+
+def split_text_by_sentence(text, max_chars=60):
+    """
+    在句子边界处切分长文本，相邻的短句会合并，使每段尽量不超过max_chars个字符
+    :param text: 要切分的文本
+    :param max_chars: 每段的最大字符数（单句超过时不再切分）
+    :return: 文本段列表
+    """
+    # 按句末标点切分，标点（及紧随的引号、括号）保留在句子末尾
+    sentences = [s for s in re.findall(r'[^。！？!?；;…]+[。！？!?；;…]*[”’"』」）)]*', text) if s.strip()]
+    
+    pieces = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces or [text]
+
+
+def join_wav_files(wav_paths, output_path, pause_second=0.3):
+    """
+    按顺序拼接多个WAV文件，片段之间插入静音
+    :param wav_paths: WAV文件路径列表
+    :param output_path: 输出文件路径
+    :param pause_second: 片段之间的静音秒数
+    :return: 输出文件路径
+    """
+    with wave.open(wav_paths[0], 'rb') as first:
+        params = first.getparams()
+    
+    # 8位PCM为无符号数，静音值为0x80
+    silence_byte = b'\x80' if params.sampwidth == 1 else b'\x00'
+    silence = silence_byte * (int(round(pause_second * params.framerate)) * params.sampwidth * params.nchannels)
+    
+    with wave.open(output_path, 'wb') as output:
+        output.setnchannels(params.nchannels)
+        output.setsampwidth(params.sampwidth)
+        output.setframerate(params.framerate)
+        for i, wav_path in enumerate(wav_paths):
+            with wave.open(wav_path, 'rb') as wf:
+                if (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) != \
+                        (params.nchannels, params.sampwidth, params.framerate):
+                    raise ValueError(f"音频参数与第一段不一致: {wav_path}")
+                if i > 0:
+                    output.writeframes(silence)
+                output.writeframes(wf.readframes(wf.getnframes()))
+    return output_path
 
 
 class AudioConverter:
@@ -168,77 +213,200 @@ class AudioConverter:
     音频转换类，用于将文本转换为语音
     """
     
-    def __init__(self, server_url="http://192.168.31.194:9872/"):
+    def __init__(self, server_url="http://192.168.31.194:9872/", cache=None, use_cache=True):
         """
         初始化音频转换类
         :param server_url: Gradio服务器地址
+        :param cache: 可选的FileCache对象，用于缓存生成的语音，默认使用用户目录下的共享缓存
+        :param use_cache: 是否查询缓存，为False时总是重新生成（生成结果仍会写入缓存）
         """
         self.server_url = server_url
+        self.cache = cache if cache is not None else FileCache(os.path.join(DEFAULT_CACHE_ROOT, "tts"))
+        self.use_cache = use_cache
         # 获取ref.WAV文件的正确路径
-        self.default_ref_wav = get_ref_wav_path()
+        self.default_ref_wav = resolve_ref_wav_path()
         print(f"ref.WAV路径: {self.default_ref_wav}")
         print(f"ref.WAV文件是否存在: {os.path.exists(self.default_ref_wav)}")
         # 创建共享的Client对象，避免每次API调用都创建新的连接
         from gradio_client import Client
         self.client = Client(server_url)
+        # 音色配置（SoVITS/GPT模型权重）
+        self.voice_profile = {
+            "sovits_path": "SoVITS_weights_v4/chenhuanVoice_e2_s352_l32.pth",
+            "gpt_path": "GPT_weights_v4/chenhuanVoice-e15.ckpt",
+            "prompt_language": "中文",
+            "text_language": "中文"
+        }
+        # 记录每个服务器上当前已加载的模型权重，键为服务器地址
+        self.loaded_weights = {}
+        # 跳过的模型切换次数
+        self.skipped_weight_switches = 0
     
-    def ConvertBySingleText(self, text):
+    def invalidate_loaded_weights(self, server_url=None):
         """
-        将单条文本转换为语音
-        :param text: 要转换的文本字符串
-        :return: 语音生成结果，包含输出文件路径等信息
+        清除已加载模型权重的记录，下次转换时重新切换
+        在服务器出错或重启后调用
+        :param server_url: 服务器地址，默认为当前服务器
         """
-        print(f"\n开始转换文本为语音")
-        print(f"输入文本: {text}")
-        print(f"服务器地址: {self.server_url}")
+        self.loaded_weights.pop(server_url or self.server_url, None)
+    
+    def ensure_weights(self):
+        """
+        确保服务器上加载的是当前音色配置的模型权重，仅在配置变化时切换
+        :return: 切换失败时返回错误信息，否则返回None
+        """
+        loaded = self.loaded_weights.setdefault(self.server_url, {})
         
-        try:
-            # 1. 调用TTS_API_change_sovits_weights设置SoVITS模型权重
+        # 1. 设置SoVITS模型权重
+        sovits_path = self.voice_profile["sovits_path"]
+        if loaded.get("sovits_path") == sovits_path:
+            self.skipped_weight_switches += 1
+            print(f"\n1. SoVITS模型权重已加载，跳过切换: {sovits_path}")
+        else:
             print("\n1. 设置SoVITS模型权重...")
             sovits_params = {
-                "sovits_path": "SoVITS_weights_v4/chenhuanVoice_e2_s352_l32.pth",
-                "prompt_language": "中文",
-                "text_language": "中文"
+                "sovits_path": sovits_path,
+                "prompt_language": self.voice_profile["prompt_language"],
+                "text_language": self.voice_profile["text_language"]
             }
             sovits_result = TTS_API_change_sovits_weights(self.server_url, sovits_params, self.client)
+            if "error" in sovits_result:
+                self.invalidate_loaded_weights()
+                return sovits_result["error"]
+            # 与原流程保持一致：切换SoVITS后同时重新设置GPT权重
+            loaded.clear()
+            loaded["sovits_path"] = sovits_path
             print(f"SoVITS模型权重设置完成: {sovits_result.get('requested_sovits_path')}")
-            
-            # 2. 调用TTS_API_change_gpt_weights设置GPT模型权重
+        
+        # 2. 设置GPT模型权重
+        gpt_path = self.voice_profile["gpt_path"]
+        if loaded.get("gpt_path") == gpt_path:
+            self.skipped_weight_switches += 1
+            print(f"\n2. GPT模型权重已加载，跳过切换: {gpt_path}")
+        else:
             print("\n2. 设置GPT模型权重...")
             gpt_params = {
-                "gpt_path": "GPT_weights_v4/chenhuanVoice-e15.ckpt"
+                "gpt_path": gpt_path
             }
             gpt_result = TTS_API_change_gpt_weights(self.server_url, gpt_params, self.client)
+            if "error" in gpt_result:
+                self.invalidate_loaded_weights()
+                return gpt_result["error"]
+            loaded["gpt_path"] = gpt_path
             print(f"GPT模型权重设置完成")
+        
+        return None
+    
+    def build_tts_params(self, text):
+        """
+        构建生成语音的参数
+        :param text: 要转换的文本字符串
+        :return: TTS_API_get_tts_wav的输入参数
+        """
+        return {
+            "ref_wav_path": self.default_ref_wav,
+            "prompt_text": "尊敬的各位评委老师，我是电机系陈欢，很荣幸向您汇报。",
+            "prompt_language": "中文",
+            "text_language": "中文",
+            "how_to_cut": "按标点符号切",
+            "top_k": 100,
+            "top_p": 1,
+            "temperature": 0.2,
+            "ref_free": False,
+            "speed": 1.15,
+            "if_freeze": False,
+            "inp_refs": None,
+            "sample_steps": 32,
+            "if_sr": True,
+            "pause_second": 0.2,
+            "text": text  # 添加外部传入的文本参数
+        }
+    
+    def get_cache_key(self, tts_params):
+        """
+        计算语音缓存键，由文本、全部生成参数、模型权重路径和参考音频内容共同决定
+        :param tts_params: TTS_API_get_tts_wav的输入参数
+        :return: 缓存键
+        """
+        params = dict(tts_params)
+        # 参考音频使用文件内容哈希代替路径
+        params["ref_wav_path"] = hash_file(tts_params["ref_wav_path"])
+        if tts_params.get("inp_refs"):
+            params["inp_refs"] = [hash_file(ref) for ref in tts_params["inp_refs"]]
+        return make_cache_key(
+            params,
+            self.voice_profile["sovits_path"],
+            self.voice_profile["gpt_path"]
+        )
+    
+    def ConvertBySingleText(self, text, use_cache=None, output_dir=None):
+        """
+        将单条文本转换为语音
+        :param text: 要转换的文本字符串
+        :param use_cache: 是否查询缓存，默认使用self.use_cache；为False时强制重新生成
+        :param output_dir: 可选的输出目录，生成的语音直接保存到该目录，默认为代码所在目录下的output_audio
+        :return: 语音生成结果，包含输出文件路径等信息
+        """
+        print(f"\n开始转换文本为语音")
+        print(f"输入文本: {text}")
+        print(f"服务器地址: {self.server_url}")
+        
+        if use_cache is None:
+            use_cache = self.use_cache
+        
+        try:
+            tts_params = self.build_tts_params(text)
+            
+            # 0. 查询缓存
+            cache_key = None
+            try:
+                cache_key = self.get_cache_key(tts_params)
+            except OSError as e:
+                print(f"⚠️ 无法计算缓存键，跳过缓存: {str(e)}")
+            
+            if cache_key and use_cache:
+                cached_path = self.cache.get(cache_key)
+                if cached_path:
+                    print(f"✅ 命中缓存: {cached_path}")
+                    target_path = allocate_output_path(output_dir or get_default_output_dir(), ".wav", content=text)
+                    try:
+                        place_file(cached_path, target_path)
+                    except OSError:
+                        # 删除预留的空文件
+                        if os.path.exists(target_path):
+                            os.remove(target_path)
+                        raise
+                    return {
+                        "output_wav_path": cached_path,
+                        "local_audio_path": target_path,
+                        "cache_hit": True
+                    }
+            
+            # 1-2. 设置模型权重（已加载时跳过）
+            weights_error = self.ensure_weights()
+            if weights_error:
+                return {
+                    "error": weights_error,
+                    "output_wav_path": None,
+                    "local_audio_path": None
+                }
             
             # 3. 调用TTS_API_get_tts_wav生成语音
             print("\n3. 生成语音...")
-            tts_params = {
-                "ref_wav_path": self.default_ref_wav,
-                "prompt_text": "尊敬的各位评委老师，我是电机系陈欢，很荣幸向您汇报。",
-                "prompt_language": "中文",
-                "text_language": "中文",
-                "how_to_cut": "按标点符号切",
-                "top_k": 100,
-                "top_p": 1,
-                "temperature": 0.2,
-                "ref_free": False,
-                "speed": 1.15,
-                "if_freeze": False,
-                "inp_refs": None,
-                "sample_steps": 32,
-                "if_sr": True,
-                "pause_second": 0.2,
-                "text": text  # 添加外部传入的文本参数
-            }
-            
-            tts_result = TTS_API_get_tts_wav(self.server_url, tts_params, self.client)
+            tts_result = TTS_API_get_tts_wav(self.server_url, tts_params, self.client, output_dir=output_dir)
+            if tts_result.get("error"):
+                # 服务器可能已重启或出错，下次重新确认模型权重
+                self.invalidate_loaded_weights()
+            elif cache_key and tts_result.get("local_audio_path"):
+                # 写入缓存
+                self.cache.put(cache_key, tts_result["local_audio_path"])
             print(f"语音生成完成")
             
             # 返回生成结果
             return tts_result
             
         except Exception as e:
+            self.invalidate_loaded_weights()
             print(f"文本转语音失败: {str(e)}")
             import traceback
             traceback.print_exc()
@@ -249,68 +417,595 @@ class AudioConverter:
             }
 
 
-def parse_srt_time(time_str):
+class DurationEstimator:
     """
-    解析SRT字幕时间格式 (HH:MM:SS,mmm) 为秒数
-    :param time_str: SRT格式的时间字符串，如 "00:00:01,000"
-    :return: 时间（秒）
+    语音时长估计器，用于合成前预测每条文本的语音时长
+    按 时长×语速 = a×字数 + b×停顿标点数 + c 建模，系数由已有的时长数据（JSON中的duration或WAV文件头）最小二乘拟合
     """
-    parts = time_str.replace(',', '.').split(':')
-    hours = float(parts[0])
-    minutes = float(parts[1])
-    seconds = float(parts[2])
-    return hours * 3600 + minutes * 60 + seconds
+    
+    # 会产生停顿的标点
+    PAUSE_PUNCTUATION = "，,。.！!？?；;：:、…—"
+    # 样本不足时使用的默认系数（每字秒数，每个停顿秒数，常数项）
+    DEFAULT_COEFFICIENTS = (0.22, 0.25, 0.3)
+    # 拟合所需的最少样本数
+    MIN_SAMPLES = 5
+    
+    def __init__(self, speed=1.0):
+        """
+        初始化时长估计器
+        :param speed: 合成语速，训练样本和预测默认使用该语速
+        """
+        self.speed = speed
+        self.samples = []
+        self.coefficients = self.DEFAULT_COEFFICIENTS
+    
+    @classmethod
+    def extract_features(cls, text):
+        """
+        提取文本特征
+        :param text: 文本
+        :return: (字数, 停顿标点数)，字数为汉字数加英文/数字词数
+        """
+        chars = len(re.findall(r'[\u4e00-\u9fff]', text)) + len(re.findall(r'[A-Za-z0-9]+', text))
+        pauses = sum(1 for ch in text if ch in cls.PAUSE_PUNCTUATION)
+        return chars, pauses
+    
+    def add_sample(self, text, duration, speed=None):
+        """
+        添加一个训练样本
+        :param text: 文本
+        :param duration: 实际时长（秒）
+        :param speed: 合成语速，默认使用估计器的语速
+        :return: 是否添加成功（时长无效或文本为空时忽略）
+        """
+        chars, pauses = self.extract_features(text or "")
+        if not duration or duration <= 0 or chars == 0:
+            return False
+        self.samples.append((chars, pauses, duration * (speed or self.speed)))
+        return True
+    
+    def fit(self):
+        """
+        用最小二乘拟合系数，样本不足或结果不合理时保留原系数
+        :return: 拟合后的系数
+        """
+        if len(self.samples) < self.MIN_SAMPLES:
+            return self.coefficients
+        
+        # 构造法方程 (XᵀX)w = Xᵀy 并用高斯消元求解
+        rows = [(chars, pauses, 1.0) for chars, pauses, _ in self.samples]
+        matrix = [[sum(r[i] * r[j] for r in rows) for j in range(3)] for i in range(3)]
+        vector = [sum(r[i] * sample[2] for r, sample in zip(rows, self.samples)) for i in range(3)]
+        for col in range(3):
+            pivot = max(range(col, 3), key=lambda row: abs(matrix[row][col]))
+            if abs(matrix[pivot][col]) < 1e-9:
+                # 特征线性相关（如所有样本停顿数相同），无法拟合
+                return self.coefficients
+            matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+            vector[col], vector[pivot] = vector[pivot], vector[col]
+            for row in range(3):
+                if row != col:
+                    factor = matrix[row][col] / matrix[col][col]
+                    matrix[row] = [a - factor * b for a, b in zip(matrix[row], matrix[col])]
+                    vector[row] -= factor * vector[col]
+        coefficients = tuple(vector[i] / matrix[i][i] for i in range(3))
+        
+        # 每字时长必须为正，停顿时长不能为负
+        if coefficients[0] > 0 and coefficients[1] >= 0:
+            self.coefficients = coefficients
+        return self.coefficients
+    
+    def predict(self, text, speed=None):
+        """
+        预测文本的语音时长
+        :param text: 文本
+        :param speed: 合成语速，默认使用估计器的语速
+        :return: 预测时长（秒）
+        """
+        chars, pauses = self.extract_features(text or "")
+        a, b, c = self.coefficients
+        return round(max(0.0, (a * chars + b * pauses + c) / (speed or self.speed)), 2)
+    
+    def train_from_tasks(self, tasks):
+        """
+        用任务列表中已有的时长训练估计器，时长缺失时读取音频文件的WAV文件头
+        :param tasks: 任务列表，每项包含text，以及duration或audio_path
+        :return: 训练样本数
+        """
+        for task in tasks:
+            duration = task.get("duration") or 0
+            audio_path = task.get("audio_path")
+            if not duration and audio_path and os.path.exists(audio_path):
+                try:
+                    with wave.open(audio_path, 'rb') as wf:
+                        duration = wf.getnframes() / float(wf.getframerate())
+                except (wave.Error, EOFError, OSError):
+                    continue
+            self.add_sample(task.get("text"), duration)
+        self.fit()
+        return len(self.samples)
 
 
-def format_srt_time(seconds):
+class ServerHealth:
     """
-    将秒数格式化为SRT字幕时间格式 (HH:MM:SS,mmm)
-    :param seconds: 时间（秒）
-    :return: SRT格式的时间字符串
+    单个服务器的健康状态（熔断器）
+    连续失败达到阈值或健康检查失败时熔断，熔断期间不再分配任务；冷却时间过后允许重新尝试，
+    健康检查成功则恢复，尝试失败则再次熔断
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace('.', ',')
+    
+    def __init__(self, server_url, failure_threshold=3, cooldown_seconds=30):
+        """
+        初始化服务器健康状态
+        :param server_url: 服务器地址
+        :param failure_threshold: 连续失败多少次后熔断
+        :param cooldown_seconds: 熔断后的冷却秒数
+        """
+        self.server_url = server_url
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.ejection_count = 0
+        self.lock = threading.Lock()
+        # 熔断时的回调，参数为服务器地址，AudioConverterPool据此立即重新分配该服务器上正在执行的任务
+        self.on_trip = None
+    
+    @property
+    def state(self):
+        """
+        熔断器状态：closed（正常）、open（熔断中）、half_open（冷却结束，允许尝试）
+        """
+        with self.lock:
+            return self._state()
+    
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at < self.cooldown_seconds:
+            return "open"
+        return "half_open"
+    
+    def allow_request(self):
+        """
+        是否可以向该服务器分配任务
+        """
+        return self.state != "open"
+    
+    def record_success(self):
+        """
+        记录一次成功请求
+        """
+        with self.lock:
+            self.consecutive_failures = 0
+            if self.opened_at is not None:
+                self.opened_at = None
+                print(f"💚 服务器已恢复: {self.server_url}")
+    
+    def record_failure(self, reason=""):
+        """
+        记录一次失败请求，连续失败达到阈值或处于尝试状态时熔断
+        :param reason: 失败原因
+        """
+        with self.lock:
+            self.consecutive_failures += 1
+            if self._state() == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self._trip(reason)
+    
+    def trip(self, reason=""):
+        """
+        立即熔断（请求超时或健康检查失败时调用）
+        :param reason: 熔断原因
+        """
+        with self.lock:
+            self._trip(reason)
+    
+    def _trip(self, reason):
+        newly_opened = self._state() != "open"
+        if newly_opened:
+            self.ejection_count += 1
+            print(f"🔌 服务器已熔断 {self.cooldown_seconds} 秒: {self.server_url} {reason}")
+        self.opened_at = time.time()
+        if newly_opened and self.on_trip is not None:
+            self.on_trip(self.server_url)
+    
+    def record_probe_success(self):
+        """
+        记录一次成功的健康检查，冷却时间过后才恢复，避免服务器刚出故障就被重新启用
+        """
+        with self.lock:
+            if self._state() == "half_open":
+                self.opened_at = None
+                self.consecutive_failures = 0
+                print(f"💚 健康检查通过，服务器已恢复: {self.server_url}")
 
 
-def shift_srt_times(srt_content, offset):
+class AudioConverterPool:
     """
-    对SRT字幕内容应用时间轴偏移
-    :param srt_content: SRT字幕文件内容
-    :param offset: 时间轴偏移（秒）
-    :return: 应用了时间轴偏移的SRT字幕内容
+    多服务器音频转换池
+    每个服务器对应一个AudioConverter（各自持有gradio_client.Client），空闲的服务器从队列中领取下一条任务
     """
-    lines = srt_content.split('\n')
-    shifted_lines = []
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # 检查是否是时间轴行
-        if '-->' in line:
-            # 解析时间轴
-            time_range = line.split(' --> ')
-            if len(time_range) == 2:
-                start_time = parse_srt_time(time_range[0])
-                end_time = parse_srt_time(time_range[1])
+    
+    def __init__(self, server_urls, use_cache=True, request_timeout=180, max_attempts=3,
+                 probe_interval=10, probe_timeout=5, failure_threshold=3, cooldown_seconds=30, cache=None):
+        """
+        初始化多服务器音频转换池
+        :param server_urls: Gradio服务器地址列表，也可以是单个地址字符串
+        :param use_cache: 是否查询语音缓存，为False时强制重新生成
+        :param request_timeout: 单个请求的超时秒数，超时后熔断该服务器并把任务交给其他服务器
+        :param max_attempts: 每条任务最多尝试的次数（含首次）
+        :param probe_interval: 健康检查间隔秒数
+        :param probe_timeout: 健康检查超时秒数
+        :param failure_threshold: 连续失败多少次后熔断服务器
+        :param cooldown_seconds: 熔断后的冷却秒数
+        :param cache: 可选的FileCache对象，默认使用用户目录下的共享缓存
+        """
+        if isinstance(server_urls, str):
+            server_urls = [server_urls]
+        
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.cooldown_seconds = cooldown_seconds
+        
+        # 所有服务器共享同一个语音缓存
+        self.cache = cache if cache is not None else FileCache(os.path.join(DEFAULT_CACHE_ROOT, "tts"))
+        self.converters = []
+        self.server_stats = {}
+        self.server_health = {}
+        for server_url in server_urls:
+            try:
+                converter = AudioConverter(server_url=server_url, cache=self.cache, use_cache=use_cache)
+            except Exception as e:
+                print(f"⚠️ 无法连接服务器 {server_url}，已跳过: {str(e)}")
+                continue
+            self.converters.append(converter)
+            self.server_stats[server_url] = {
+                "success_count": 0,
+                "error_count": 0,
+                "busy_seconds": 0.0
+            }
+            self.server_health[server_url] = ServerHealth(server_url, failure_threshold, cooldown_seconds)
+        
+        if not self.converters:
+            raise RuntimeError("没有可用的转音频服务器")
+        
+        self.stats_lock = threading.Lock()
+        # 正在进行的健康检查线程，键为服务器地址，上一次检查未结束时不再重复发起
+        self.probe_threads = {}
+    
+    @property
+    def skipped_weight_switches(self):
+        """
+        所有服务器跳过的模型切换次数之和
+        """
+        return sum(converter.skipped_weight_switches for converter in self.converters)
+    
+    def convert_all(self, texts, output_dir=None, split_long_text=False, max_chars=60, estimator=None):
+        """
+        使用所有服务器并发转换多条文本
+        失败或超时的任务会重新放回队列，由其他健康的服务器重试；服务器熔断时其正在执行的任务立即重新分配，
+        熔断中的服务器不再领取任务
+        :param texts: 文本列表
+        :param output_dir: 可选的输出目录，生成的语音直接保存到该目录
+        :param split_long_text: 是否在句子边界处切分长文本，各段分发到多个服务器并发合成后再拼接
+        :param max_chars: 切分时每段的最大字符数
+        :param estimator: 可选的DurationEstimator，提供时按预测时长从长到短分配任务，避免长任务拖慢收尾
+        :return: 生成器，按完成顺序产出 (文本索引, 服务器地址, 转换结果)
+        """
+        # 每条文本切分为若干段，所有段放入同一个队列，由空闲的服务器领取
+        task_queue = queue.Queue()
+        piece_counts = []
+        piece_texts = {}
+        for index, text in enumerate(texts):
+            pieces = split_text_by_sentence(text, max_chars) if split_long_text else [text]
+            piece_counts.append(len(pieces))
+            for piece_index, piece in enumerate(pieces):
+                piece_texts[(index, piece_index)] = piece
+        keys = list(piece_texts)
+        if estimator is not None:
+            keys.sort(key=lambda key: estimator.predict(piece_texts[key]), reverse=True)
+        for index, piece_index in keys:
+            task_queue.put((index, piece_index, 1))
+        result_queue = queue.Queue()
+        finished = threading.Event()
+        
+        # 正在执行的任务，键为 (文本索引, 段索引)，值为 (服务器地址, 尝试次数, 开始时间)
+        in_flight = {}
+        # 每段最新一次尝试的次数，旧尝试（已判定超时）的失败结果会被忽略
+        latest_attempts = {key: 1 for key in piece_texts}
+        in_flight_lock = threading.Lock()
+        
+        def worker(converter):
+            health = self.server_health[converter.server_url]
+            while not finished.is_set():
+                if not health.allow_request():
+                    finished.wait(0.5)
+                    continue
+                try:
+                    index, piece_index, attempt = task_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
                 
-                # 应用偏移
-                shifted_start = start_time + offset
-                shifted_end = end_time + offset
+                with in_flight_lock:
+                    if latest_attempts[(index, piece_index)] != attempt:
+                        # 该段已由其他服务器完成或已重新分配
+                        continue
+                    in_flight[(index, piece_index)] = (converter.server_url, attempt, time.time())
                 
-                # 格式化回SRT时间格式
-                shifted_time_line = f"{format_srt_time(shifted_start)} --> {format_srt_time(shifted_end)}"
-                shifted_lines.append(shifted_time_line)
-                i += 1
-                continue
+                start_time = time.time()
+                try:
+                    result = converter.ConvertBySingleText(piece_texts[(index, piece_index)], output_dir=output_dir)
+                except Exception as e:
+                    result = {
+                        "error": str(e),
+                        "output_wav_path": None,
+                        "local_audio_path": None
+                    }
+                elapsed = time.time() - start_time
+                result["elapsed_seconds"] = round(elapsed, 3)
+                
+                with self.stats_lock:
+                    stats = self.server_stats[converter.server_url]
+                    stats["busy_seconds"] += elapsed
+                    if result.get("error"):
+                        stats["error_count"] += 1
+                    else:
+                        stats["success_count"] += 1
+                if result.get("error"):
+                    health.record_failure(result["error"])
+                else:
+                    health.record_success()
+                
+                result_queue.put(("result", index, piece_index, attempt, converter.server_url, result))
+        
+        # 服务器熔断（健康检查失败或连续请求失败）时通知主循环
+        for health in self.server_health.values():
+            health.on_trip = lambda server_url: result_queue.put(("tripped", server_url))
+        
+        threads = [threading.Thread(target=worker, args=(converter,), daemon=True)
+                   for converter in self.converters]
+        threads.append(threading.Thread(target=self._probe_loop, args=(finished,), daemon=True))
+        for thread in threads:
+            thread.start()
+        
+        def retry_or_fail(key, attempt, server_url, error):
+            """
+            任务失败时放回队列重试，次数用完则返回最终的失败结果
+            """
+            if attempt < self.max_attempts:
+                latest_attempts[key] = attempt + 1
+                print(f"🔁 分镜 {key[0] + 1} 在 {server_url} 上失败，重新分配（第 {attempt + 1} 次尝试）: {error}")
+                task_queue.put((key[0], key[1], attempt + 1))
+                return None
+            return {
+                "error": f"重试 {attempt} 次后仍失败: {error}",
+                "output_wav_path": None,
+                "local_audio_path": None
+            }
+        
+        def requeue_in_flight(is_stale):
+            """
+            把满足条件的正在执行的任务重新分配，返回次数用完的最终失败结果
+            :param is_stale: 判断函数，参数为 (服务器地址, 开始时间)，返回失败原因，None表示不处理
+            """
+            finals = []
+            with in_flight_lock:
+                for key, (url, attempt, started) in list(in_flight.items()):
+                    error = is_stale(url, started) if attempt == latest_attempts[key] else None
+                    if error:
+                        del in_flight[key]
+                        final = retry_or_fail(key, attempt, url, error)
+                        if final:
+                            finals.append((key, url, final))
+            return finals
+        
+        def request_timed_out(url, started):
+            # 超时的请求：熔断该服务器，任务交给其他服务器
+            if time.time() - started <= self.request_timeout:
+                return None
+            self.server_health[url].trip(f"（请求超过 {self.request_timeout} 秒未返回）")
+            return "请求超时"
+        
+        # 所有服务器都不健康且持续超过一个冷却周期加一轮健康检查时，不再等待恢复
+        unhealthy_limit = self.cooldown_seconds + self.probe_interval + self.probe_timeout
+        unhealthy_since = None
+        
+        try:
+            # 收集各段结果，一条文本的所有段都完成后再产出
+            piece_results = {}
+            completed = set()
+            while len(completed) < len(piece_texts):
+                try:
+                    event = result_queue.get(timeout=1)
+                except queue.Empty:
+                    event = None
+                
+                finals = []
+                if event is None:
+                    finals = requeue_in_flight(request_timed_out)
+                elif event[0] == "tripped":
+                    # 熔断的服务器上正在执行的任务立即交给其他服务器
+                    tripped_url = event[1]
+                    finals = requeue_in_flight(lambda url, started: "服务器已熔断" if url == tripped_url else None)
+                
+                now = time.time()
+                if any(health.state == "closed" for health in self.server_health.values()):
+                    unhealthy_since = None
+                elif unhealthy_since is None:
+                    unhealthy_since = now
+                elif now - unhealthy_since > unhealthy_limit:
+                    # 所有服务器持续不可用，剩余任务全部判定失败
+                    finals = [(key, "", {
+                        "error": "没有可用的健康服务器",
+                        "output_wav_path": None,
+                        "local_audio_path": None
+                    }) for key in piece_texts if key not in completed]
+                
+                for key, url, final in finals:
+                    if key in completed:
+                        continue
+                    latest_attempts[key] = None
+                    completed.add(key)
+                    yield from self._collect_piece(texts, piece_counts, piece_results, key, url, final, output_dir)
+                if event is None or event[0] != "result":
+                    continue
+                
+                _, index, piece_index, attempt, server_url, result = event
+                key = (index, piece_index)
+                with in_flight_lock:
+                    if in_flight.get(key, (None, None))[1] == attempt:
+                        del in_flight[key]
+                if key in completed or (result.get("error") and attempt != latest_attempts[key]):
+                    # 已判定超时的旧请求返回的结果，已由其他服务器处理
+                    path = result.get("local_audio_path")
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                    continue
+                
+                if result.get("error"):
+                    result = retry_or_fail(key, attempt, server_url, result["error"])
+                    if result is None:
+                        continue
+                
+                # 成功结果（即使来自已判定超时的旧请求）直接采用
+                latest_attempts[key] = None
+                completed.add(key)
+                yield from self._collect_piece(texts, piece_counts, piece_results, key, server_url, result, output_dir)
+        finally:
+            finished.set()
+            for health in self.server_health.values():
+                health.on_trip = None
+            # 本批次命中缓存更新的访问时间一次性写入索引
+            self.cache.flush()
+        
+        for thread in threads:
+            # 卡住的请求所在线程不等待
+            thread.join(timeout=1)
+    
+    def _collect_piece(self, texts, piece_counts, piece_results, key, server_url, result, output_dir=None):
+        """
+        收集一段的最终结果，整条文本的所有段都完成后产出 (文本索引, 服务器地址, 转换结果)
+        """
+        index, piece_index = key
+        if piece_counts[index] == 1:
+            yield index, server_url, result
+            return
+        
+        piece_results.setdefault(index, {})[piece_index] = (server_url, result)
+        if len(piece_results[index]) == piece_counts[index]:
+            pieces = [piece_results.pop(index)[i] for i in range(piece_counts[index])]
+            server_urls = ",".join(sorted({url for url, _ in pieces if url}))
+            yield index, server_urls, self._join_pieces(texts[index], [r for _, r in pieces], output_dir)
+    
+    def _probe_loop(self, finished):
+        """
+        定期对所有服务器进行健康检查，直到转换结束
+        :param finished: 转换结束事件
+        """
+        while not finished.wait(self.probe_interval):
+            for converter in self.converters:
+                threading.Thread(target=self.probe_server, args=(converter,), daemon=True).start()
+    
+    def probe_server(self, converter):
+        """
+        通过获取模型列表（TTS_API_change_choices）对服务器做一次轻量的健康检查
+        :param converter: 服务器对应的AudioConverter
+        :return: 是否健康
+        """
+        health = self.server_health[converter.server_url]
+        probe_thread = self.probe_threads.get(converter.server_url)
+        if probe_thread is not None and probe_thread.is_alive():
+            # 上一次检查仍未返回，不再重复发起
+            health.trip("（健康检查无响应）")
+            return False
         
-        # 其他行直接添加
-        shifted_lines.append(line)
-        i += 1
+        result = {}
+        
+        def probe():
+            result.update(TTS_API_change_choices(converter.server_url, client=converter.client))
+        
+        probe_thread = threading.Thread(target=probe, daemon=True)
+        self.probe_threads[converter.server_url] = probe_thread
+        probe_thread.start()
+        probe_thread.join(self.probe_timeout)
+        if probe_thread.is_alive():
+            health.trip(f"（健康检查超过 {self.probe_timeout} 秒未返回）")
+            return False
+        if result.get("error"):
+            health.trip(f"（健康检查失败: {result['error']}）")
+            return False
+        health.record_probe_success()
+        return True
     
-    return '\n'.join(shifted_lines)
+    def _join_pieces(self, text, piece_results, output_dir=None):
+        """
+        将一条文本各段的合成结果拼接为一个WAV，段间插入pause_second静音
+        :param text: 原始文本
+        :param piece_results: 按顺序排列的各段合成结果
+        :param output_dir: 可选的输出目录
+        :return: 与ConvertBySingleText相同格式的转换结果
+        """
+        piece_paths = [result.get("local_audio_path") for result in piece_results]
+        errors = [result["error"] for result in piece_results if result.get("error")]
+        target_path = None
+        try:
+            if errors:
+                return {
+                    "error": f"分段合成失败: {errors[0]}",
+                    "output_wav_path": None,
+                    "local_audio_path": None
+                }
+            
+            pause_second = self.converters[0].build_tts_params(text)["pause_second"]
+            target_path = allocate_output_path(output_dir or get_default_output_dir(), ".wav", content=text)
+            join_wav_files(piece_paths, target_path, pause_second)
+            print(f"✅ 已拼接 {len(piece_paths)} 段语音: {target_path}")
+            return {
+                "output_wav_path": target_path,
+                "local_audio_path": target_path,
+                "piece_count": len(piece_paths),
+                "cache_hit": all(result.get("cache_hit") for result in piece_results),
+                # 各段并发合成，整条文本的耗时取最慢的一段
+                "elapsed_seconds": max(result.get("elapsed_seconds", 0) for result in piece_results)
+            }
+        except Exception as e:
+            # 删除预留或写了一半的目标文件
+            if target_path and os.path.exists(target_path):
+                os.remove(target_path)
+            return {
+                "error": f"拼接分段语音失败: {str(e)}",
+                "output_wav_path": None,
+                "local_audio_path": None
+            }
+        finally:
+            # 各段的中间文件已拼接或已失败，删除之（缓存中仍保留）
+            for path in piece_paths:
+                if path and os.path.exists(path):
+                    os.remove(path)
+    
+    def get_server_report(self):
+        """
+        获取每个服务器的吞吐量和失败统计
+        :return: 列表，每项包含服务器地址、成功数、失败数、忙碌时长、吞吐量（条/分钟）、熔断状态和熔断次数
+        """
+        report = []
+        with self.stats_lock:
+            for server_url, stats in self.server_stats.items():
+                total = stats["success_count"] + stats["error_count"]
+                busy_seconds = stats["busy_seconds"]
+                throughput = total / busy_seconds * 60 if busy_seconds > 0 else 0
+                health = self.server_health[server_url]
+                report.append({
+                    "server_url": server_url,
+                    "success_count": stats["success_count"],
+                    "error_count": stats["error_count"],
+                    "busy_seconds": round(busy_seconds, 2),
+                    "throughput_per_minute": round(throughput, 2),
+                    "state": health.state,
+                    "ejection_count": health.ejection_count
+                })
+        return report
 
 
 def backup_file(file_path):
@@ -327,19 +1022,15 @@ def backup_file(file_path):
         print(f"⚠️ 文件不存在，无法备份: {file_path}")
         return None
     
-    # 获取文件目录和文件名
-    dir_path = os.path.dirname(file_path)
-    base_name = os.path.basename(file_path)
-    name, ext = os.path.splitext(base_name)
-    
-    # 生成带时间戳的备份文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"{name}_{timestamp}{ext}"
-    backup_path = os.path.join(dir_path, backup_name)
-    
     # 复制文件
     try:
-        shutil.copy2(file_path, backup_path)
+        # 分配带时间戳和序号的备份文件名，同一秒内多次备份也不会互相覆盖
+        backup_path = allocate_backup_path(file_path)
+        try:
+            shutil.copy2(file_path, backup_path)
+        except OSError:
+            release_path(backup_path)
+            raise
         print(f"✅ 文件已备份到: {backup_path}")
         return backup_path
     except Exception as e:
@@ -619,7 +1310,8 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
         
         # 2. 构建输入文件路径
         video_path = os.path.join(json_dir, f"{base_name}.mp4")
-        audio_path = os.path.join(json_dir, f"{base_name}.wav")
+        # 音频可以是WAV或压缩导出的FLAC/Opus，ffmpeg直接读取
+        audio_path = find_audio_file(json_dir, base_name) or os.path.join(json_dir, f"{base_name}.wav")
         srt_path = os.path.join(json_dir, f"{base_name}.srt")
         
         print(f"\n=== 输入文件信息 ===")
@@ -663,11 +1355,11 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
         try:
             # 构建ffmpeg命令
             # 注意：使用指定路径下的ffmpeg可执行文件
-            ffmpeg_path = r"D:\05 SelfMidea\98 SelfDevelopedTools\01 BatchTTS_tool\ffmpeg\bin\ffmpeg.exe"
+            ffmpeg_path = find_ffmpeg()
             
             # 检查ffmpeg可执行文件是否存在
-            if not os.path.exists(ffmpeg_path):
-                print(f"❌ ffmpeg可执行文件不存在: {ffmpeg_path}")
+            if not ffmpeg_path:
+                print(f"❌ ffmpeg可执行文件不存在: {DEFAULT_FFMPEG_PATH}")
                 return None
             
             # 使用subprocess直接调用ffmpeg命令，避免ffmpeg-python库的map参数问题
@@ -681,7 +1373,8 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
             
             # 拷贝文件到临时目录，使用更简单的文件名
             temp_video = os.path.join(temp_dir, "v.mp4")
-            temp_audio = os.path.join(temp_dir, "a.wav")
+            temp_audio_name = "a" + os.path.splitext(audio_path)[1].lower()
+            temp_audio = os.path.join(temp_dir, temp_audio_name)
             temp_subs = os.path.join(temp_dir, "s.srt")
             temp_out = os.path.join(temp_dir, "out.mp4")
             
@@ -699,46 +1392,25 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
             # 创建临时输出文件路径
             temp_output_path = os.path.splitext(output_path)[0] + "_temp" + os.path.splitext(output_path)[1]
             
-            # 步骤1：获取视频和音频的长度
+            # 步骤1：获取视频和音频的长度（从媒体元数据缓存读取，文件未变化时不再调用ffprobe）
+            ffprobe_path = os.path.join(os.path.dirname(ffmpeg_path), "ffprobe.exe")
+            media_cache = MediaMetadataCache.for_project(json_file_path, ffprobe_path=ffprobe_path)
+            
             def get_media_duration(media_path, media_type):
                 """
                 获取媒体文件的长度
                 """
-                try:
-                    # 构建ffprobe命令
-                    ffprobe_path = os.path.join(os.path.dirname(ffmpeg_path), "ffprobe.exe")
-                    if not os.path.exists(ffprobe_path):
-                        print(f"❌ ffprobe可执行文件不存在: {ffprobe_path}")
-                        return None
-                    
-                    # 根据媒体类型构建命令
-                    cmd = [
-                        ffprobe_path,
-                        '-v', 'quiet',
-                        '-show_entries', 'format=duration',
-                        '-of', 'csv=p=0',
-                        media_path
-                    ]
-                    
-                    # 执行命令
-                    result = subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        check=True
-                    )
-                    
-                    # 解析结果
-                    duration = float(result.stdout.strip())
-                    print(f"✅ {media_type}长度: {duration:.2f} 秒")
-                    return duration
-                except Exception as e:
-                    print(f"❌ 获取{media_type}长度失败: {e}")
+                duration = media_cache.get_duration(media_path)
+                if not duration:
+                    print(f"❌ 获取{media_type}长度失败: {media_path}")
                     return None
+                print(f"✅ {media_type}长度: {duration:.2f} 秒")
+                return duration
             
-            # 获取视频和音频长度
-            video_duration = get_media_duration(temp_video, "视频")
-            audio_duration = get_media_duration(temp_audio, "音频")
+            # 获取视频和音频长度（使用原文件路径，临时拷贝的修改时间不同，无法命中缓存）
+            video_duration = get_media_duration(video_path, "视频")
+            audio_duration = get_media_duration(audio_path, "音频")
+            media_cache.save()
             
             # 步骤2：计算速度因子
             speed_factor = 1.0
@@ -771,7 +1443,7 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
                 cmd = [
                     ffmpeg_path,
                     '-i', "v.mp4",
-                    '-i', "a.wav",
+                    '-i', temp_audio_name,
                     '-filter_complex', filter_complex,
                     '-map', "[outv]",
                     '-map', "1:a",
@@ -786,7 +1458,7 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
                 cmd = [
                     ffmpeg_path,
                     '-i', "v.mp4",
-                    '-i', "a.wav",
+                    '-i', temp_audio_name,
                     '-filter_complex', filter_complex,
                     '-map', "[outv]",
                     '-map', "1:a",
@@ -802,7 +1474,7 @@ def MergeAudioVideoSRT(json_file_path, output_dir):
                 cmd = [
                     ffmpeg_path,
                     '-i', "v.mp4",
-                    '-i', "a.wav",
+                    '-i', temp_audio_name,
                     '-filter_complex', filter_complex,
                     '-map', "[outv]",
                     '-map', "1:a",
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基于内容哈希的磁盘文件缓存，按总大小进行LRU淘汰
+"""
+
+import os
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import threading
+import contextlib
+
+
+# 默认缓存根目录，位于用户目录下，供同一台机器上的所有项目共享
+DEFAULT_CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".batchtts_cache")
+
+# 索引锁文件超过该秒数未释放时视为持有进程已崩溃
+INDEX_LOCK_STALE_SECONDS = 30
+
+# 文件哈希缓存，键为 (路径, 大小, 修改时间)，避免重复读取未变化的文件
+_file_hash_cache = {}
+_file_hash_lock = threading.Lock()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """
+    计算文件内容的SHA-256哈希，文件未变化时直接返回上次的结果
+    :param file_path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制哈希字符串
+    """
+    stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        if cache_key in _file_hash_cache:
+            return _file_hash_cache[cache_key]
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    digest = sha256.hexdigest()
+
+    with _file_hash_lock:
+        _file_hash_cache[cache_key] = digest
+    return digest
+
+
+def make_cache_key(*parts):
+    """
+    根据若干可JSON序列化的部分生成缓存键
+    :param parts: 参与计算的内容，如文本、参数字典、文件哈希
+    :return: 十六进制哈希字符串
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FileCache:
+    """
+    磁盘文件缓存类
+    缓存文件以键命名保存在缓存目录中，索引文件记录大小和最后访问时间，总大小超过上限时淘汰最久未使用的文件
+    命中只更新内存中的访问时间，在写入、删除或flush时才写索引；写索引前在锁文件保护下与磁盘上的索引合并，
+    多个进程（如GUI和命令行）共用同一缓存目录时不会互相覆盖对方的条目
+    """
+
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, cache_dir, max_size_bytes=2 * 1024 * 1024 * 1024, extension=".wav"):
+        """
+        初始化文件缓存
+        :param cache_dir: 缓存目录
+        :param max_size_bytes: 缓存总大小上限（字节），默认2GB
+        :param extension: 缓存文件扩展名
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.extension = extension
+        self.index_path = os.path.join(cache_dir, self.INDEX_FILENAME)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 内存中的访问时间是否有尚未写入索引的更新
+        self.dirty = False
+        # 本进程删除的键，合并时从磁盘上的索引中一并删除
+        self.removed_keys = set()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+        atexit.register(self.flush)
+
+    def _load_index(self):
+        """
+        读取索引文件，丢弃缓存文件已不存在的条目；缓存目录中没有索引条目的文件（其他进程写入后索引丢失）
+        以修改时间作为访问时间重新纳入索引，使其可以被淘汰
+        """
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index = {key: entry for key, entry in index.items()
+                 if os.path.exists(self._entry_path(key))}
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    key = entry.name[:-len(self.extension)] if self.extension else entry.name
+                    if entry.is_file() and entry.name.endswith(self.extension) and \
+                            entry.name != self.INDEX_FILENAME and key not in index:
+                        stat = entry.stat()
+                        index[key] = {"size": stat.st_size, "last_access": stat.st_mtime}
+        except OSError:
+            pass
+        return index
+
+    @contextlib.contextmanager
+    def _index_file_lock(self):
+        """
+        跨进程的索引锁：独占创建锁文件，超过INDEX_LOCK_STALE_SECONDS未释放的锁文件视为已失效
+        """
+        lock_path = f"{self.index_path}.lock"
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > INDEX_LOCK_STALE_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _save_index(self):
+        """
+        与磁盘上的索引合并后淘汰超出上限的文件，再原子地写入索引文件（调用方需持有self.lock）
+        同一条目取两边较新的访问时间，其他进程新增的条目保留，本进程删除的条目一并删除
+        """
+        with self._index_file_lock():
+            merged = self._load_index()
+            for key in self.removed_keys:
+                merged.pop(key, None)
+            for key, entry in self.index.items():
+                disk_entry = merged.get(key)
+                if disk_entry is None:
+                    if os.path.exists(self._entry_path(key)):
+                        merged[key] = entry
+                elif entry["last_access"] > disk_entry.get("last_access", 0):
+                    merged[key] = entry
+            self.index = merged
+            self.removed_keys.clear()
+            self._evict()
+
+            temp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(temp_path, self.index_path)
+            self.dirty = False
+
+    def flush(self):
+        """
+        把内存中更新的访问时间写入索引（批量处理结束时和进程退出时调用）
+        """
+        with self.lock:
+            if not self.dirty or not os.path.isdir(self.cache_dir):
+                return
+            try:
+                self._save_index()
+            except OSError as e:
+                print(f"⚠️ 写入缓存索引失败: {str(e)}")
+
+    def _entry_path(self, key):
+        """
+        获取缓存键对应的文件路径
+        """
+        return os.path.join(self.cache_dir, f"{key}{self.extension}")
+
+    def get(self, key):
+        """
+        查询缓存
+        :param key: 缓存键
+        :return: 命中时返回缓存文件路径，否则返回None
+        """
+        with self.lock:
+            entry = self.index.get(key)
+            path = self._entry_path(key)
+            if not os.path.exists(path):
+                self.index.pop(key, None)
+                self.misses += 1
+                return None
+            if entry is None:
+                # 其他进程在本进程读取索引之后写入的条目
+                entry = self.index[key] = {"size": os.path.getsize(path)}
+            entry["last_access"] = time.time()
+            self.hits += 1
+            self.dirty = True
+            return path
+
+    def put(self, key, source_path, move=False):
+        """
+        将文件存入缓存，不移动源文件时复制一份（不使用硬链接，之后修改源文件不会影响缓存）
+        :param key: 缓存键
+        :param source_path: 源文件路径
+        :param move: 是否移动源文件（默认保留源文件）
+        :return: 缓存文件路径，失败时返回None
+        """
+        path = self._entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if move:
+                shutil.move(source_path, temp_path)
+            else:
+                shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠️ 写入缓存失败: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        with self.lock:
+            self.index[key] = {
+                "size": os.path.getsize(path),
+                "last_access": time.time()
+            }
+            self.removed_keys.discard(key)
+            try:
+                self._save_index()
+            except OSError as e:
+                print(f"⚠️ 写入缓存索引失败: {str(e)}")
+        return path
+
+    def remove(self, key):
+        """
+        删除缓存条目
+        :param key: 缓存键
+        """
+        with self.lock:
+            self.index.pop(key, None)
+            self.removed_keys.add(key)
+            path = self._entry_path(key)
+            if os.path.exists(path):
+                os.remove(path)
+            self._save_index()
+
+    def total_size(self):
+        """
+        获取缓存总大小（字节）
+        """
+        return sum(entry["size"] for entry in self.index.values())
+
+    def _evict(self):
+        """
+        按最后访问时间淘汰缓存，直到总大小不超过上限（调用方需持有锁和索引锁）
+        """
+        total = self.total_size()
+        if total <= self.max_size_bytes:
+            return
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_size_bytes:
+                break
+            path = self._entry_path(key)
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"⚠️ 删除缓存文件失败: {str(e)}")
+                continue
+            total -= entry["size"]
+            del self.index[key]
+            print(f"🗑️ 缓存已淘汰: {key}")
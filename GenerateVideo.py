@@ -8,6 +8,7 @@ import json
 import os
 import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from OutputNaming import allocate_output_path, allocate_backup_path, release_path
 from GenerationPromptLLM import generate_prompt, generate_prompt_with_process
 from QwenImageGenerator import QwenImageGenerator
 from ImageToVideoGenerator import ImageToVideoGenerator
@@ -152,22 +153,25 @@ def BatchGeneratePromptConcurrent(json_file_path, video_summary, max_workers=30)
     
     # 保存结果到新的JSON文件
     if valid_results:
-        # 2. 对输入的json文件改名，在原来的名字后面加上"_时间戳"
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 2. 对输入的json文件改名，在原来的名字后面加上"_时间戳_序号"
+        backup_file_path = allocate_backup_path(json_file_path)
         input_file_dir = os.path.dirname(json_file_path)
         input_file_name = os.path.basename(json_file_path)
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 构建备份文件名（原文件名+_时间戳+扩展名）
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 3. 写入的新文件的文件名为原输入的json文件名
         output_file_path = json_file_path
         
         try:
             # 备份原文件
-            os.rename(json_file_path, backup_file_path)
+            try:
+                os.replace(json_file_path, backup_file_path)
+            except OSError:
+                release_path(backup_file_path)
+                raise
             print(f"📋 原文件已备份为: {backup_file_path}")
             
             # 写入新文件
@@ -306,8 +310,8 @@ def BatchGeneratePromptConcurrentByCondition(json_file_path, video_summary, max_
     
     # 保存结果到新的JSON文件
     if valid_results:
-        # 1. 生成时间戳
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 1. 分配备份文件路径（时间戳+序号，并发时不会覆盖已有备份）
+        backup_file_path = allocate_backup_path(json_file_path)
         
         # 2. 解析输入文件路径
         input_file_dir = os.path.dirname(json_file_path)
@@ -315,8 +319,7 @@ def BatchGeneratePromptConcurrentByCondition(json_file_path, video_summary, max_
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 3. 构建备份文件名（原文件名+_时间戳+扩展名）
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 4. 输出文件路径为原输入文件名
         output_file_path = json_file_path
@@ -329,7 +332,11 @@ def BatchGeneratePromptConcurrentByCondition(json_file_path, video_summary, max_
         try:
             # 5. 备份原文件
             import shutil
-            shutil.copy2(json_file_path, backup_file_path)
+            try:
+                shutil.copy2(json_file_path, backup_file_path)
+            except OSError:
+                release_path(backup_file_path)
+                raise
             print(f"✅ 原文件已成功备份为: {backup_file_path}")
             
             # 6. 写入新文件
@@ -455,10 +462,9 @@ def BatchGenerateFigure(json_file_path, server_url):
                 # 获取生成的图片信息
                 local_filename = result.get("local_filename")
                 if local_filename and os.path.exists(local_filename):
-                    # 生成新的文件名（日期时间戳）
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    new_filename = f"{timestamp}.png"
-                    new_filepath = os.path.join(output_dir, new_filename)
+                    # 分配新的文件名（日期时间戳+序号），并发生成时不会互相覆盖
+                    new_filepath = allocate_output_path(output_dir, ".png")
+                    new_filename = os.path.basename(new_filepath)
                     
                     # 复制文件到Output文件夹
                     import shutil
@@ -471,7 +477,7 @@ def BatchGenerateFigure(json_file_path, server_url):
                         "filepath": new_filepath,
                         "original_filename": local_filename,
                         "prompt": prompt_figure,
-                        "timestamp": timestamp
+                        "timestamp": datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
                     }
                     print(f"✅ 分镜 {i+1} 处理成功")
                 else:
@@ -485,8 +491,8 @@ def BatchGenerateFigure(json_file_path, server_url):
     
     # 保存更新后的json文件
     try:
-        # 1. 生成时间戳
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 1. 分配备份文件路径（时间戳+序号，并发时不会覆盖已有备份）
+        backup_file_path = allocate_backup_path(json_file_path)
         
         # 2. 解析输入文件路径
         input_file_dir = os.path.dirname(json_file_path)
@@ -494,8 +500,7 @@ def BatchGenerateFigure(json_file_path, server_url):
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 3. 构建备份文件名（原文件名+_时间戳+扩展名）
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 4. 输出文件路径为原输入文件名
         output_file_path = json_file_path
@@ -506,7 +511,11 @@ def BatchGenerateFigure(json_file_path, server_url):
         print(f"📋 输出文件名: {input_file_name}")
         
         # 5. 备份原文件
-        os.rename(json_file_path, backup_file_path)
+        try:
+            os.replace(json_file_path, backup_file_path)
+        except OSError:
+            release_path(backup_file_path)
+            raise
         print(f"✅ 原文件已成功备份为: {backup_file_path}")
         
         # 6. 写入新文件
@@ -626,8 +635,8 @@ def BatchGenerateVideo(json_file_path, server_url, frame_length=16):
     
     # 保存更新后的json文件
     try:
-        # 1. 生成时间戳
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 1. 分配备份文件路径（时间戳+序号，并发时不会覆盖已有备份）
+        backup_file_path = allocate_backup_path(json_file_path)
         
         # 2. 解析输入文件路径
         input_file_dir = os.path.dirname(json_file_path)
@@ -635,8 +644,7 @@ def BatchGenerateVideo(json_file_path, server_url, frame_length=16):
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 3. 构建备份文件名（原文件名+_时间戳+扩展名）
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 4. 输出文件路径为原输入文件名
         output_file_path = json_file_path
@@ -647,7 +655,11 @@ def BatchGenerateVideo(json_file_path, server_url, frame_length=16):
         print(f"📋 输出文件名: {input_file_name}")
         
         # 5. 备份原文件
-        os.rename(json_file_path, backup_file_path)
+        try:
+            os.replace(json_file_path, backup_file_path)
+        except OSError:
+            release_path(backup_file_path)
+            raise
         print(f"✅ 原文件已成功备份为: {backup_file_path}")
         
         # 6. 写入新文件
@@ -1523,10 +1535,9 @@ def BatchGenerateFigureByCondition(json_file_path, save_dir, server_url):
                     item["Figure_Update_Flag"] = 0
                     print(f"📝 已将Figure_Update_Flag设置为0")
                     
-                    # 生成新的文件名（日期时间戳）
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    new_filename = f"{timestamp}.png"
-                    new_filepath = os.path.join(save_dir, new_filename)
+                    # 分配新的文件名（日期时间戳+序号），并发生成时不会互相覆盖
+                    new_filepath = allocate_output_path(save_dir, ".png")
+                    new_filename = os.path.basename(new_filepath)
                     
                     # 复制文件到保存地址
                     import shutil
@@ -1539,7 +1550,7 @@ def BatchGenerateFigureByCondition(json_file_path, save_dir, server_url):
                         "filepath": new_filepath,
                         "original_filename": local_filename,
                         "prompt": prompt_figure,
-                        "timestamp": timestamp
+                        "timestamp": datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
                     }
                     print(f"✅ 分镜 {i+1} 处理成功")
                 else:
@@ -1553,8 +1564,8 @@ def BatchGenerateFigureByCondition(json_file_path, save_dir, server_url):
     
     # 保存更新后的json文件
     try:
-        # 1. 生成时间戳
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 1. 分配备份文件路径（时间戳+序号，并发时不会覆盖已有备份）
+        backup_file_path = allocate_backup_path(json_file_path)
         
         # 2. 解析输入文件路径
         input_file_dir = os.path.dirname(json_file_path)
@@ -1562,8 +1573,7 @@ def BatchGenerateFigureByCondition(json_file_path, save_dir, server_url):
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 3. 构建备份文件名（原文件名+_时间戳+扩展名）
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 4. 输出文件路径为原输入文件名
         output_file_path = json_file_path
@@ -1574,7 +1584,11 @@ def BatchGenerateFigureByCondition(json_file_path, save_dir, server_url):
         print(f"📋 输出文件名: {input_file_name}")
         
         # 5. 备份原文件
-        os.rename(json_file_path, backup_file_path)
+        try:
+            os.replace(json_file_path, backup_file_path)
+        except OSError:
+            release_path(backup_file_path)
+            raise
         print(f"✅ 原文件已成功备份为: {backup_file_path}")
         
         # 6. 写入新文件
@@ -1743,8 +1757,8 @@ def BatchGeneratePromptFigureVideoByStoryboardByCondition(json_file_path, save_d
     # 4.4 保存所有json对象到文件
     print(f"\n=== 第五步：保存分镜信息 ===")
     try:
-        # 生成时间戳
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        # 分配备份文件路径（时间戳+序号，并发时不会覆盖已有备份）
+        backup_file_path = allocate_backup_path(json_file_path)
         
         # 解析输入文件路径
         input_file_dir = os.path.dirname(json_file_path)
@@ -1752,8 +1766,7 @@ def BatchGeneratePromptFigureVideoByStoryboardByCondition(json_file_path, save_d
         input_file_base, input_file_ext = os.path.splitext(input_file_name)
         
         # 构建备份文件名
-        backup_file_name = f"{input_file_base}_{timestamp}{input_file_ext}"
-        backup_file_path = os.path.join(input_file_dir, backup_file_name)
+        backup_file_name = os.path.basename(backup_file_path)
         
         # 输出文件路径为原输入文件名
         output_file_path = json_file_path
@@ -1763,7 +1776,11 @@ def BatchGeneratePromptFigureVideoByStoryboardByCondition(json_file_path, save_d
         print(f"📋 输出文件名: {input_file_name}")
         
         # 备份原文件
-        os.rename(json_file_path, backup_file_path)
+        try:
+            os.replace(json_file_path, backup_file_path)
+        except OSError:
+            release_path(backup_file_path)
+            raise
         print(f"✅ 原文件已成功备份为: {backup_file_path}")
         
         # 写入新文件
@@ -1786,10 +1803,12 @@ def BatchGeneratePromptFigureVideoByStoryboardByCondition(json_file_path, save_d
         
         # 检查输出文件是否存在，如果存在则备份
         if os.path.exists(output_video_path):
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-            backup_video_filename = f"{input_file_base}_{timestamp}.mp4"
-            backup_video_path = os.path.join(save_dir, backup_video_filename)
-            os.rename(output_video_path, backup_video_path)
+            backup_video_path = allocate_backup_path(output_video_path)
+            try:
+                os.replace(output_video_path, backup_video_path)
+            except OSError:
+                release_path(backup_video_path)
+                raise
             print(f"📋 原视频文件已备份为: {backup_video_path}")
         
         try:
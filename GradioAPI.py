@@ -1,5 +1,139 @@
+import asyncio
+import functools
 import json
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from gradio_client import Client
+try:
+    from gradio_client import handle_file
+except ImportError:
+    # 旧版gradio_client只提供file()
+    from gradio_client import file as handle_file
+from FileCache import hash_file
+from OutputNaming import allocate_output_path
+from PathResolver import resolve_result_path
+
+# 已上传到服务器的参考音频，键为Client对象，值为 {本地绝对路径: {"hash": 文件哈希, "file_data": 服务器端文件描述}}
+_uploaded_ref_files = weakref.WeakKeyDictionary()
+_uploaded_ref_lock = threading.Lock()
+# 已上传的参考音频被服务器拒绝的次数，键为Client对象；多次被拒绝的服务器不再复用上传结果
+_rejected_ref_counts = weakref.WeakKeyDictionary()
+MAX_REFERENCE_REJECTIONS = 2
+
+# Gradio服务器的文件上传和文件访问路由，相对于Client的API根地址（Gradio 5起为 /gradio_api/）
+GRADIO_UPLOAD_ROUTE = "upload"
+GRADIO_FILE_ROUTE = "file="
+
+# 服务器找不到已上传文件时错误信息中的关键字，只有这类错误才改为随请求上传后重试
+_MISSING_FILE_MARKERS = ("no such file", "not found", "does not exist", "invalid file", "404", "filenotfound")
+
+# 异步接口的默认单服务器并发请求数，可通过 set_max_in_flight 按服务器单独设置
+DEFAULT_MAX_IN_FLIGHT = 2
+_max_in_flight = {}
+# 每个事件循环各自的服务器信号量，键为事件循环，值为 {服务器地址: asyncio.Semaphore}
+_server_semaphores = weakref.WeakKeyDictionary()
+# 异步接口执行阻塞调用的线程池，线程数只取决于同时在途的请求数，排队中的任务不占用线程
+_async_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="GradioAPI")
+
+
+def _client_api_root(client):
+    """
+    获取Client的API根地址：新版gradio_client按服务器配置的api_prefix拼接，旧版即为服务器地址
+    :param client: Client对象
+    :return: 以 / 结尾的API根地址
+    """
+    from urllib.parse import urljoin
+    
+    root = getattr(client, "src_prefixed", None)
+    if not root:
+        api_prefix = (getattr(client, "api_prefix", None) or "").strip("/")
+        root = urljoin(client.src, api_prefix) if api_prefix else client.src
+    return root if root.endswith("/") else root + "/"
+
+def upload_reference_file(client, file_path, force=False):
+    """
+    将参考音频上传到服务器，每个Client只上传一次，文件内容变化时重新上传
+    :param client: Client对象
+    :param file_path: 本地参考音频路径
+    :param force: 是否忽略已记录的上传结果，强制重新上传
+    :return: 指向服务器端文件的handle_file描述，可直接作为predict的文件参数，gradio_client不会再次上传
+    """
+    import httpx
+    from urllib.parse import urljoin
+    
+    abs_path = os.path.abspath(file_path)
+    file_hash = hash_file(abs_path)
+    
+    with _uploaded_ref_lock:
+        uploaded = _uploaded_ref_files.setdefault(client, {})
+        entry = uploaded.get(abs_path)
+        if entry and entry["hash"] == file_hash and not force:
+            return entry["file_data"]
+    
+    api_root = _client_api_root(client)
+    print(f"正在上传参考音频: {abs_path}")
+    with open(abs_path, 'rb') as f:
+        # 与gradio_client自身上传文件时一样使用Client的上传地址、请求头（如鉴权令牌）和连接参数
+        response = httpx.post(
+            getattr(client, "upload_url", None) or urljoin(api_root, GRADIO_UPLOAD_ROUTE),
+            files=[("files", (os.path.basename(abs_path), f))],
+            headers=getattr(client, "headers", None),
+            cookies=getattr(client, "cookies", None),
+            verify=getattr(client, "ssl_verify", True),
+            **(getattr(client, "httpx_kwargs", None) or {})
+        )
+    response.raise_for_status()
+    server_path = response.json()[0]
+    
+    # 以服务器上的文件URL构造文件参数，由服务器直接读取，predict时不再上传
+    file_data = handle_file(urljoin(api_root, GRADIO_FILE_ROUTE + server_path))
+    with _uploaded_ref_lock:
+        _uploaded_ref_files.setdefault(client, {})[abs_path] = {
+            "hash": file_hash,
+            "file_data": file_data
+        }
+    return file_data
+
+def invalidate_reference_files(client):
+    """
+    清除某个Client已上传的参考音频记录，下次调用时重新上传
+    :param client: Client对象
+    """
+    with _uploaded_ref_lock:
+        _uploaded_ref_files.pop(client, None)
+
+def _reject_reference_files(client):
+    """
+    记录服务器拒绝了已上传的参考音频：清除上传记录，多次被拒绝后该Client不再复用上传结果
+    """
+    with _uploaded_ref_lock:
+        _uploaded_ref_files.pop(client, None)
+        _rejected_ref_counts[client] = _rejected_ref_counts.get(client, 0) + 1
+        if _rejected_ref_counts[client] == MAX_REFERENCE_REJECTIONS:
+            print(f"⚠️ 服务器多次拒绝已上传的参考音频，之后改为每次随请求上传: {client.src}")
+
+def _is_missing_file_error(error):
+    """
+    判断错误是否为服务器找不到或无法读取已上传的文件（如服务器重启后临时文件被清理）
+    """
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in _MISSING_FILE_MARKERS)
+
+def _prepare_reference_file(client, file_path, reuse_uploaded=True):
+    """
+    获取参考音频的predict参数，不复用或上传失败时退回到每次随请求上传
+    :return: (文件参数, 是否为已上传的文件)
+    """
+    with _uploaded_ref_lock:
+        reuse_uploaded = reuse_uploaded and _rejected_ref_counts.get(client, 0) < MAX_REFERENCE_REJECTIONS
+    if reuse_uploaded:
+        try:
+            return upload_reference_file(client, file_path), True
+        except Exception as e:
+            print(f"⚠️ 参考音频预上传失败，改为随请求上传: {str(e)}")
+    return handle_file(file_path), False
 
 def TTS_API_change_choices(server_url, client=None):
     """
@@ -36,7 +170,69 @@ def TTS_API_change_choices(server_url, client=None):
             "gpt_model_list": []
         }
 
-def TTS_API_get_tts_wav(server_url, input_params, client=None):
+def place_file(source_path, target_path, move=False):
+    """
+    将文件放到目标位置，目标路径上不会出现写了一半的文件
+    移动时直接重命名（跨文件系统时退回到复制后删除源文件），只用于gradio_client下载的结果文件等不再需要的临时文件；
+    缓存条目等共享的源文件必须复制，不能与输出文件共享数据（硬链接）或被移走，否则之后修改输出文件会改动缓存，
+    移走缓存条目会使缓存索引失效
+    目标文件已存在（如已预留的空文件）时会被覆盖
+    :param source_path: 源文件路径
+    :param target_path: 目标文件路径
+    :param move: 是否移动源文件（默认复制）
+    :return: 目标文件路径
+    """
+    import errno
+    import shutil
+    
+    if move:
+        try:
+            os.replace(source_path, target_path)
+            return target_path
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    
+    temp_path = f"{target_path}.part"
+    try:
+        shutil.copy2(source_path, temp_path)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    if move:
+        os.remove(source_path)
+    return target_path
+
+def _discard_placeholder(path):
+    """
+    删除预留但未写入内容的空文件
+    """
+    if path and os.path.exists(path) and os.path.getsize(path) == 0:
+        os.remove(path)
+
+def download_file(url, target_path, chunk_size=1024 * 1024):
+    """
+    流式下载文件到目标位置，下载完成后才出现在目标路径
+    :param url: 文件URL
+    :param target_path: 目标文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 目标文件路径
+    """
+    import shutil
+    import urllib.request
+    
+    temp_path = f"{target_path}.part"
+    try:
+        with urllib.request.urlopen(url) as response, open(temp_path, 'wb') as f:
+            shutil.copyfileobj(response, f, chunk_size)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return target_path
+
+def TTS_API_get_tts_wav(server_url, input_params, client=None, output_dir=None):
     """
     调用TTS服务生成语音文件
     :param server_url: 服务器地址，如 http://192.168.31.194:9872/
@@ -58,14 +254,10 @@ def TTS_API_get_tts_wav(server_url, input_params, client=None):
         - if_sr: 是否开启超分（默认：False）
         - pause_second: 句间停顿秒数（默认：0.3）
     :param client: 可选的Client对象，如果提供则使用，否则创建新的
+    :param output_dir: 可选的输出目录，生成的语音直接保存到该目录，默认为代码所在目录下的output_audio
     :return: JSON格式的输出结果，包含生成的语音文件路径和本地拷贝路径
     """
-    import os
-    import shutil
-    from datetime import datetime
-    from gradio_client import file
     from urllib.parse import urlparse
-    import urllib.request
     
     # 如果没有提供client，则创建新的
     if client is None:
@@ -93,34 +285,51 @@ def TTS_API_get_tts_wav(server_url, input_params, client=None):
     # 合并默认参数和输入参数
     merged_params = {**default_params, **input_params}
     
-    # 处理ref_wav_path参数，转换为file对象
-    ref_wav_path = file(merged_params["ref_wav_path"])
+    # 预留的目标文件路径，生成失败时需要删除
+    target_path = None
     
-    # 处理inp_refs参数，如果有值则转换为file对象列表
-    inp_refs = merged_params["inp_refs"]
-    if inp_refs:
-        inp_refs = [file(ref) for ref in inp_refs]
+    def predict(reuse_uploaded=True):
+        # 参考音频每个Client只上传一次，之后复用服务器端的文件
+        ref_wav_path, ref_cached = _prepare_reference_file(client, merged_params["ref_wav_path"], reuse_uploaded)
+        uses_cached_refs = ref_cached
+        
+        # 处理inp_refs参数，如果有值则同样复用已上传的文件
+        inp_refs = merged_params["inp_refs"]
+        if inp_refs:
+            prepared_refs = [_prepare_reference_file(client, ref, reuse_uploaded) for ref in inp_refs]
+            inp_refs = [ref for ref, _ in prepared_refs]
+            uses_cached_refs = uses_cached_refs or any(cached for _, cached in prepared_refs)
+        
+        try:
+            return client.predict(
+                ref_wav_path=ref_wav_path,
+                prompt_text=merged_params["prompt_text"],
+                prompt_language=merged_params["prompt_language"],
+                text=merged_params["text"],
+                text_language=merged_params["text_language"],
+                how_to_cut=merged_params["how_to_cut"],
+                top_k=merged_params["top_k"],
+                top_p=merged_params["top_p"],
+                temperature=merged_params["temperature"],
+                ref_free=merged_params["ref_free"],
+                speed=merged_params["speed"],
+                if_freeze=merged_params["if_freeze"],
+                inp_refs=inp_refs,
+                sample_steps=merged_params["sample_steps"],
+                if_sr=merged_params["if_sr"],
+                pause_second=merged_params["pause_second"],
+                api_name="/get_tts_wav"
+            )
+        except Exception as e:
+            # 只有服务器找不到已上传的文件（如重启后被清理）时才重试，超时和合成失败直接返回错误
+            if not uses_cached_refs or not _is_missing_file_error(e):
+                raise
+            print(f"⚠️ 服务器找不到已上传的参考音频，改为随请求上传后重试: {str(e)}")
+            _reject_reference_files(client)
+            return predict(reuse_uploaded=False)
     
     try:
-        result = client.predict(
-            ref_wav_path=ref_wav_path,
-            prompt_text=merged_params["prompt_text"],
-            prompt_language=merged_params["prompt_language"],
-            text=merged_params["text"],
-            text_language=merged_params["text_language"],
-            how_to_cut=merged_params["how_to_cut"],
-            top_k=merged_params["top_k"],
-            top_p=merged_params["top_p"],
-            temperature=merged_params["temperature"],
-            ref_free=merged_params["ref_free"],
-            speed=merged_params["speed"],
-            if_freeze=merged_params["if_freeze"],
-            inp_refs=inp_refs,
-            sample_steps=merged_params["sample_steps"],
-            if_sr=merged_params["if_sr"],
-            pause_second=merged_params["pause_second"],
-            api_name="/get_tts_wav"
-        )
+        result = predict()
     
         # 构建返回的JSON结构
         output_json = {
@@ -129,71 +338,40 @@ def TTS_API_get_tts_wav(server_url, input_params, client=None):
         
         # 如果成功生成了文件路径，进行拷贝操作
         if result:
-            # 获取当前代码所在目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
+            if not output_dir:
+                # 获取当前代码所在目录
+                current_dir = os.path.dirname(os.path.abspath(__file__))
+                output_dir = os.path.join(current_dir, "output_audio")
             
-            # 创建output_audio文件夹（如果不存在）
-            output_dir = os.path.join(current_dir, "output_audio")
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 获取当前时间，格式化为英文格式时间（如：20240104_120000）
-            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # 生成目标文件名和路径
-            target_filename = f"{current_time}.wav"
-            target_path = os.path.join(output_dir, target_filename)
+            # 分配并预留不冲突的目标文件路径（时间戳+序号+文本哈希），并发合成时不会互相覆盖
+            target_path = allocate_output_path(output_dir, ".wav", content=merged_params["text"])
             
             # 判断返回结果是URL还是本地路径
             parsed = urlparse(result)
             
             if parsed.scheme in ('http', 'https'):
-                # 如果是URL，下载文件
+                # 如果是URL，流式下载到目标位置
                 try:
-                    urllib.request.urlretrieve(result, target_path)
+                    download_file(result, target_path)
                     output_json["local_audio_path"] = target_path
                 except Exception as download_error:
+                    _discard_placeholder(target_path)
                     output_json["error"] = f"下载文件失败: {str(download_error)}"
                     return output_json
-            elif os.path.exists(result):
-                # 如果是本地路径且文件存在，直接拷贝
-                shutil.copy2(result, target_path)
-                output_json["local_audio_path"] = target_path
             else:
-                # 修复打包环境下可能不完整的路径
-                # 检查是否需要修复路径分隔符
-                fixed_path = result.replace('/', '\\')
-                # 尝试在常见临时目录中查找
-                temp_base = os.environ.get('TEMP', os.environ.get('TMP', 'C:\\Windows\\Temp'))
-                
-                # 如果路径不完整，尝试找到正确的完整路径
-                if not os.path.exists(result):
-                    # 尝试直接在temp目录中查找
-                    temp_file_path = os.path.join(temp_base, os.path.basename(result))
-                    if os.path.exists(temp_file_path):
-                        shutil.copy2(temp_file_path, target_path)
-                        output_json["local_audio_path"] = target_path
-                    else:
-                        # 尝试查找包含_MEI的目录
-                        for root, dirs, files in os.walk(temp_base):
-                            if '_MEI' in root and result.split(os.sep)[-1] in files:
-                                source_path = os.path.join(root, result.split(os.sep)[-1])
-                                if os.path.exists(source_path):
-                                    shutil.copy2(source_path, target_path)
-                                    output_json["local_audio_path"] = target_path
-                                    break
-                        else:
-                            # 如果仍然找不到，尝试使用fixed_path
-                            if os.path.exists(fixed_path):
-                                shutil.copy2(fixed_path, target_path)
-                                output_json["local_audio_path"] = target_path
-                            else:
-                                output_json["error"] = f"文件不存在: {result}"
-                else:
-                    shutil.copy2(result, target_path)
+                # 本地路径：打包环境下路径可能不完整，由解析器在固定的候选目录中查找，不遍历临时目录
+                source_path = resolve_result_path(result)
+                if source_path:
+                    # 结果文件属于gradio_client的临时目录，直接移走，不再复制一份
+                    place_file(source_path, target_path, move=True)
                     output_json["local_audio_path"] = target_path
+                else:
+                    _discard_placeholder(target_path)
+                    output_json["error"] = f"文件不存在: {result}"
         
         return output_json
     except Exception as e:
+        _discard_placeholder(target_path)
         # 增强错误处理
         error_msg = f"API调用失败: {str(e)}"
         print(error_msg)
@@ -313,6 +491,135 @@ def TTS_API_change_gpt_weights(server_url, input_params, client=None):
             "result": None
         }
 
+def set_max_in_flight(server_url, limit):
+    """
+    设置异步接口对单个服务器的最大并发请求数（对之后首次使用该服务器的事件循环生效）
+    :param server_url: 服务器地址
+    :param limit: 最大并发请求数
+    """
+    if limit < 1:
+        raise ValueError("最大并发请求数必须大于0")
+    _max_in_flight[server_url] = limit
+
+def _get_server_semaphore(server_url):
+    """
+    获取当前事件循环中服务器对应的信号量
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _server_semaphores.setdefault(loop, {})
+    if server_url not in semaphores:
+        semaphores[server_url] = asyncio.Semaphore(_max_in_flight.get(server_url, DEFAULT_MAX_IN_FLIGHT))
+    return semaphores[server_url]
+
+async def _run_with_limit(server_url, timeout, func, *args, **kwargs):
+    """
+    在线程池中执行阻塞的API函数，并限制单服务器的在途请求数
+    超时或被取消时协程立即返回，已发出的请求在后台线程中结束后才释放名额，保证不超过并发上限
+    :param server_url: 服务器地址
+    :param timeout: 超时秒数，None表示不限制
+    :param func: 要执行的阻塞函数
+    :return: 函数返回值
+    """
+    semaphore = _get_server_semaphore(server_url)
+    await semaphore.acquire()
+    loop = asyncio.get_running_loop()
+    
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+    
+    try:
+        future = _async_executor.submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(release)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+async def TTS_API_change_choices_async(server_url, client=None, timeout=None):
+    """
+    TTS_API_change_choices 的异步版本
+    :param server_url: 服务器地址，如 http://192.168.31.194:9872/
+    :param client: 可选的Client对象，如果提供则使用，否则创建新的
+    :param timeout: 超时秒数，None表示不限制
+    :return: 与 TTS_API_change_choices 相同，超时时返回包含error的结果
+    """
+    try:
+        return await _run_with_limit(server_url, timeout, TTS_API_change_choices, server_url, client)
+    except asyncio.TimeoutError:
+        error_msg = f"API调用超时（{timeout}秒）"
+        print(error_msg)
+        return {
+            "error": error_msg,
+            "sovits_model_list": [],
+            "gpt_model_list": []
+        }
+
+async def TTS_API_get_tts_wav_async(server_url, input_params, client=None, output_dir=None, timeout=None):
+    """
+    TTS_API_get_tts_wav 的异步版本，参数默认值与同步版本相同
+    :param server_url: 服务器地址，如 http://192.168.31.194:9872/
+    :param input_params: JSON格式的输入参数，字段见 TTS_API_get_tts_wav
+    :param client: 可选的Client对象，如果提供则使用，否则创建新的
+    :param output_dir: 可选的输出目录，生成的语音直接保存到该目录
+    :param timeout: 超时秒数，None表示不限制
+    :return: 与 TTS_API_get_tts_wav 相同，超时时返回包含error的结果
+    """
+    try:
+        return await _run_with_limit(server_url, timeout, TTS_API_get_tts_wav,
+                                     server_url, input_params, client, output_dir)
+    except asyncio.TimeoutError:
+        error_msg = f"API调用超时（{timeout}秒）"
+        print(error_msg)
+        return {
+            "error": error_msg,
+            "output_wav_path": None,
+            "local_audio_path": None
+        }
+
+async def TTS_API_change_sovits_weights_async(server_url, input_params, client=None, timeout=None):
+    """
+    TTS_API_change_sovits_weights 的异步版本，参数默认值与同步版本相同
+    :param server_url: 服务器地址，如 http://192.168.31.194:9872/
+    :param input_params: JSON格式的输入参数，字段见 TTS_API_change_sovits_weights
+    :param client: 可选的Client对象，如果提供则使用，否则创建新的
+    :param timeout: 超时秒数，None表示不限制
+    :return: 与 TTS_API_change_sovits_weights 相同，超时时返回包含error的结果
+    """
+    try:
+        return await _run_with_limit(server_url, timeout, TTS_API_change_sovits_weights,
+                                     server_url, input_params, client)
+    except asyncio.TimeoutError:
+        error_msg = f"API调用超时（{timeout}秒）"
+        print(error_msg)
+        return {
+            "error": error_msg,
+            "requested_sovits_path": input_params.get("sovits_path", "GPT_SoVITS/pretrained_models/s2G488k.pth")
+        }
+
+async def TTS_API_change_gpt_weights_async(server_url, input_params, client=None, timeout=None):
+    """
+    TTS_API_change_gpt_weights 的异步版本，参数默认值与同步版本相同
+    :param server_url: 服务器地址，如 http://192.168.31.194:9872/
+    :param input_params: JSON格式的输入参数，字段见 TTS_API_change_gpt_weights
+    :param client: 可选的Client对象，如果提供则使用，否则创建新的
+    :param timeout: 超时秒数，None表示不限制
+    :return: 与 TTS_API_change_gpt_weights 相同，超时时返回包含error的结果
+    """
+    try:
+        return await _run_with_limit(server_url, timeout, TTS_API_change_gpt_weights,
+                                     server_url, input_params, client)
+    except asyncio.TimeoutError:
+        error_msg = f"API调用超时（{timeout}秒）"
+        print(error_msg)
+        return {
+            "error": error_msg,
+            "result": None
+        }
+
 class GradioAPITester:
     """
     Gradio API 测试类，用于测试所有API函数
@@ -424,6 +731,29 @@ class GradioAPITester:
         
         return self.test_function(TTS_API_get_tts_wav, self.server_url, test_params)
     
+    def test_get_tts_wav_async(self, count=4, timeout=300):
+        """
+        测试异步接口并发生成多条语音
+        :param count: 并发提交的任务数
+        :param timeout: 单个请求的超时秒数
+        """
+        print(f"\n🚀 测试 TTS_API_get_tts_wav_async - 并发提交 {count} 个语音生成任务")
+        print(f"📋 服务器地址: {self.server_url}")
+        
+        async def run_all():
+            client = Client(self.server_url)
+            tasks = [
+                TTS_API_get_tts_wav_async(self.server_url, {
+                    "ref_wav_path": self.default_ref_wav,
+                    "text": f"这是第{i + 1}条异步并发测试语音。",
+                    "text_language": "中文"
+                }, client=client, timeout=timeout)
+                for i in range(count)
+            ]
+            return await asyncio.gather(*tasks)
+        
+        return self.test_function(lambda: asyncio.run(run_all()))
+    
     def test_all_functions(self):
         """
         测试所有API函数
@@ -466,9 +796,10 @@ class GradioAPITester:
             print("4. TTS_API_get_tts_wav (简单) - 调用TTS服务生成语音文件")
             print("5. TTS_API_get_tts_wav (完整) - 调用TTS服务生成语音文件")
             print("6. 测试所有函数")
+            print("7. TTS_API_get_tts_wav_async - 异步并发生成语音文件")
             print("0. 退出")
             
-            choice = input("请输入选项 (0-6): ")
+            choice = input("请输入选项 (0-7): ")
             
             if choice == "0":
                 print("退出测试工具")
@@ -485,6 +816,8 @@ class GradioAPITester:
                 self.test_get_tts_wav(simple=False)
             elif choice == "6":
                 self.test_all_functions()
+            elif choice == "7":
+                self.test_get_tts_wav_async()
             else:
                 print("无效的选项，请重新输入")
 
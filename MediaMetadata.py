@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+媒体文件元数据缓存
+音频和视频文件的时长、采样率、声道数、帧数、帧率和分辨率只探测一次，结果按 (路径, 大小, 修改时间) 保存在
+项目JSON旁的缓存文件中，GUI和ConvertAudio中的各个流程共享，文件未变化时不再重新打开
+"""
+
+import os
+import json
+import shutil
+import threading
+import subprocess
+
+from WavConcat import read_wav_header
+
+
+# 按缓存文件路径共享的实例
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_cache_path(json_file_path):
+    """
+    获取项目JSON对应的元数据缓存文件路径
+    :param json_file_path: 项目JSON文件路径
+    :return: 缓存文件路径，如 Commentary.media_cache.json
+    """
+    return os.path.splitext(json_file_path)[0] + ".media_cache.json"
+
+
+def probe_wav(path):
+    """
+    读取WAV文件头获取音频信息
+    :return: 元数据字典
+    """
+    header = read_wav_header(path)
+    return {
+        "duration": header["frames"] / header["sample_rate"] if header["sample_rate"] else 0,
+        "sample_rate": header["sample_rate"],
+        "channels": header["channels"],
+        "frames": header["frames"]
+    }
+
+
+def probe_with_opencv(path):
+    """
+    使用OpenCV获取视频信息
+    :return: 元数据字典，无法打开时返回None
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            "duration": frames / fps if fps > 0 else 0,
+            "frames": frames,
+            "fps": fps,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        }
+    finally:
+        cap.release()
+
+
+def probe_with_ffprobe(path, ffprobe_path=None):
+    """
+    使用ffprobe获取音视频信息
+    :param ffprobe_path: ffprobe可执行文件路径，不存在时从PATH中查找
+    :return: 元数据字典，ffprobe不可用或失败时返回None
+    """
+    if not ffprobe_path or not os.path.exists(ffprobe_path):
+        ffprobe_path = shutil.which("ffprobe")
+    if not ffprobe_path:
+        return None
+    result = subprocess.run(
+        [ffprobe_path, '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', path],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return None
+    info = json.loads(result.stdout or "{}")
+    metadata = {"duration": float(info.get("format", {}).get("duration", 0) or 0)}
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video" and "fps" not in metadata:
+            numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+            fps = float(numerator) / float(denominator) if float(denominator or 0) else 0
+            metadata.update({
+                "fps": fps,
+                "frames": int(stream.get("nb_frames", 0) or round(metadata["duration"] * fps)),
+                "width": stream.get("width"),
+                "height": stream.get("height")
+            })
+        elif stream.get("codec_type") == "audio" and "sample_rate" not in metadata:
+            metadata.update({
+                "sample_rate": int(stream.get("sample_rate", 0) or 0),
+                "channels": stream.get("channels")
+            })
+    return metadata
+
+
+def probe_media(path, ffprobe_path=None):
+    """
+    探测媒体文件的元数据：WAV直接读取文件头，其他文件依次尝试OpenCV和ffprobe
+    :param path: 媒体文件路径
+    :param ffprobe_path: 可选的ffprobe可执行文件路径
+    :return: 元数据字典，失败时返回None
+    """
+    if os.path.splitext(path)[1].lower() == ".wav":
+        try:
+            return probe_wav(path)
+        except (ValueError, OSError, KeyError, ZeroDivisionError):
+            pass
+    try:
+        metadata = probe_with_opencv(path)
+        if metadata and metadata["duration"] > 0:
+            return metadata
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"⚠️ OpenCV读取媒体信息失败: {str(e)}")
+    try:
+        return probe_with_ffprobe(path, ffprobe_path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ ffprobe读取媒体信息失败: {str(e)}")
+        return None
+
+
+class MediaMetadataCache:
+    """
+    媒体元数据缓存类
+    条目键为文件绝对路径，记录文件大小和修改时间，文件变化后自动重新探测
+    """
+
+    def __init__(self, cache_path=None, ffprobe_path=None):
+        """
+        初始化元数据缓存
+        :param cache_path: 缓存文件路径，为None时只在内存中缓存
+        :param ffprobe_path: 可选的ffprobe可执行文件路径
+        """
+        self.cache_path = cache_path
+        self.ffprobe_path = ffprobe_path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.entries = self._load()
+
+    @classmethod
+    def for_project(cls, json_file_path, ffprobe_path=None):
+        """
+        获取项目JSON对应的元数据缓存（同一项目共享一个实例）
+        :param json_file_path: 项目JSON文件路径，为空时返回只在内存中缓存的实例
+        :param ffprobe_path: 可选的ffprobe可执行文件路径
+        :return: MediaMetadataCache
+        """
+        cache_path = os.path.abspath(get_cache_path(json_file_path)) if json_file_path else None
+        with _instances_lock:
+            instance = _instances.get(cache_path)
+            if instance is None:
+                instance = cls(cache_path, ffprobe_path)
+                _instances[cache_path] = instance
+            elif ffprobe_path and not instance.ffprobe_path:
+                instance.ffprobe_path = ffprobe_path
+            return instance
+
+    def _load(self):
+        """
+        读取缓存文件
+        """
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """
+        有新条目时原子地写入缓存文件
+        """
+        with self.lock:
+            if not self.cache_path or not self.dirty:
+                return
+            temp_path = f"{self.cache_path}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.cache_path)
+                self.dirty = False
+            except OSError as e:
+                print(f"⚠️ 保存媒体信息缓存失败: {str(e)}")
+
+    def get(self, path):
+        """
+        获取媒体文件的元数据，缓存未命中或文件已变化时探测并记录
+        :param path: 媒体文件路径
+        :return: 元数据字典（duration、sample_rate、channels、frames、fps、width、height中的可用字段），失败时返回None
+        """
+        if not path or not os.path.exists(path):
+            return None
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                return entry
+
+        metadata = probe_media(key, self.ffprobe_path)
+        if metadata is None:
+            return None
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **metadata}
+        with self.lock:
+            self.entries[key] = entry
+            self.dirty = True
+        return entry
+
+    def get_duration(self, path):
+        """
+        获取媒体文件的时长（秒）
+        :return: 时长，失败时返回0
+        """
+        entry = self.get(path)
+        return entry.get("duration", 0) if entry else 0
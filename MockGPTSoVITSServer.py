@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟GPT-SoVITS Gradio服务器，用于在没有GPU服务器时测试和压测AudioConverter、GradioAPI
+提供与GPT-SoVITS webui相同签名的 /get_tts_wav、/change_sovits_weights、/change_gpt_weights、/change_choices 接口，
+返回长度合理的合成WAV，延迟和失败率可配置
+
+用法：
+    python MockGPTSoVITSServer.py --port 9872 --latency 0.5 --jitter 0.2 --rtf 0.05 --failure-rate 0.02
+"""
+
+import os
+import re
+import math
+import time
+import wave
+import array
+import random
+import argparse
+import tempfile
+import threading
+
+import gradio as gr
+
+
+# 模拟服务器上的模型列表
+SOVITS_MODELS = [
+    "GPT_SoVITS/pretrained_models/s2G488k.pth",
+    "SoVITS_weights_v4/chenhuanVoice_e2_s352_l32.pth"
+]
+GPT_MODELS = [
+    "GPT_SoVITS/pretrained_models/s1bert25hz-2kh-longer-epoch=68e-step=50232.ckpt",
+    "GPT_weights_v4/chenhuanVoice-e15.ckpt"
+]
+LANGUAGES = ["中文", "英文", "日文", "中英混合", "日英混合", "多语种混合"]
+CUT_METHODS = ["不切", "凑四句一切", "凑50字一切", "按中文句号。切", "按英文句号.切", "按标点符号切"]
+
+# 会产生停顿的标点
+PAUSE_PUNCTUATION = "，,。.！!？?；;：:、…—"
+
+
+class MockTTSServer:
+    """
+    模拟TTS服务器，保存延迟、失败率等配置和当前加载的模型
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, rtf=0.05, failure_rate=0.0, sample_rate=32000, output_dir=None):
+        """
+        初始化模拟服务器
+        :param latency: 每次合成请求的固定延迟（秒）
+        :param jitter: 延迟的随机波动范围（秒）
+        :param rtf: 实时率，合成耗时 = 音频时长 × rtf
+        :param failure_rate: 合成请求的失败概率（0~1）
+        :param sample_rate: 输出WAV的采样率
+        :param output_dir: 合成WAV的保存目录，默认使用系统临时目录
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rtf = rtf
+        self.failure_rate = failure_rate
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="mock_gpt_sovits_")
+        self.sovits_path = SOVITS_MODELS[0]
+        self.gpt_path = GPT_MODELS[0]
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def estimate_duration(self, text, speed=1, pause_second=0.3):
+        """
+        按字数和标点估计合成语音的时长
+        :return: 时长（秒）
+        """
+        chars = len(re.findall(r'[\u4e00-\u9fff]', text)) + len(re.findall(r'[A-Za-z0-9]+', text))
+        pauses = sum(1 for ch in text if ch in PAUSE_PUNCTUATION)
+        return max(0.5, (0.22 * chars + 0.05 * pauses + 0.3) / max(speed, 0.1) + pauses * pause_second)
+
+    def write_wav(self, duration):
+        """
+        生成指定时长的合成WAV（低音量正弦波，重复单个周期生成，避免逐点计算拖慢压测）
+        :return: WAV文件路径
+        """
+        frame_count = int(duration * self.sample_rate)
+        period = array.array('h', (int(3000 * math.sin(2 * math.pi * i / 128)) for i in range(128)))
+        samples = (period * (frame_count // 128 + 1))[:frame_count]
+        with self.lock:
+            self.request_count += 1
+            wav_path = os.path.join(self.output_dir, f"audio_{os.getpid()}_{self.request_count:06d}.wav")
+        with wave.open(wav_path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(samples.tobytes())
+        return wav_path
+
+    def get_tts_wav(self, ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut,
+                    top_k, top_p, temperature, ref_free, speed, if_freeze, inp_refs, sample_steps, if_sr,
+                    pause_second):
+        """
+        模拟 /get_tts_wav：等待配置的延迟后返回合成WAV，按失败率随机报错
+        """
+        start_time = time.time()
+        if not text:
+            raise gr.Error("合成文本为空")
+        duration = self.estimate_duration(text, speed or 1, pause_second or 0)
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)) + duration * self.rtf
+        time.sleep(delay)
+        if random.random() < self.failure_rate:
+            raise gr.Error("模拟服务器故障")
+        wav_path = self.write_wav(duration)
+        print(f"🎵 合成 {len(text)} 字 -> {duration:.2f}秒音频，耗时 {time.time() - start_time:.2f}秒")
+        return wav_path
+
+    def change_sovits_weights(self, sovits_path, prompt_language, text_language):
+        """
+        模拟 /change_sovits_weights：返回与webui相同的10个输出
+        """
+        time.sleep(self.latency)
+        self.sovits_path = sovits_path
+        print(f"🔄 SoVITS模型已切换: {sovits_path}")
+        return (
+            gr.update(choices=LANGUAGES, value=prompt_language),
+            gr.update(choices=LANGUAGES, value=text_language),
+            "",
+            prompt_language,
+            "",
+            text_language,
+            gr.update(value=32),
+            gr.update(),
+            gr.update(value=False),
+            gr.update(value=False)
+        )
+
+    def change_gpt_weights(self, gpt_path):
+        """
+        模拟 /change_gpt_weights
+        """
+        time.sleep(self.latency)
+        self.gpt_path = gpt_path
+        print(f"🔄 GPT模型已切换: {gpt_path}")
+
+    def change_choices(self):
+        """
+        模拟 /change_choices：返回模型列表
+        """
+        return (
+            gr.update(choices=SOVITS_MODELS, value=self.sovits_path),
+            gr.update(choices=GPT_MODELS, value=self.gpt_path)
+        )
+
+    def build_app(self, concurrency_limit=1):
+        """
+        构建Gradio应用，接口名称和参数与GPT-SoVITS webui一致
+        :param concurrency_limit: 同时处理的合成请求数（真实服务器只有一块GPU，默认为1）
+        :return: gr.Blocks
+        """
+        with gr.Blocks(title="Mock GPT-SoVITS") as app:
+            gr.Markdown("## 模拟 GPT-SoVITS 服务器")
+            with gr.Row():
+                sovits_dropdown = gr.Dropdown(label="SoVITS模型", choices=SOVITS_MODELS, value=self.sovits_path)
+                gpt_dropdown = gr.Dropdown(label="GPT模型", choices=GPT_MODELS, value=self.gpt_path)
+                refresh_button = gr.Button("刷新模型路径")
+            with gr.Row():
+                ref_wav_path = gr.Audio(label="参考音频", type="filepath")
+                prompt_text = gr.Textbox(label="参考音频文本")
+                prompt_language = gr.Dropdown(label="参考音频语种", choices=LANGUAGES, value="中文")
+                inp_refs = gr.File(label="辅助参考音频", file_count="multiple")
+            with gr.Row():
+                text = gr.Textbox(label="合成文本")
+                text_language = gr.Dropdown(label="合成语种", choices=LANGUAGES, value="中文")
+                how_to_cut = gr.Dropdown(label="切分方式", choices=CUT_METHODS, value="不切")
+            with gr.Row():
+                top_k = gr.Slider(label="top_k", minimum=1, maximum=100, step=1, value=20)
+                top_p = gr.Slider(label="top_p", minimum=0, maximum=1, step=0.05, value=0.6)
+                temperature = gr.Slider(label="temperature", minimum=0, maximum=1, step=0.05, value=0.6)
+                speed = gr.Slider(label="语速", minimum=0.6, maximum=1.65, step=0.05, value=1)
+                pause_second = gr.Slider(label="句间停顿秒数", minimum=0.1, maximum=0.5, step=0.01, value=0.3)
+                sample_steps = gr.Radio(label="采样步数", choices=[4, 8, 16, 32], value=8)
+                ref_free = gr.Checkbox(label="无参考文本模式", value=False)
+                if_freeze = gr.Checkbox(label="冻结设置", value=False)
+                if_sr = gr.Checkbox(label="超分", value=False)
+            inference_button = gr.Button("合成语音")
+            output = gr.Audio(label="输出的语音", type="filepath")
+
+            inference_button.click(
+                self.get_tts_wav,
+                [ref_wav_path, prompt_text, prompt_language, text, text_language, how_to_cut,
+                 top_k, top_p, temperature, ref_free, speed, if_freeze, inp_refs, sample_steps, if_sr,
+                 pause_second],
+                [output],
+                api_name="get_tts_wav",
+                concurrency_limit=concurrency_limit
+            )
+            sovits_dropdown.change(
+                self.change_sovits_weights,
+                [sovits_dropdown, prompt_language, text_language],
+                [prompt_language, text_language, prompt_text, prompt_language, text, text_language,
+                 sample_steps, inp_refs, ref_free, if_sr],
+                api_name="change_sovits_weights"
+            )
+            gpt_dropdown.change(self.change_gpt_weights, [gpt_dropdown], [], api_name="change_gpt_weights")
+            refresh_button.click(self.change_choices, [], [sovits_dropdown, gpt_dropdown], api_name="change_choices")
+        return app
+
+
+def main():
+    """
+    主函数，解析命令行参数并启动模拟服务器
+    """
+    parser = argparse.ArgumentParser(description="本地模拟GPT-SoVITS Gradio服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9872, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.5, help="每次请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="延迟的随机波动范围（秒）")
+    parser.add_argument("--rtf", type=float, default=0.05, help="实时率，合成耗时 = 音频时长 × rtf")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="合成请求的失败概率（0~1）")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时处理的合成请求数")
+    args = parser.parse_args()
+
+    server = MockTTSServer(latency=args.latency, jitter=args.jitter, rtf=args.rtf, failure_rate=args.failure_rate)
+    print(f"🚀 模拟GPT-SoVITS服务器: http://{args.host}:{args.port}/")
+    print(f"📋 延迟 {args.latency}±{args.jitter}秒，实时率 {args.rtf}，失败率 {args.failure_rate}，并发 {args.concurrency}")
+    print(f"📁 合成音频目录: {server.output_dir}")
+    app = server.build_app(concurrency_limit=args.concurrency)
+    app.queue(default_concurrency_limit=args.concurrency)
+    app.launch(server_name=args.host, server_port=args.port, show_error=True)
+
+
+if __name__ == "__main__":
+    main()
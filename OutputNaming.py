@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+输出文件命名与分配服务
+文件名由时间戳、进程内单调递增的序号和内容哈希组成，并通过独占创建原子地预留，
+多线程、多进程并发生成语音、图片、视频或备份文件时不会互相覆盖
+"""
+
+import os
+import hashlib
+import itertools
+import threading
+from datetime import datetime
+
+
+# 进程内单调递增的序号
+_sequence = itertools.count(1)
+_sequence_lock = threading.Lock()
+
+
+def next_sequence():
+    """
+    获取下一个序号（线程安全）
+    :return: 整数序号
+    """
+    with _sequence_lock:
+        return next(_sequence)
+
+
+def short_hash(content, length=8):
+    """
+    计算内容的短哈希
+    :param content: 字符串或字节串
+    :param length: 返回的十六进制字符数
+    :return: 短哈希字符串
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()[:length]
+
+
+def reserve_path(path):
+    """
+    原子地预留文件路径：以独占方式创建空文件，已存在时返回False
+    :param path: 文件路径
+    :return: 是否预留成功
+    """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def release_path(path):
+    """
+    释放预留的文件路径：写入、复制或改名失败时删除预留的空文件或写了一半的文件
+    :param path: 文件路径
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def allocate_output_path(output_dir, extension, prefix="", content=None):
+    """
+    分配一个不会与其他线程或进程冲突的输出文件路径，并预留（创建空文件）
+    文件名格式：[前缀_]时间戳_序号[_内容哈希]扩展名，例如 20260104_114753_000001_1a2b3c4d.wav
+    :param output_dir: 输出目录，不存在时自动创建
+    :param extension: 扩展名，如 ".wav"
+    :param prefix: 可选的文件名前缀
+    :param content: 可选的内容（如合成文本），用于生成内容哈希
+    :return: 预留好的文件路径，调用方可直接覆盖写入
+    """
+    output_dir = output_dir or "."
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    digest = short_hash(content) if content is not None else None
+
+    while True:
+        parts = [prefix] if prefix else []
+        parts += [timestamp, f"{next_sequence():06d}"]
+        if digest:
+            parts.append(digest)
+        path = os.path.join(output_dir, "_".join(parts) + extension)
+        if reserve_path(path):
+            return path
+
+
+def allocate_backup_path(file_path, backup_dir=None, suffix=""):
+    """
+    为备份文件分配不冲突的路径并预留
+    文件名格式：原文件名[后缀]_时间戳_序号扩展名，例如 ExportAudioInfo_20260104_114753_000001.json
+    :param file_path: 要备份的文件路径
+    :param backup_dir: 备份目录，默认与原文件相同
+    :param suffix: 可选的文件名后缀，如 "_Delivery"
+    :return: 预留好的备份文件路径，调用方可直接覆盖写入
+    """
+    if backup_dir is None:
+        backup_dir = os.path.dirname(file_path)
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    return allocate_output_path(backup_dir, ext, prefix=f"{name}{suffix}")
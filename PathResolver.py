@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+资源与结果文件路径解析
+打包环境下的ref.WAV位置和临时目录中的候选目录只在进程内计算一次，之后的查找只检查少量固定路径，
+不再遍历整个系统临时目录
+"""
+
+import os
+import sys
+import tempfile
+from functools import lru_cache
+
+
+def is_frozen():
+    """
+    是否运行在PyInstaller打包环境中
+    """
+    return getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS')
+
+
+@lru_cache(maxsize=None)
+def get_temp_roots():
+    """
+    获取可能存放临时文件的根目录（去重，按优先级排列），进程内只计算一次
+    :return: 目录路径元组
+    """
+    candidates = [
+        tempfile.gettempdir(),
+        os.environ.get('TEMP'),
+        os.environ.get('TMP'),
+        os.environ.get('GRADIO_TEMP_DIR')
+    ]
+    roots = []
+    for path in candidates:
+        if path and os.path.isdir(path):
+            path = os.path.abspath(path)
+            if path not in roots:
+                roots.append(path)
+    return tuple(roots)
+
+
+@lru_cache(maxsize=None)
+def get_mei_dirs():
+    """
+    获取PyInstaller解压目录（_MEI*）列表，当前进程的解压目录排在最前面
+    只列出临时根目录的第一层，不递归遍历，进程内只计算一次
+    :return: 目录路径元组
+    """
+    dirs = []
+    if is_frozen():
+        dirs.append(os.path.abspath(sys._MEIPASS))
+    for root in get_temp_roots():
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.name.startswith('_MEI') and entry.is_dir():
+                        path = os.path.abspath(entry.path)
+                        if path not in dirs:
+                            dirs.append(path)
+        except OSError:
+            continue
+    return tuple(dirs)
+
+
+@lru_cache(maxsize=None)
+def resolve_ref_wav_path(filename="ref.WAV"):
+    """
+    获取参考音频文件的路径，支持打包环境和开发环境，结果在进程内缓存
+    :param filename: 参考音频文件名
+    :return: 参考音频路径（打包环境下找不到时返回临时目录中的路径，由gradio_client处理）
+    """
+    if not is_frozen():
+        # 在开发环境中，使用代码所在目录
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(current_dir, filename)
+
+    # 在打包环境中，依次检查当前及其他解压目录
+    for mei_dir in get_mei_dirs():
+        ref_wav_path = os.path.join(mei_dir, filename)
+        if os.path.exists(ref_wav_path):
+            return ref_wav_path
+
+    return os.path.join(tempfile.gettempdir(), filename)
+
+
+def resolve_result_path(result_path):
+    """
+    定位Gradio返回的结果文件
+    打包环境下返回的路径可能分隔符错误或不完整，依次检查原路径、修正分隔符后的路径，
+    以及临时根目录和解压目录下的同名文件
+    :param result_path: Gradio返回的文件路径
+    :return: 存在的本地文件路径，找不到时返回None
+    """
+    if os.path.exists(result_path):
+        return result_path
+
+    # 修复打包环境下可能错误的路径分隔符
+    fixed_path = result_path.replace('/', os.sep).replace('\\', os.sep)
+    if os.path.exists(fixed_path):
+        return fixed_path
+
+    # 在固定的候选目录中查找，路径不完整时也尝试拼接相对路径
+    relative_path = fixed_path.lstrip(os.sep)
+    file_name = os.path.basename(fixed_path)
+    for base_dir in get_temp_roots() + get_mei_dirs():
+        for candidate in (os.path.join(base_dir, file_name), os.path.join(base_dir, relative_path)):
+            if os.path.exists(candidate):
+                return candidate
+    return None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SRT字幕工具函数
+时间格式转换、时间轴偏移，以及把整段音频的字幕按各分镜的起止时间拆分为分镜字幕
+"""
+
+import re
+
+
+def parse_srt_time(time_str):
+    """
+    解析SRT字幕时间格式 (HH:MM:SS,mmm) 为秒数
+    :param time_str: SRT格式的时间字符串，如 "00:00:01,000"
+    :return: 时间（秒）
+    """
+    parts = time_str.replace(',', '.').split(':')
+    hours = float(parts[0])
+    minutes = float(parts[1])
+    seconds = float(parts[2])
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_srt_time(seconds):
+    """
+    将秒数格式化为SRT字幕时间格式 (HH:MM:SS,mmm)
+    :param seconds: 时间（秒）
+    :return: SRT格式的时间字符串
+    """
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace('.', ',')
+
+
+def shift_srt_times(srt_content, offset):
+    """
+    对SRT字幕内容应用时间轴偏移
+    :param srt_content: SRT字幕文件内容
+    :param offset: 时间轴偏移（秒）
+    :return: 应用了时间轴偏移的SRT字幕内容
+    """
+    lines = srt_content.split('\n')
+    shifted_lines = []
+    i = 0
+    
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        # 检查是否是时间轴行
+        if '-->' in line:
+            # 解析时间轴
+            time_range = line.split(' --> ')
+            if len(time_range) == 2:
+                start_time = parse_srt_time(time_range[0])
+                end_time = parse_srt_time(time_range[1])
+                
+                # 应用偏移
+                shifted_start = start_time + offset
+                shifted_end = end_time + offset
+                
+                # 格式化回SRT时间格式
+                shifted_time_line = f"{format_srt_time(shifted_start)} --> {format_srt_time(shifted_end)}"
+                shifted_lines.append(shifted_time_line)
+                i += 1
+                continue
+        
+        # 其他行直接添加
+        shifted_lines.append(line)
+        i += 1
+    
+    return '\n'.join(shifted_lines)
+
+
+def parse_srt(srt_content):
+    """
+    解析SRT字幕内容
+    :param srt_content: SRT字幕文件内容
+    :return: 字幕条目列表，每项为 {"start": 秒, "end": 秒, "text": 文本}
+    """
+    entries = []
+    for block in re.split(r'\n\s*\n', srt_content.replace('\r\n', '\n').strip()):
+        lines = [line.strip() for line in block.split('\n')]
+        for i, line in enumerate(lines):
+            if '-->' in line:
+                start_time, _, end_time = line.partition('-->')
+                entries.append({
+                    "start": parse_srt_time(start_time.strip()),
+                    "end": parse_srt_time(end_time.strip()),
+                    "text": '\n'.join(lines[i + 1:]).strip()
+                })
+                break
+    return entries
+
+
+def format_srt(entries):
+    """
+    把字幕条目列表格式化为SRT字幕内容，序号从1开始
+    :param entries: 字幕条目列表，每项为 {"start": 秒, "end": 秒, "text": 文本}
+    :return: SRT字幕内容
+    """
+    blocks = []
+    for number, entry in enumerate(entries, 1):
+        blocks.append(f"{number}\n{format_srt_time(entry['start'])} --> {format_srt_time(entry['end'])}\n{entry['text']}\n")
+    return '\n'.join(blocks)
+
+
+def split_srt_by_segments(entries, segments):
+    """
+    按各分镜在整段音频中的起止时间拆分字幕，时间轴改为相对分镜开头
+    每条字幕归入与其重叠时间最长的分镜，起止时间截断到分镜范围内
+    :param entries: 整段音频的字幕条目列表（parse_srt返回值）
+    :param segments: 各分镜的 (开始秒数, 结束秒数) 列表，按时间顺序
+    :return: 与segments顺序一致的字幕条目列表的列表
+    """
+    result = [[] for _ in segments]
+    for entry in entries:
+        best_index = None
+        best_overlap = 0
+        for index, (segment_start, segment_end) in enumerate(segments):
+            overlap = min(entry["end"], segment_end) - max(entry["start"], segment_start)
+            if overlap > best_overlap:
+                best_index = index
+                best_overlap = overlap
+        if best_index is None:
+            continue
+        segment_start, segment_end = segments[best_index]
+        result[best_index].append({
+            "start": max(entry["start"], segment_start) - segment_start,
+            "end": min(entry["end"], segment_end) - segment_start,
+            "text": entry["text"]
+        })
+    return result
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式WAV拼接
+先一次性读取并校验所有片段的文件头，再按固定大小的块把PCM数据直接从源文件拷贝到输出文件，
+内存占用与片段数量和时长无关；支持时优先使用操作系统的零拷贝接口（copy_file_range/sendfile）
+导出时在输出文件旁保存片段索引（字节偏移、帧数、内容哈希），再次导出时只重写发生变化的片段
+"""
+
+import os
+import json
+import struct
+import time
+
+from FileCache import hash_file
+from OutputNaming import allocate_backup_path, release_path
+
+
+# WAV格式标签
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 默认的拷贝块大小
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# 标准PCM WAV文件头长度
+WAV_HEADER_SIZE = 44
+
+# 增量导出索引的版本号
+EXPORT_INDEX_VERSION = 1
+
+
+def read_wav_header(wav_path):
+    """
+    解析WAV文件头，只读取fmt和data块的位置，不读取音频数据
+    :param wav_path: WAV文件路径
+    :return: 字典，包含path、format_tag、channels、sample_rate、sample_width、block_align、data_offset、data_size、frames
+    """
+    file_size = os.path.getsize(wav_path)
+    header = {"path": wav_path}
+    with open(wav_path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"不是有效的WAV文件: {wav_path}")
+
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            chunk_start = f.tell()
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # 扩展格式的实际格式标签位于子格式GUID的前两个字节
+                    format_tag = struct.unpack('<H', fmt[24:26])[0]
+                header.update({
+                    "format_tag": format_tag,
+                    "channels": channels,
+                    "sample_rate": sample_rate,
+                    "sample_width": (bits + 7) // 8,
+                    "block_align": block_align
+                })
+            elif chunk_id == b'data':
+                if "format_tag" not in header:
+                    raise ValueError(f"WAV文件缺少fmt块: {wav_path}")
+                # 流式写出的WAV数据块长度可能未回填（0或0xFFFFFFFF），以实际文件长度为准
+                data_size = min(chunk_size, file_size - chunk_start) if chunk_size else file_size - chunk_start
+                data_size -= data_size % header["block_align"]
+                header.update({
+                    "data_offset": chunk_start,
+                    "data_size": data_size,
+                    "frames": data_size // header["block_align"]
+                })
+                return header
+            # 块按偶数字节对齐
+            f.seek(chunk_start + chunk_size + (chunk_size & 1))
+
+    raise ValueError(f"WAV文件缺少data块: {wav_path}")
+
+
+def get_audio_format(header):
+    """
+    获取用于比较是否可以直接拼接的音频格式
+    :param header: read_wav_header的返回值
+    :return: (格式标签, 声道数, 采样率, 采样宽度)
+    """
+    return header["format_tag"], header["channels"], header["sample_rate"], header["sample_width"]
+
+
+def validate_wav_headers(wav_paths):
+    """
+    一次性读取所有片段的文件头，检查格式是否一致
+    :param wav_paths: WAV文件路径列表
+    :return: (文件头列表, 与第一个片段格式不一致的片段索引列表)
+    """
+    headers = [read_wav_header(path) for path in wav_paths]
+    if not headers:
+        return headers, []
+    target_format = get_audio_format(headers[0])
+    mismatched = [i for i, header in enumerate(headers) if get_audio_format(header) != target_format]
+    return headers, mismatched
+
+
+def build_wav_header(format_tag, channels, sample_rate, sample_width, data_size):
+    """
+    构建标准的44字节WAV文件头
+    :return: 文件头字节串
+    """
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size + (data_size & 1), b'WAVE',
+        b'fmt ', 16, format_tag, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8,
+        b'data', data_size
+    )
+
+
+def copy_data_range(source_file, target_file, offset, count, block_size=DEFAULT_BLOCK_SIZE, buffer=None):
+    """
+    把源文件从offset开始的count字节写入目标文件的当前位置
+    依次尝试 os.copy_file_range、os.sendfile 零拷贝，不支持时用固定大小的缓冲区分块拷贝
+    :param source_file: 以二进制读方式打开的源文件
+    :param target_file: 以二进制写方式打开的目标文件
+    :param offset: 源文件中的起始字节
+    :param count: 拷贝的字节数
+    :param block_size: 每次拷贝的字节数
+    :param buffer: 可选的复用缓冲区（bytearray）
+    """
+    target_file.flush()
+    source_fd = source_file.fileno()
+    target_fd = target_file.fileno()
+    position = target_file.tell()
+    remaining = count
+
+    for zero_copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if zero_copy is None:
+            continue
+        try:
+            while remaining > 0:
+                if zero_copy is os.sendfile:
+                    copied = os.sendfile(target_fd, source_fd, offset, min(block_size, remaining))
+                else:
+                    copied = os.copy_file_range(source_fd, target_fd, min(block_size, remaining), offset)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            # 零拷贝接口直接写文件描述符，同步Python文件对象的位置
+            target_file.seek(position + count - remaining)
+            if remaining == 0:
+                return
+        except OSError:
+            # 跨文件系统或平台不支持，改用其他方式拷贝剩余部分
+            target_file.seek(position + count - remaining)
+            continue
+
+    buffer = buffer if buffer is not None else bytearray(block_size)
+    view = memoryview(buffer)
+    source_file.seek(offset)
+    while remaining > 0:
+        read = source_file.readinto(view[:min(len(buffer), remaining)])
+        if not read:
+            raise IOError(f"源文件数据不足: {source_file.name}")
+        target_file.write(view[:read])
+        remaining -= read
+
+
+def concatenate_wav_files(wav_paths, output_path, headers=None, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    流式拼接多个格式相同的WAV文件
+    先写入按总长度计算好的文件头，再逐个片段按块拷贝PCM数据，写入临时文件后原子地替换输出文件
+    :param wav_paths: WAV文件路径列表
+    :param output_path: 输出文件路径
+    :param headers: 可选的已校验的文件头列表（validate_wav_headers的返回值），避免重复读取
+    :param block_size: 每次拷贝的字节数
+    :return: 字典，包含output_path、total_bytes、total_frames、seconds、bytes_per_second
+    """
+    if headers is None:
+        headers, mismatched = validate_wav_headers(wav_paths)
+        if mismatched:
+            raise ValueError(f"第 {mismatched[0] + 1} 个音频的参数与其他音频不一致: {wav_paths[mismatched[0]]}")
+    if not headers:
+        raise ValueError("没有需要拼接的音频")
+
+    first = headers[0]
+    total_bytes = sum(header["data_size"] for header in headers)
+    if total_bytes + WAV_HEADER_SIZE > 0xFFFFFFFF:
+        raise ValueError("拼接后的音频超过WAV格式4GB的上限")
+
+    start_time = time.time()
+    temp_path = f"{output_path}.part"
+    buffer = bytearray(block_size)
+    try:
+        with open(temp_path, 'wb') as output:
+            output.write(build_wav_header(first["format_tag"], first["channels"], first["sample_rate"],
+                                          first["sample_width"], total_bytes))
+            for header in headers:
+                with open(header["path"], 'rb') as source:
+                    copy_data_range(source, output, header["data_offset"], header["data_size"], block_size, buffer)
+            if total_bytes & 1:
+                # RIFF块需按偶数字节对齐
+                output.write(b'\x00')
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    seconds = time.time() - start_time
+    return {
+        "output_path": output_path,
+        "total_bytes": total_bytes,
+        "total_frames": sum(header["frames"] for header in headers),
+        "seconds": round(seconds, 3),
+        "bytes_per_second": round(total_bytes / seconds) if seconds > 0 else 0
+    }
+
+
+def get_index_path(output_path):
+    """
+    获取拼接结果的索引文件路径（与输出文件同目录）
+    :param output_path: 拼接输出文件路径
+    :return: 索引文件路径
+    """
+    return f"{output_path}.index.json"
+
+
+def _load_export_index(index_path, output_path, audio_format):
+    """
+    读取索引文件，输出文件在索引写入后被修改过或格式不同时视为无效
+    :return: 索引字典，无效时返回None
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        stat = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+    if (index.get("version") != EXPORT_INDEX_VERSION or
+            tuple(index.get("format", ())) != tuple(audio_format) or
+            index.get("wav_size") != stat.st_size or
+            index.get("wav_mtime_ns") != stat.st_mtime_ns):
+        return None
+    return index
+
+
+def _save_export_index(index_path, output_path, audio_format, segments):
+    """
+    原子地写入索引文件，记录每个片段在data块中的字节偏移、帧数和内容哈希
+    """
+    stat = os.stat(output_path)
+    index = {
+        "version": EXPORT_INDEX_VERSION,
+        "format": list(audio_format),
+        "data_offset": WAV_HEADER_SIZE,
+        "wav_size": stat.st_size,
+        "wav_mtime_ns": stat.st_mtime_ns,
+        "segments": segments
+    }
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def _describe_segments(headers, old_index=None):
+    """
+    生成各片段的索引条目，源文件的路径、大小和修改时间与旧索引相同时沿用旧的哈希，不重新读取
+    """
+    known = {}
+    for entry in (old_index or {}).get("segments", []):
+        known[(entry["path"], entry["size"], entry["mtime_ns"])] = entry["hash"]
+
+    segments = []
+    offset = 0
+    for header in headers:
+        path = os.path.abspath(header["path"])
+        stat = os.stat(path)
+        file_hash = known.get((path, stat.st_size, stat.st_mtime_ns)) or hash_file(path)
+        segments.append({
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash,
+            "offset": offset,
+            "data_size": header["data_size"],
+            "frames": header["frames"]
+        })
+        offset += header["data_size"]
+    return segments
+
+
+def _write_segments(output, headers, start_index, block_size, buffer):
+    """
+    从start_index开始依次把片段数据写入输出文件当前位置
+    :return: 写入的字节数
+    """
+    written = 0
+    for header in headers[start_index:]:
+        with open(header["path"], 'rb') as source:
+            copy_data_range(source, output, header["data_offset"], header["data_size"], block_size, buffer)
+        written += header["data_size"]
+    return written
+
+
+def export_wav_incremental(wav_paths, output_path, headers=None, index_path=None, block_size=DEFAULT_BLOCK_SIZE,
+                           backup_old=False):
+    """
+    增量拼接WAV：根据上次导出时保存的片段索引，只重写发生变化的部分
+    - unchanged：所有片段都未变化，不写入
+    - append：只在末尾新增了片段，追加写入
+    - patch：片段数量和各片段长度不变，原位覆盖变化的片段
+    - splice：从第一个变化的片段开始截断并重写后续数据
+    - full：没有有效索引，完整重建
+    :param wav_paths: WAV文件路径列表
+    :param output_path: 输出文件路径
+    :param headers: 可选的已校验的文件头列表，格式必须一致
+    :param index_path: 索引文件路径，默认为 输出文件路径.index.json
+    :param block_size: 每次拷贝的字节数
+    :param backup_old: 完整重建时是否把旧的输出文件移动为带时间戳的备份（重命名，不复制数据）
+    :return: 字典，包含mode、changed_segments、bytes_written、total_bytes、seconds、bytes_per_second
+    """
+    if headers is None:
+        headers, mismatched = validate_wav_headers(wav_paths)
+        if mismatched:
+            raise ValueError(f"第 {mismatched[0] + 1} 个音频的参数与其他音频不一致: {wav_paths[mismatched[0]]}")
+    if not headers:
+        raise ValueError("没有需要拼接的音频")
+
+    index_path = index_path or get_index_path(output_path)
+    audio_format = get_audio_format(headers[0])
+    old_index = _load_export_index(index_path, output_path, audio_format) if os.path.exists(output_path) else None
+    segments = _describe_segments(headers, old_index)
+    total_bytes = sum(segment["data_size"] for segment in segments)
+    start_time = time.time()
+
+    if old_index is None:
+        if backup_old and os.path.exists(output_path):
+            backup_path = allocate_backup_path(output_path)
+            try:
+                os.replace(output_path, backup_path)
+            except OSError:
+                release_path(backup_path)
+                raise
+            print(f"备份音频文件: {backup_path}")
+        concatenate_wav_files(wav_paths, output_path, headers=headers, block_size=block_size)
+        mode = "full"
+        changed = list(range(len(segments)))
+        bytes_written = total_bytes
+    else:
+        old_segments = old_index["segments"]
+
+        def same(i):
+            return (i < len(old_segments) and old_segments[i]["hash"] == segments[i]["hash"] and
+                    old_segments[i]["data_size"] == segments[i]["data_size"])
+
+        prefix = 0
+        while prefix < len(segments) and same(prefix):
+            prefix += 1
+
+        if prefix == len(segments) == len(old_segments):
+            mode = "unchanged"
+            changed = []
+        elif prefix == len(old_segments):
+            mode = "append"
+            changed = list(range(prefix, len(segments)))
+        elif (len(segments) == len(old_segments) and
+              all(old["data_size"] == new["data_size"] for old, new in zip(old_segments, segments))):
+            mode = "patch"
+            changed = [i for i in range(len(segments)) if not same(i)]
+        else:
+            mode = "splice"
+            changed = [i for i in range(prefix, len(segments)) if not same(i)]
+
+        bytes_written = 0
+        if mode != "unchanged":
+            # 修改过程中被中断时输出文件与索引不一致，先删除索引，下次导出时完整重建
+            os.remove(index_path)
+            buffer = bytearray(block_size)
+            with open(output_path, 'r+b') as output:
+                if mode == "patch":
+                    for i in changed:
+                        output.seek(WAV_HEADER_SIZE + segments[i]["offset"])
+                        bytes_written += _write_segments(output, headers[i:i + 1], 0, block_size, buffer)
+                else:
+                    # 片段只在末尾被删除时prefix等于片段数，截断位置为保留片段的总长度
+                    output.truncate(WAV_HEADER_SIZE + sum(segment["data_size"] for segment in segments[:prefix]))
+                    output.seek(0, os.SEEK_END)
+                    bytes_written = _write_segments(output, headers, prefix, block_size, buffer)
+                    if total_bytes & 1:
+                        output.write(b'\x00')
+                # 更新文件头中的长度
+                output.seek(0)
+                output.write(build_wav_header(*audio_format, total_bytes))
+
+    _save_export_index(index_path, output_path, audio_format, segments)
+    seconds = time.time() - start_time
+    return {
+        "mode": mode,
+        "changed_segments": changed,
+        "bytes_written": bytes_written,
+        "total_bytes": total_bytes,
+        "seconds": round(seconds, 3),
+        "bytes_per_second": round(bytes_written / seconds) if seconds > 0 else 0
+    }
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+WAV格式统一
+拼接前把采样率、声道数或位深与目标格式不同的片段转换为目标格式（重采样、上下混音、位深转换），
+按固定大小的块向量化处理；降采样前先做抗混叠低通滤波；转换结果按内容哈希缓存，之后再次导出时直接复用
+"""
+
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from FileCache import FileCache, DEFAULT_CACHE_ROOT, hash_file, make_cache_key
+from WavConcat import (
+    WAVE_FORMAT_IEEE_FLOAT,
+    build_wav_header,
+    get_audio_format,
+    read_wav_header
+)
+
+
+# 每次处理的帧数
+DEFAULT_BLOCK_FRAMES = 256 * 1024
+
+# 重采样算法标识，参与缓存键计算，算法变化后旧的转换结果不再复用
+RESAMPLER = "blackman_sinc_linear_v1"
+
+# 抗混叠滤波器每侧的抽头数（按源采样率与目标采样率之比放大）和截止频率（相对于目标奈奎斯特频率）
+LOWPASS_HALF_TAPS = 16
+LOWPASS_CUTOFF = 0.9
+
+# 各位深整数PCM的满幅值
+_INT_SCALES = {1: 128.0, 2: 32768.0, 3: 8388608.0, 4: 2147483648.0}
+
+# 默认的已转换片段缓存
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_normalized_cache():
+    """
+    获取默认的已转换片段缓存（用户目录下共享）
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FileCache(os.path.join(DEFAULT_CACHE_ROOT, "normalized"))
+        return _default_cache
+
+
+def choose_target_format(headers):
+    """
+    选择目标格式：取片段中最常见的格式，使需要转换的片段最少
+    :param headers: read_wav_header返回值的列表
+    :return: (格式标签, 声道数, 采样率, 采样宽度)
+    """
+    counts = {}
+    for header in headers:
+        audio_format = get_audio_format(header)
+        counts[audio_format] = counts.get(audio_format, 0) + header["frames"]
+    return max(counts, key=counts.get)
+
+
+def _decode_frames(data, format_tag, channels, sample_width):
+    """
+    把PCM字节解码为 (帧数, 声道数) 的float32数组，取值范围[-1, 1]
+    """
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = np.frombuffer(data, dtype='<f4' if sample_width == 4 else '<f8').astype(np.float32)
+    elif sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / _INT_SCALES[1]
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / _INT_SCALES[3]
+    else:
+        dtype = '<i2' if sample_width == 2 else '<i4'
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32) / _INT_SCALES[sample_width]
+    return samples.reshape(-1, channels)
+
+
+def _encode_frames(frames, format_tag, sample_width):
+    """
+    把 (帧数, 声道数) 的float32数组编码为PCM字节
+    """
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return frames.astype('<f4' if sample_width == 4 else '<f8').tobytes()
+    scale = _INT_SCALES[sample_width]
+    values = np.clip(np.round(frames * scale), -scale, scale - 1)
+    if sample_width == 1:
+        return (values + 128).astype(np.uint8).tobytes()
+    if sample_width == 3:
+        values = values.astype(np.int32).reshape(-1)
+        packed = np.empty((values.size, 3), dtype=np.uint8)
+        packed[:, 0] = values & 0xFF
+        packed[:, 1] = (values >> 8) & 0xFF
+        packed[:, 2] = (values >> 16) & 0xFF
+        return packed.tobytes()
+    return values.astype('<i2' if sample_width == 2 else '<i4').tobytes()
+
+
+def _convert_channels(frames, channels):
+    """
+    声道转换：转单声道时取平均，单声道转多声道时复制，其他情况截取或重复最后一个声道
+    """
+    source_channels = frames.shape[1]
+    if source_channels == channels:
+        return frames
+    if channels == 1:
+        return frames.mean(axis=1, keepdims=True)
+    if source_channels == 1:
+        return np.repeat(frames, channels, axis=1)
+    if source_channels > channels:
+        return frames[:, :channels]
+    return np.concatenate([frames, np.repeat(frames[:, -1:], channels - source_channels, axis=1)], axis=1)
+
+
+def _lowpass_kernel(ratio):
+    """
+    生成降采样用的抗混叠低通滤波器（Blackman窗的sinc），截止频率略低于目标采样率的奈奎斯特频率
+    :param ratio: 源采样率与目标采样率之比（大于1）
+    :return: 长度为奇数、系数和为1的float32数组
+    """
+    half = int(np.ceil(LOWPASS_HALF_TAPS * ratio))
+    cutoff = 0.5 * LOWPASS_CUTOFF / ratio
+    n = np.arange(-half, half + 1, dtype=np.float64)
+    kernel = np.sinc(2 * cutoff * n) * np.blackman(2 * half + 1)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def normalize_wav_file(header, target_format, output_path, block_frames=DEFAULT_BLOCK_FRAMES):
+    """
+    把一个WAV片段转换为目标格式
+    重采样使用线性插值，降采样前先用低通滤波器去掉目标采样率无法表示的高频，避免混叠到可听频段；
+    按输出帧分块计算每块所需的源帧范围，只读取该范围（加上滤波器长度）的数据，内存占用与片段时长无关
+    :param header: 源片段的read_wav_header返回值
+    :param target_format: (格式标签, 声道数, 采样率, 采样宽度)
+    :param output_path: 输出文件路径
+    :param block_frames: 每块的输出帧数
+    :return: 输出文件的文件头（read_wav_header返回值）
+    """
+    if np is None:
+        raise RuntimeError("音频格式转换需要numpy，请安装: pip install numpy")
+
+    format_tag, channels, sample_rate, sample_width = target_format
+    source_frames = header["frames"]
+    ratio = header["sample_rate"] / sample_rate
+    output_frames = int(round(source_frames / ratio))
+
+    kernel = _lowpass_kernel(ratio) if ratio > 1 else None
+    pad = len(kernel) // 2 if kernel is not None else 0
+
+    with open(header["path"], 'rb') as source, open(output_path, 'wb') as output:
+        output.write(build_wav_header(format_tag, channels, sample_rate, sample_width,
+                                      output_frames * channels * sample_width))
+
+        def read_source(start, stop):
+            source.seek(header["data_offset"] + start * header["block_align"])
+            data = source.read((stop - start) * header["block_align"])
+            return _decode_frames(data, header["format_tag"], header["channels"], header["sample_width"])
+
+        def read_filtered(start, stop):
+            # 多读取滤波器半长的源帧，片段首尾以静音补齐，滤波后正好得到 [start, stop) 的帧
+            frames = _convert_channels(read_source(max(start - pad, 0), min(stop + pad, source_frames)), channels)
+            frames = np.pad(frames, ((max(pad - start, 0), max(stop + pad - source_frames, 0)), (0, 0)))
+            return np.stack([np.convolve(frames[:, channel], kernel, mode='valid')
+                             for channel in range(channels)], axis=1)
+
+        for block_start in range(0, output_frames, block_frames):
+            block_stop = min(block_start + block_frames, output_frames)
+            if ratio == 1:
+                frames = _convert_channels(read_source(block_start, block_stop), channels)
+            else:
+                # 输出帧k对应源位置 k×ratio，取相邻两帧线性插值
+                positions = np.arange(block_start, block_stop, dtype=np.float64) * ratio
+                lower = np.minimum(np.floor(positions).astype(np.int64), source_frames - 1)
+                upper = np.minimum(lower + 1, source_frames - 1)
+                weight = (positions - lower).astype(np.float32)[:, None]
+                first = int(lower[0])
+                if kernel is not None:
+                    source_block = read_filtered(first, int(upper[-1]) + 1)
+                else:
+                    source_block = _convert_channels(read_source(first, int(upper[-1]) + 1), channels)
+                frames = source_block[lower - first] * (1 - weight) + source_block[upper - first] * weight
+            output.write(_encode_frames(frames, format_tag, sample_width))
+
+        if (output_frames * channels * sample_width) & 1:
+            output.write(b'\x00')
+
+    return read_wav_header(output_path)
+
+
+def normalize_wav_segments(headers, target_format=None, cache=None):
+    """
+    把格式与目标格式不同的片段转换为目标格式，已转换过的片段直接使用缓存
+    :param headers: read_wav_header返回值的列表
+    :param target_format: 可选的目标格式，默认取最常见的格式
+    :param cache: 可选的FileCache对象，默认使用用户目录下的共享缓存
+    :return: (转换后的文件头列表, 统计字典{"target_format", "converted", "cache_hits"})
+    """
+    if target_format is None:
+        target_format = choose_target_format(headers)
+    if cache is None:
+        cache = get_normalized_cache()
+
+    normalized = []
+    converted = 0
+    cache_hits = 0
+    for header in headers:
+        if get_audio_format(header) == tuple(target_format):
+            normalized.append(header)
+            continue
+
+        key = make_cache_key("normalize_wav", hash_file(header["path"]), list(target_format), RESAMPLER)
+        cached_path = cache.get(key)
+        if cached_path:
+            cache_hits += 1
+            normalized.append(read_wav_header(cached_path))
+            continue
+
+        temp_path = os.path.join(cache.cache_dir, f"{key}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            normalize_wav_file(header, target_format, temp_path)
+            cached_path = cache.put(key, temp_path, move=True)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        if not cached_path:
+            raise IOError(f"保存转换后的音频失败: {header['path']}")
+        converted += 1
+        print(f"🔧 已转换音频格式: {header['path']}")
+        normalized.append(read_wav_header(cached_path))
+
+    return normalized, {
+        "target_format": tuple(target_format),
+        "converted": converted,
+        "cache_hits": cache_hits
+    }
@@ -128,6 +128,82 @@ class BuzzServerTester:
             print(f"测试下载功能异常: {str(e)}")
             return False
     
+    def test_status_wait(self, timeout=5):
+        """测试长轮询状态接口"""
+        print("\n=== 测试长轮询状态接口 ===")
+        try:
+            start_time = time.time()
+            response = self.session.get(f"{self.base_url}/status/wait",
+                                        params={"progress": 0, "timeout": timeout}, timeout=timeout + 10)
+            if response.status_code == 200:
+                status = response.json()
+                print(f"返回耗时: {time.time() - start_time:.2f}秒")
+                print(f"服务状态: {'处理中' if status['is_processing'] else '空闲'}，进度: {status['progress']}%")
+                return True
+            else:
+                print(f"长轮询接口不可用: {response.status_code}")
+                return False
+        except Exception as e:
+            print(f"测试长轮询接口异常: {str(e)}")
+            return False
+    
+    def wait_idle(self, max_wait=300):
+        """等待服务空闲"""
+        start_time = time.time()
+        while time.time() - start_time < max_wait:
+            response = self.session.get(f"{self.base_url}/status")
+            if response.status_code == 200 and not response.json()['is_processing']:
+                return True
+            time.sleep(1)
+        return False
+    
+    def test_completion_latency(self, audio_file, poll_interval=2, max_wait=300):
+        """对比固定间隔轮询和长轮询检测到转录完成的耗时及状态请求次数"""
+        print(f"\n=== 测试完成检测延迟: {audio_file} ===")
+        results = {}
+        for mode in ("poll", "long_poll"):
+            if not self.wait_idle(max_wait):
+                print("服务一直忙，跳过测试")
+                return False
+            
+            with open(audio_file, 'rb') as f:
+                files = {'file': (os.path.basename(audio_file), f, 'audio/wav')}
+                response = self.session.post(f"{self.base_url}/transcribe/upload", files=files)
+            if response.status_code != 200:
+                print(f"上传失败: {response.status_code} - {response.text}")
+                return False
+            start_time = time.time()
+            
+            request_count = 0
+            progress = 0
+            finished = False
+            while time.time() - start_time < max_wait:
+                request_count += 1
+                if mode == "long_poll":
+                    response = self.session.get(f"{self.base_url}/status/wait",
+                                                params={"progress": progress, "timeout": 30}, timeout=40)
+                    if response.status_code != 200:
+                        print(f"长轮询接口不可用: {response.status_code}")
+                        break
+                else:
+                    response = self.session.get(f"{self.base_url}/status")
+                status = response.json()
+                progress = status.get('progress', 0)
+                if not status['is_processing']:
+                    finished = True
+                    break
+                if mode == "poll":
+                    time.sleep(poll_interval)
+            
+            if finished:
+                results[mode] = (time.time() - start_time, request_count)
+                print(f"{'固定间隔轮询' if mode == 'poll' else '长轮询'}: 耗时 {results[mode][0]:.2f}秒，状态请求 {request_count} 次")
+        
+        if len(results) == 2:
+            saved = results["poll"][0] - results["long_poll"][0]
+            print(f"长轮询节省: {saved:.2f}秒，状态请求减少 {results['poll'][1] - results['long_poll'][1]} 次")
+        return len(results) == 2
+    
     def test_root(self):
         """测试根接口"""
         print("\n=== 测试根接口 ===")
@@ -160,6 +236,9 @@ def main():
     # 测试服务状态
     tester.test_status()
     
+    # 测试长轮询状态接口
+    tester.test_status_wait()
+    
     # 查找测试音频文件
     test_files = []
     for ext in ['.wav', '.mp3', '.m4a']:
@@ -214,6 +293,10 @@ def main():
         # 测试下载SRT文件
         if srt_file:
             tester.test_download_srt(srt_file)
+        
+        # 对比固定间隔轮询和长轮询（需要额外上传两次，使用 --latency 参数开启）
+        if "--latency" in sys.argv:
+            tester.test_completion_latency(test_file)
     
     print("\n" + "=" * 50)
     print("测试完成")